@@ -0,0 +1,190 @@
+# archive.py
+
+"""
+Archive des prédictions résolues (gagnées/perdues/expirées), hors du dictionnaire chaud.
+Les prédictions en attente restent dans CardPredictor.predictions ; l'archive
+n'est relue qu'à la demande (rapports, backtests).
+
+Rétention : les données plus anciennes que la fenêtre chaude (prédictions résolues,
+échantillons INTER retirés, cartes de jeux hors historique) partent dans des archives
+gzip mensuelles `archives/<type>-AAAA-MM.jsonl.gz`, en ajout seul. Un index garde les
+comptes par mois (et par statut pour les prédictions) : les totaux survivent à l'archivage
+sans relire les archives.
+"""
+import os
+import math
+import gzip
+import glob
+import json
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from journal import AppendOnlyJournal
+from persistence import atomic_write_text
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+PREDICTIONS_ARCHIVE_FILE = 'predictions_archive.jsonl'
+ARCHIVE_INDEX_FILE = 'index.json'
+
+# Types d'archives mensuelles
+ARCHIVE_PREDICTIONS = 'predictions'
+ARCHIVE_INTER_SAMPLES = 'inter_samples'
+ARCHIVE_GAME_CARDS = 'game_cards'
+
+
+def month_of(value: Union[float, str, None], default: str) -> str:
+    """'AAAA-MM' d'un horodatage (secondes) ou d'une date ISO ; `default` si absent ou illisible."""
+    if isinstance(value, str) and len(value) >= 7 and value[4] == '-':
+        return value[:7]
+    if isinstance(value, (int, float)) and value > 0:
+        return datetime.fromtimestamp(value).strftime('%Y-%m')
+    return default
+
+
+class MonthlyArchive:
+    """Fichiers gzip mensuels en ajout seul, un par type et par mois, avec index des comptes."""
+
+    def __init__(self, directory: str = 'archives'):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def path(self, kind: str, month: str) -> str:
+        return os.path.join(self.directory, f"{kind}-{month}.jsonl.gz")
+
+    def append(self, kind: str, records_by_month: Dict[str, List[Dict[str, Any]]],
+               summarize: Optional[Callable[[Dict[str, Any]], Optional[str]]] = None) -> int:
+        """
+        Ajoute des enregistrements groupés par mois. `summarize(record)` renvoie une clé
+        comptée en plus dans l'index (ex. le statut d'une prédiction).
+        Un nouveau membre gzip est ajouté à chaque appel : les lecteurs voient un flux continu.
+        """
+        written = 0
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            index = self._load_index()
+            for month, records in sorted(records_by_month.items()):
+                if not records: continue
+                with gzip.open(self.path(kind, month), 'at', encoding='utf-8') as f:
+                    for record in records:
+                        f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+                summary = index.setdefault(kind, {}).setdefault(month, {})
+                summary['records'] = summary.get('records', 0) + len(records)
+                if summarize:
+                    for record in records:
+                        key = summarize(record)
+                        if key:
+                            summary[key] = summary.get(key, 0) + 1
+                written += len(records)
+            if written:
+                atomic_write_text(os.path.join(self.directory, ARCHIVE_INDEX_FILE), json.dumps(index, indent=1, sort_keys=True))
+        return written
+
+    def months(self, kind: str) -> List[str]:
+        prefix = f"{kind}-"
+        return sorted(os.path.basename(p)[len(prefix):-len('.jsonl.gz')]
+                      for p in glob.glob(os.path.join(self.directory, f"{kind}-*.jsonl.gz")))
+
+    def iter_records(self, kind: str, months: Optional[Iterable[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Relit les archives d'un type (mois croissants), à la demande uniquement."""
+        for month in (sorted(months) if months is not None else self.months(kind)):
+            path = self.path(kind, month)
+            if not os.path.exists(path): continue
+            try:
+                with gzip.open(path, 'rt', encoding='utf-8') as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line: continue
+                        try:
+                            yield json.loads(line)
+                        except ValueError:
+                            logger.warning(f"⚠️ Ligne d'archive corrompue ignorée ({path})")
+            except (EOFError, OSError) as e:
+                # Membre gzip tronqué par un arrêt brutal : les membres précédents restent lisibles
+                logger.warning(f"⚠️ Archive {path} tronquée : {e}")
+
+    def totals(self, kind: str) -> Dict[str, int]:
+        """Comptes cumulés de l'index pour un type (tous mois confondus)."""
+        totals: Dict[str, int] = defaultdict(int)
+        with self._lock:
+            for summary in self._load_index().get(kind, {}).values():
+                for key, count in summary.items():
+                    totals[key] += count
+        return dict(totals)
+
+    def summary(self) -> Dict[str, Dict[str, Dict[str, int]]]:
+        with self._lock:
+            return self._load_index()
+
+    def _load_index(self) -> Dict[str, Dict[str, Dict[str, int]]]:
+        path = os.path.join(self.directory, ARCHIVE_INDEX_FILE)
+        if not os.path.exists(path): return {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except ValueError as e:
+            logger.error(f"❌ Index d'archives illisible ({path}): {e}")
+            return {}
+
+
+def split_by_age(records: Iterable[Dict[str, Any]], cutoff: float,
+                 field: str = 'resolved_at') -> Tuple[Dict[str, List[Dict[str, Any]]], List[Dict[str, Any]], float]:
+    """
+    (anciens groupés par mois, récents, plus ancien horodatage récent) selon `field` ;
+    un enregistrement sans horodatage est ancien (rangé au mois de `cutoff`).
+    """
+    current_month = month_of(cutoff, '')
+    old: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    keep: List[Dict[str, Any]] = []
+    oldest_kept = math.inf
+    for record in records:
+        stamp = record.get(field)
+        if isinstance(stamp, (int, float)) and stamp >= cutoff:
+            keep.append(record)
+            oldest_kept = min(oldest_kept, stamp)
+        else:
+            old[month_of(stamp, current_month)].append(record)
+    return old, keep, oldest_kept
+
+
+def prediction_status(record: Dict[str, Any]) -> Optional[str]:
+    return record.get('status')
+
+
+class PredictionArchive:
+    """Archive JSONL en ajout seul : une ligne par prédiction résolue."""
+
+    def __init__(self, path: str = PREDICTIONS_ARCHIVE_FILE):
+        self.path = path
+        self._journal = AppendOnlyJournal(path)
+
+    def append(self, game_number: int, prediction: Dict[str, Any]) -> None:
+        self._journal.append({'game': game_number, **prediction})
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """Relit l'archive (à la demande uniquement)."""
+        return self._journal.replay()
+
+    def roll(self, cutoff: float, monthly: MonthlyArchive) -> Tuple[int, float]:
+        """
+        Déplace les prédictions résolues avant `cutoff` vers les archives mensuelles
+        (appelé sous le verrou d'état) ; renvoie (déplacées, plus ancien `resolved_at` restant).
+        Archivage d'abord, réécriture ensuite : un arrêt entre les deux peut dupliquer
+        des lignes archivées, jamais en perdre.
+        """
+        old, keep, oldest_kept = split_by_age(self._journal.replay(), cutoff)
+        if not old: return 0, oldest_kept
+        moved = monthly.append(ARCHIVE_PREDICTIONS, old, summarize=prediction_status)
+        self._journal.rotate()
+        atomic_write_text(self.path, ''.join(
+            json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n' for record in keep
+        ))
+        self._journal.discard_rotated()
+        return moved, oldest_kept
+
+    def close(self) -> None:
+        self._journal.close()
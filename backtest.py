@@ -0,0 +1,357 @@
+# backtest.py
+
+"""
+Backtest des jeux de règles sur l'historique collecté (game_cards.json / SQLite).
+Rejoue les jeux avec la même sémantique que le bot en direct :
+- prédiction sur la 1ère carte du jeu N pour le jeu N+2 (INTER prioritaire si actif, sinon STATIQUE),
+- écart minimal de 3 jeux entre deux prédictions,
+- vérification sur [N-5, N] : gain aux décalages 0/1/2, perte confirmée à partir du décalage 2,
+- désactivation INTER sur une perte INTER, réactivation après 2 échecs statiques consécutifs.
+Différences assumées : le délai anti-spam de 30 s (temps réel) n'est pas simulé, et le jeu
+de règles reste fixe (pas de ré-analyse pendant le rejeu). Comme en direct, l'écart de 3 jeux
+bloque les prédictions quand la numérotation repart à 1 ; `--reset-on-wrap` simule une remise
+à zéro du dernier jeu prédit à ce moment-là.
+
+    python backtest.py [--source game_cards.json] [--top 5] [--random 200] [--workers 4]
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from card_predictor import STATIC_RULES
+from cards import CARD_COUNT, SUIT_COUNT, SUITS, card_suit, decode_card, encode_card, suit_index
+from rule_mining import GameCards, cooccurrence
+
+try:
+    import numpy as np
+except ImportError:  # NumPy est optionnel
+    np = None
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Écart minimal entre deux jeux sources prédits (voir CardPredictor.should_predict)
+PREDICTION_GAP = 3
+# Fenêtre de vérification [N-5, N] (voir CardPredictor._verify_prediction_common)
+VERIFICATION_WINDOW = 5
+MAX_WIN_OFFSET = 2
+STATIC_FAILS_BEFORE_INTER = 2
+
+
+class Outcomes(NamedTuple):
+    """Historique précalculé : une case par jeu, dans l'ordre d'arrivée."""
+    games: Sequence[int]
+    first_codes: Sequence[int]     # code de la 1ère carte du groupe 1 (-1 si absente)
+    suit_masks: Sequence[int]      # bits des enseignes présentes dans le groupe 1
+
+
+class RuleSet(NamedTuple):
+    name: str
+    rules: Tuple[Tuple[int, int], ...]   # (code déclencheur, indice d'enseigne), par priorité
+    inter_active: bool = True
+
+
+class BacktestResult(NamedTuple):
+    name: str
+    predictions: int
+    wins: int
+    losses: int
+    wins_by_offset: Tuple[int, int, int]
+    win_rate: float
+    longest_win_streak: int
+    longest_loss_streak: int
+    inter_disables: int
+    unresolved: int
+    rule_hits: Dict[str, Tuple[int, int]]   # 'INTER 10♦️' -> (gains, pertes)
+
+
+def static_table() -> Tuple[int, ...]:
+    table = [-1] * CARD_COUNT
+    for trigger, suit in STATIC_RULES.items():
+        code, index = encode_card(trigger), suit_index(suit)
+        if code is not None and index is not None:
+            table[code] = index
+    return tuple(table)
+
+
+def build_outcomes(entries: Iterable[GameCards]) -> Outcomes:
+    games, first_codes, suit_masks = array('i'), array('b'), array('B')
+    for _, game, group1, _ in entries:
+        mask = 0
+        for code in group1:
+            mask |= 1 << card_suit(code)
+        games.append(game)
+        first_codes.append(group1[0] if group1 else -1)
+        suit_masks.append(mask)
+    return Outcomes(games, first_codes, suit_masks)
+
+
+def rule_table(rule_set: RuleSet) -> Tuple[int, ...]:
+    """Table code carte -> enseigne INTER (la première règle l'emporte), -1 sinon."""
+    table = [-1] * CARD_COUNT
+    for code, suit in reversed(rule_set.rules):
+        table[code] = suit
+    return tuple(table)
+
+
+def _lookup(table: Tuple[int, ...], codes: Sequence[int]) -> Sequence[int]:
+    """Décisions de toute la série en un lot (NumPy si disponible)."""
+    if np is not None:
+        return np.asarray(table + (-1,), dtype=np.int8)[np.asarray(codes, dtype=np.int64)].tolist()
+    return [table[code] if code >= 0 else -1 for code in codes]
+
+
+def simulate(rule_set: RuleSet, outcomes: Outcomes, static: Optional[Tuple[int, ...]] = None,
+             reset_on_wrap: bool = False) -> BacktestResult:
+    """Rejoue l'historique pour un jeu de règles (voir la docstring du module pour la sémantique)."""
+    static = static if static is not None else static_table()
+    games, first_codes, suit_masks = outcomes.games, outcomes.first_codes, outcomes.suit_masks
+    inter_decisions = _lookup(rule_table(rule_set), outcomes.first_codes)
+    static_decisions = _lookup(static, outcomes.first_codes)
+    has_rules = bool(rule_set.rules)
+
+    pending: Dict[int, Tuple[int, bool, int]] = {}
+    active = rule_set.inter_active
+    last_predicted = 0
+    consecutive_fails = 0
+    predictions = losses = inter_disables = 0
+    wins_by_offset = [0, 0, 0]
+    streak = best_win = best_loss = 0
+    rule_hits: Dict[int, List[int]] = {}   # origine * 52 + code déclencheur -> [gains, pertes]
+    previous = 0
+
+    for i, game in enumerate(games):
+        if reset_on_wrap and game < previous:
+            last_predicted = 0
+        previous = game
+
+        # --- Vérification (message finalisé du jeu N) ---
+        if pending:
+            mask = suit_masks[i]
+            # Peu de prédictions en attente : parcours direct plutôt que 6 recherches par jeu
+            for target in sorted(pending) if len(pending) > 1 else pending:
+                offset = game - target
+                if offset < 0 or offset > VERIFICATION_WINDOW: continue
+                suit, is_inter, key = pending[target]
+                if mask >> suit & 1 and offset <= MAX_WIN_OFFSET:
+                    del pending[target]
+                    wins_by_offset[offset] += 1
+                    consecutive_fails = 0
+                    rule_hits.setdefault(key, [0, 0])[0] += 1
+                    streak = streak + 1 if streak > 0 else 1
+                    best_win = max(best_win, streak)
+                    break
+                elif offset >= MAX_WIN_OFFSET:
+                    del pending[target]
+                    losses += 1
+                    rule_hits.setdefault(key, [0, 0])[1] += 1
+                    if is_inter:
+                        active = False
+                        inter_disables += 1
+                    else:
+                        consecutive_fails += 1
+                        if consecutive_fails >= STATIC_FAILS_BEFORE_INTER:
+                            active = True
+                    streak = streak - 1 if streak < 0 else -1
+                    best_loss = max(best_loss, -streak)
+                    break
+
+        # --- Prédiction (1ère carte du jeu N -> jeu N+2) ---
+        if last_predicted and game - last_predicted < PREDICTION_GAP: continue
+        suit = inter_decisions[i] if active and has_rules else -1
+        key = first_codes[i]
+        if suit < 0:
+            suit = static_decisions[i]
+            key += CARD_COUNT
+        if suit < 0: continue
+        pending[game + 2] = (suit, active, key)
+        last_predicted = game
+        consecutive_fails = 0
+        predictions += 1
+
+    wins = sum(wins_by_offset)
+    resolved = wins + losses
+    return BacktestResult(
+        name=rule_set.name,
+        predictions=predictions,
+        wins=wins,
+        losses=losses,
+        wins_by_offset=tuple(wins_by_offset),
+        win_rate=wins / resolved if resolved else 0.0,
+        longest_win_streak=best_win,
+        longest_loss_streak=best_loss,
+        inter_disables=inter_disables,
+        unresolved=len(pending),
+        rule_hits={
+            f"{'STATIQUE' if key >= CARD_COUNT else 'INTER'} {decode_card(key % CARD_COUNT)}": (w, l)
+            for key, (w, l) in rule_hits.items()
+        },
+    )
+
+
+# --- Évaluation en parallèle ---
+_worker_outcomes: Optional[Outcomes] = None
+_worker_static: Optional[Tuple[int, ...]] = None
+_worker_reset_on_wrap = False
+
+
+def _init_worker(outcomes: Outcomes, reset_on_wrap: bool) -> None:
+    global _worker_outcomes, _worker_static, _worker_reset_on_wrap
+    _worker_outcomes = outcomes
+    _worker_static = static_table()
+    _worker_reset_on_wrap = reset_on_wrap
+
+
+def _simulate_batch(rule_sets: List[RuleSet]) -> List[BacktestResult]:
+    return [simulate(rule_set, _worker_outcomes, _worker_static, _worker_reset_on_wrap) for rule_set in rule_sets]
+
+
+def run_backtests(rule_sets: Sequence[RuleSet], outcomes: Outcomes, workers: Optional[int] = None,
+                  batch_size: int = 16, reset_on_wrap: bool = False) -> List[BacktestResult]:
+    """Évalue les jeux de règles (pool de processus ; l'historique n'est transmis qu'une fois par processus)."""
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    if workers <= 1 or len(rule_sets) <= batch_size:
+        static = static_table()
+        return [simulate(rule_set, outcomes, static, reset_on_wrap) for rule_set in rule_sets]
+
+    batches = [list(rule_sets[i:i + batch_size]) for i in range(0, len(rule_sets), batch_size)]
+    results: List[BacktestResult] = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(outcomes, reset_on_wrap)) as pool:
+        for batch in pool.map(_simulate_batch, batches):
+            results.extend(batch)
+    return results
+
+
+# --- Jeux de règles candidats ---
+def rule_set_from_smart_rules(name: str, smart_rules: List[Dict], inter_active: bool = True) -> RuleSet:
+    rules = []
+    for rule in smart_rules or []:
+        code, suit = encode_card(rule.get('trigger', '')), suit_index(rule.get('predict', ''))
+        if code is not None and suit is not None:
+            rules.append((code, suit))
+    return RuleSet(name, tuple(rules), inter_active)
+
+
+def candidate_rule_sets(entries: Sequence[GameCards], max_top: int = 5, random_sets: int = 0,
+                        seed: int = 0) -> List[RuleSet]:
+    """
+    Candidats tirés de l'historique : Top 1..max_top déclencheurs (1ère carte N-2 -> enseigne N)
+    pour chaque sous-ensemble non vide d'enseignes, plus « statique seul » et des jeux aléatoires.
+    """
+    table = cooccurrence(entries, (2,))[2]
+    ranked = []
+    for suit in range(SUIT_COUNT):
+        codes = [code for code in range(CARD_COUNT) if table.counts[code * SUIT_COUNT + suit]]
+        codes.sort(key=lambda code: -table.counts[code * SUIT_COUNT + suit])
+        ranked.append(codes)
+
+    rule_sets = [RuleSet('statique', (), False)]
+    for top in range(1, max_top + 1):
+        for subset in range(1, 1 << SUIT_COUNT):
+            rules = tuple(
+                (code, suit) for suit in range(SUIT_COUNT) if subset >> suit & 1 for code in ranked[suit][:top]
+            )
+            label = ''.join(SUITS[s] for s in range(SUIT_COUNT) if subset >> s & 1)
+            rule_sets.append(RuleSet(f"top{top} {label}", rules))
+
+    rng = random.Random(seed)
+    for n in range(random_sets):
+        rules = tuple((rng.randrange(CARD_COUNT), rng.randrange(SUIT_COUNT)) for _ in range(rng.randint(2, 8)))
+        rule_sets.append(RuleSet(f"aléatoire {n + 1}", rules))
+    return rule_sets
+
+
+# --- Chargement de l'historique ---
+def load_entries(source: Optional[str] = None, archive_dir: Optional[str] = None) -> List[GameCards]:
+    """
+    Historique des cartes par jeu : fichier game_cards.json, ou backend actif par défaut,
+    précédé des cartes archivées (archives mensuelles de archive_dir) si demandé.
+    """
+    from rule_mining import GameCardHistory
+
+    document = None
+    if source:
+        with open(source, 'r') as f:
+            document = json.load(f)
+    else:
+        from config import STORAGE_BACKEND, SQLITE_PATH
+        if STORAGE_BACKEND == 'sqlite':
+            from sqlite_store import SQLiteStore
+            document = SQLiteStore(SQLITE_PATH).load_document('game_cards.json')
+        elif os.path.exists('game_cards.json'):
+            with open('game_cards.json', 'r') as f:
+                document = json.load(f)
+    entries = list(GameCardHistory.from_document(document, maxlen=None).entries)
+    if archive_dir:
+        from archive import MonthlyArchive, ARCHIVE_GAME_CARDS
+        hot = {entry[0] for entry in entries}
+        archived, seen = [], set()
+        for record in MonthlyArchive(archive_dir).iter_records(ARCHIVE_GAME_CARDS):
+            seq = record['seq']
+            # Doublons possibles après un arrêt pendant l'archivage
+            if seq in hot or seq in seen: continue
+            seen.add(seq)
+            archived.append((seq, record['game'], tuple(record['g1']), tuple(record['g2'])))
+        archived.sort(key=lambda entry: entry[0])
+        entries = archived + entries
+    return entries
+
+
+def format_result(result: BacktestResult) -> str:
+    return (f"{result.name:<22} {result.win_rate:6.1%}  {result.wins:>5}/{result.wins + result.losses:<5} "
+            f"✅0/1/2={'/'.join(map(str, result.wins_by_offset))}  "
+            f"séries +{result.longest_win_streak}/-{result.longest_loss_streak}  "
+            f"INTER off={result.inter_disables}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Backtest des règles sur l'historique collecté")
+    parser.add_argument('--source', help="Fichier game_cards.json (défaut : backend actif)")
+    parser.add_argument('--archives', help="Inclure les cartes archivées de ce dossier (ex. archives)")
+    parser.add_argument('--top', type=int, default=5, help="Top N déclencheurs par enseigne (candidats)")
+    parser.add_argument('--random', type=int, default=0, help="Jeux de règles aléatoires supplémentaires")
+    parser.add_argument('--train', type=float, default=0.5,
+                        help="Part de l'historique servant à choisir les candidats (le reste est rejoué)")
+    parser.add_argument('--workers', type=int, default=None, help="Processus (défaut : nombre de CPU)")
+    parser.add_argument('--reset-on-wrap', action='store_true',
+                        help="Remet à zéro le dernier jeu prédit quand la numérotation repart à 1")
+    parser.add_argument('--show', type=int, default=15, help="Nombre de résultats affichés")
+    args = parser.parse_args(argv)
+
+    entries = load_entries(args.source, args.archives)
+    if not entries:
+        print("⚠️ Aucun historique de cartes (game_cards.json) à rejouer.")
+        return 1
+
+    split = int(len(entries) * args.train)
+    train, test = (entries[:split], entries[split:]) if 0 < split < len(entries) else (entries, entries)
+    rule_sets = candidate_rule_sets(train, args.top, args.random)
+    outcomes = build_outcomes(test)
+
+    started = time.perf_counter()
+    results = run_backtests(rule_sets, outcomes, args.workers, reset_on_wrap=args.reset_on_wrap)
+    elapsed = time.perf_counter() - started
+
+    print(f"📊 {len(rule_sets)} jeux de règles × {len(test)} jeux rejoués en {elapsed:.2f} s "
+          f"(candidats choisis sur {len(train)} jeux)\n")
+    results.sort(key=lambda r: (-r.win_rate, -r.wins))
+    for result in results[:args.show]:
+        print(format_result(result))
+
+    best = results[0]
+    if best.rule_hits:
+        print(f"\n🎯 Taux de réussite par règle ({best.name}) :")
+        for key, (wins, losses) in sorted(best.rule_hits.items(), key=lambda kv: -sum(kv[1])):
+            print(f"  {key:<16} {wins / (wins + losses):6.1%}  ({wins}/{wins + losses})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
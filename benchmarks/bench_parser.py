@@ -0,0 +1,132 @@
+# benchmarks/bench_parser.py
+
+"""
+Micro-benchmark de l'analyse des messages source : ancien pipeline (regex non
+compilées relancées à chaque étape) contre l'analyse unique `parse_message`.
+
+    python -m benchmarks.bench_parser [--messages 20000]
+"""
+import re
+import time
+import random
+import argparse
+from typing import List, Optional, Tuple
+
+from message_parser import parse_message
+
+RANKS = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K']
+SUITS = ['♠️', '❤️', '♦️', '♣️']
+
+
+class LegacyPipeline:
+    """Copie des extracteurs d'origine de CardPredictor (référence 'avant')."""
+
+    def extract_game_number(self, message: str) -> Optional[int]:
+        match = re.search(r'#N(\d+)\.', message, re.IGNORECASE)
+        if not match: match = re.search(r'🔵(\d+)🔵', message)
+        return int(match.group(1)) if match else None
+
+    def _extract_parentheses_content(self, text: str) -> List[str]:
+        return re.findall(r'\(([^)]+)\)', text)
+
+    def _count_cards_in_content(self, content: str) -> int:
+        normalized_content = content.replace("❤️", "♥️")
+        return len(re.findall(r'(\d+|[AKQJ])(♠️|♥️|♦️|♣️)', normalized_content, re.IGNORECASE))
+
+    def has_completion_indicators(self, text: str) -> bool:
+        return any(indicator in text for indicator in ['✅', '🔰'])
+
+    def is_final_result_structurally_valid(self, text: str) -> bool:
+        matches = self._extract_parentheses_content(text)
+        if len(matches) < 2: return False
+        if '#T' in text or '🔵#R' in text: return True
+        if len(matches) == 2:
+            counts = (self._count_cards_in_content(matches[0]), self._count_cards_in_content(matches[1]))
+            return counts in ((3, 2), (3, 3), (2, 3))
+        return False
+
+    def extract_card_details(self, content: str) -> List[Tuple[str, str]]:
+        normalized_content = content.replace("♥️", "❤️")
+        return re.findall(r'(\d+|[AKQJ])(♠️|❤️|♦️|♣️)', normalized_content, re.IGNORECASE)
+
+    def get_first_card_info(self, message: str) -> Optional[Tuple[str, str]]:
+        match = re.search(r'\(([^)]*)\)', message)
+        if not match: return None
+        details = self.extract_card_details(match.group(1))
+        if details:
+            v, c = details[0]
+            if c == "❤️": c = "♥️"
+            return f"{v.upper()}{c}", c
+        return None
+
+    def get_all_cards_in_first_group(self, message: str) -> List[str]:
+        match = re.search(r'\(([^)]*)\)', message)
+        if not match: return []
+        return [f"{v.upper()}{'♥️' if c == '❤️' else c}" for v, c in self.extract_card_details(match.group(1))]
+
+    def process(self, text: str, predicted_costume: str = '♠️'):
+        """Étapes de handle_update pour un message du canal source."""
+        game_number = self.extract_game_number(text)              # handle_update
+        if game_number:
+            self.get_first_card_info(text)                         # collect_inter_data
+        if self.has_completion_indicators(text):
+            self.extract_game_number(text)                         # _verify_prediction_common
+            if self.is_final_result_structurally_valid(text):
+                cards = self.get_all_cards_in_first_group(text)    # check_costume_in_first_parentheses
+                any(c.endswith(predicted_costume) for c in cards)
+        self.extract_game_number(text)                             # should_predict
+        return self.get_first_card_info(text)
+
+
+def process_parsed(text: str, predicted_costume: str = '♠️'):
+    """Mêmes étapes avec une seule analyse."""
+    parsed = parse_message(text)
+    if parsed.has_completion and parsed.is_structurally_valid:
+        any(c.endswith(predicted_costume) for c in parsed.first_group_cards)
+    return (parsed.first_card, parsed.first_suit) if parsed.first_card else None
+
+
+def sample_messages(count: int, seed: int = 42) -> List[str]:
+    rng = random.Random(seed)
+    messages = []
+    for i in range(count):
+        game = 100 + i
+        g1 = ''.join(rng.choice(RANKS) + rng.choice(SUITS) for _ in range(rng.choice((2, 3))))
+        g2 = ''.join(rng.choice(RANKS) + rng.choice(SUITS) for _ in range(rng.choice((2, 3))))
+        status = rng.choice(('⏰', '▶', '✅', '🔰'))
+        if rng.random() < 0.5:
+            messages.append(f"#N{game}. {status}{rng.randint(0, 9)}({g1}) - {rng.randint(0, 9)}({g2}) #T{rng.randint(1, 9)}")
+        else:
+            messages.append(f"🔵{game}🔵 {status}({g1}) - ({g2}) 🔵#R")
+    return messages
+
+
+def bench(label: str, fn, messages: List[str]) -> float:
+    started = time.perf_counter()
+    for text in messages:
+        fn(text)
+    elapsed = time.perf_counter() - started
+    rate = len(messages) / elapsed
+    print(f"{label:<28} {rate:>12,.0f} messages/s")
+    return rate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=20000)
+    args = parser.parse_args()
+
+    messages = sample_messages(args.messages)
+    legacy = LegacyPipeline()
+
+    # Contrôle d'équivalence avant mesure
+    for text in messages:
+        assert legacy.process(text) == process_parsed(text), text
+
+    before = bench("avant (regex par étape)", legacy.process, messages)
+    after = bench("après (parse_message)", process_parsed, messages)
+    print(f"{'gain':<28} {after / before:>12.2f}x")
+
+
+if __name__ == '__main__':
+    main()
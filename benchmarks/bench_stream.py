@@ -0,0 +1,404 @@
+# benchmarks/bench_stream.py
+
+"""
+Banc de charge du chemin chaud sur un flux synthétique (benchmarks/game_stream.py) :
+- cible `predictor` : CardPredictor seul (analyse, collecte INTER, vérification, prédiction),
+  dans l'ordre des étapes de TelegramHandlers.handle_update ;
+- cible `handlers` : TelegramHandlers.handle_update complet, API Telegram remplacée par le
+  faux serveur local (latence/erreurs injectables) ; mesure aussi la latence
+  update finale -> editMessageText reçu par l'API.
+Rythme : `--speed max` (débit brut) ou un multiple du rythme réel (`--speed 100` = 100 jeux/min).
+Rapport : débit, percentiles de latence par update, durées par étape, croissance du RSS,
+puis démarrage à froid sur l'état produit (processus neufs : fichiers d'état contre instantané binaire).
+`--save` écrit le rapport JSON ; `--baseline` le compare à un rapport précédent
+(code de sortie 1 si une régression dépasse la tolérance).
+
+    python -m benchmarks.bench_stream [--target predictor|handlers] [--games 100000] [--speed max]
+"""
+import os
+import re
+import sys
+import json
+import time
+import array
+import logging
+import argparse
+import tempfile
+import subprocess
+from typing import Any, Dict, Optional
+
+from benchmarks.game_stream import REAL_GAME_SECONDS, GameStream
+
+# Points de mesure du RSS au cours du banc
+CHECKPOINTS = 10
+# Modèle du message de résultat édité par le bot
+RESULT_TEXT_RE = re.compile(r'🔵(\d+)🔵:Enseigne .* statut :(.+)$')
+# Démarrage mesuré dans un processus neuf (imports compris), comme une instance Render réveillée
+STARTUP_SCRIPT = '''
+import json, time, logging
+logging.disable(logging.INFO)
+t0 = time.perf_counter()
+from card_predictor import CardPredictor
+t1 = time.perf_counter()
+predictor = CardPredictor()
+t2 = time.perf_counter()
+predictor.shutdown()
+print(json.dumps({'import_s': t1 - t0, 'init_s': t2 - t1, 'snapshot': predictor.loaded_from_snapshot}))
+'''
+
+
+def rss_mb() -> float:
+    """Mémoire résidente actuelle (Linux : /proc/self/statm ; sinon pic via resource)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def percentile(sorted_values, p: float) -> float:
+    if not sorted_values: return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+class PredictorTarget:
+    """Étapes de handle_update pour le canal source, sans Telegram."""
+
+    def __init__(self):
+        from card_predictor import CardPredictor
+        from message_parser import ParseCache
+        from config import PARSE_CACHE_SIZE
+        from metrics import timed
+        self.timed = timed
+        self.predictor = CardPredictor(telegram_message_sender=lambda *args, **kwargs: None)
+        self.parse_cache = ParseCache(PARSE_CACHE_SIZE)
+        self.next_message_id = 1
+
+    def handle(self, update: Dict[str, Any]) -> None:
+        timed = self.timed
+        edited = 'edited_channel_post' in update
+        text = (update.get('edited_channel_post') or update['channel_post'])['text']
+        with timed('parse'):
+            parsed, is_valid, seen = self.parse_cache.lookup(text)
+        if edited and seen: return
+        predictor = self.predictor
+        if parsed.game_number:
+            with timed('collect'):
+                predictor.collect_inter_data(parsed.game_number, parsed)
+        if parsed.has_completion and (is_valid or not edited):
+            with timed('verify'):
+                if edited:
+                    predictor.verify_prediction_from_edit(parsed)
+                else:
+                    predictor._verify_prediction_common(parsed)
+        if not edited:
+            with timed('predict'):
+                ok, num, val = predictor.should_predict(parsed)
+            if ok:
+                with timed('record'):
+                    predictor.make_prediction(num, val, self.next_message_id)
+                self.next_message_id += 1
+
+    def finish(self) -> Dict[str, Any]:
+        self.predictor.shutdown()
+        return {}
+
+
+class HandlersTarget:
+    """TelegramHandlers.handle_update complet contre le faux serveur Telegram."""
+
+    def __init__(self, api_options: Dict[str, Any]):
+        from fake_telegram_api import FakeTelegramAPI
+        from replay import UNLIMITED_RATES
+
+        self.submitted: Dict[int, float] = {}       # jeu -> début du traitement de son résultat final
+        self.edit_latencies = array.array('d')
+        self.api = FakeTelegramAPI(listener=self._on_api_call, **api_options).start()
+        os.environ['TELEGRAM_API_BASE'] = self.api.base_url
+        os.environ['UPDATE_RECORD_FILE'] = ''
+        os.environ.setdefault('SHADOW_ENABLED', 'false')
+        for key, value in UNLIMITED_RATES.items():
+            os.environ.setdefault(key, value)
+
+        from handlers import TelegramHandlers
+        from card_predictor import SYMBOL_MAP
+        self.offsets = {symbol: offset for offset, symbol in SYMBOL_MAP.items()}
+        self.offsets['❌'] = 2
+        self.handlers = TelegramHandlers('123456:BENCH')
+        if self.handlers.rule_scheduler:
+            self.handlers.rule_scheduler.stop()
+        self.predictor = self.handlers.card_predictor
+
+    def handle(self, update: Dict[str, Any]) -> None:
+        post = update.get('edited_channel_post') or update.get('channel_post')
+        if '✅' in post['text'] or '🔰' in post['text']:
+            game = re.search(r'#N(\d+)\.|🔵(\d+)🔵', post['text'])
+            self.submitted[int(game.group(1) or game.group(2))] = time.perf_counter()
+        self.handlers.handle_update(update)
+
+    def _on_api_call(self, method: str, payload: Dict[str, Any], ts: float) -> None:
+        if method != 'editMessageText': return
+        match = RESULT_TEXT_RE.match(str(payload.get('text', '')))
+        if not match: return
+        offset = self.offsets.get(match.group(2).strip())
+        started = self.submitted.get(int(match.group(1)) + offset) if offset is not None else None
+        if started is not None:
+            self.edit_latencies.append(ts - started)
+
+    def finish(self) -> Dict[str, Any]:
+        self.handlers.outbound.join(timeout=60)
+        self.predictor.shutdown()
+        latencies = sorted(self.edit_latencies)
+        self.api.stop()
+        return {
+            'edit_latency': {
+                'count': len(latencies),
+                'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+                'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+                'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+            },
+            'fake_api': self.api.stats()['calls'],
+        }
+
+
+def measure_startup(workdir: str, runs: int = 3) -> Dict[str, Any]:
+    """
+    Démarrage à froid de CardPredictor dans des processus neufs sur l'état de `workdir` :
+    fichiers d'état seuls (PREDICTOR_SNAPSHOT=false) puis instantané binaire ; meilleur de `runs`.
+    Les processus à instantané passent d'abord : chacun le réécrit à l'arrêt s'il a changé l'état.
+    """
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [package_root, os.environ.get('PYTHONPATH')])))
+    results: Dict[str, Any] = {}
+    for mode, enabled in (('snapshot', 'true'), ('files', 'false')):
+        best = None
+        for _ in range(runs):
+            started = time.perf_counter()
+            output = subprocess.run(
+                [sys.executable, '-c', STARTUP_SCRIPT], cwd=workdir, capture_output=True, text=True,
+                env=dict(env, PREDICTOR_SNAPSHOT=enabled), check=True
+            ).stdout
+            sample = json.loads(output.strip().splitlines()[-1])
+            sample['process_s'] = time.perf_counter() - started
+            if best is None or sample['process_s'] < best['process_s']:
+                best = sample
+        results[mode] = {
+            'process_s': round(best['process_s'], 3),
+            'import_s': round(best['import_s'], 3),
+            'init_s': round(best['init_s'], 4),
+            'from_snapshot': best['snapshot'],
+        }
+    from snapshot import SNAPSHOT_FILE
+    path = os.path.join(workdir, SNAPSHOT_FILE)
+    results['snapshot_kb'] = round(os.path.getsize(path) / 1024, 1) if os.path.exists(path) else 0.0
+    return results
+
+
+def run(target: str = 'predictor', games: int = 100000, speed: Optional[float] = None, seed: int = 1,
+        wrap_at: Optional[int] = None, state_dir: Optional[str] = None,
+        api_options: Optional[Dict[str, Any]] = None, startup_runs: int = 3) -> Dict[str, Any]:
+    """speed : multiple du rythme réel (None = aussi vite que possible) ; startup_runs=0 : pas de mesure du démarrage."""
+    workdir = state_dir or tempfile.mkdtemp(prefix='bench-')
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+
+    bench = HandlersTarget(api_options or {}) if target == 'handlers' else PredictorTarget()
+    from replay import ReplayClock
+    from metrics import stage_metrics, timed
+    from config import RULE_ANALYSIS_INTERVAL
+
+    predictor = bench.predictor
+    clock = ReplayClock()
+    predictor.clock = clock.now
+    if target == 'handlers':
+        bench.handlers.clock = clock.now
+    stage_metrics.reset()
+
+    # Flux terminé « maintenant » : la rétention (horloge réelle au démarrage) voit des données récentes
+    stream = GameStream(seed, wrap_at=wrap_at, start_ts=time.time() - games * REAL_GAME_SECONDS)
+    # Tampon des latences alloué d'avance : il ne fausse pas la croissance du RSS (3 updates max par jeu)
+    latencies = array.array('d', bytes(8 * games * 3))
+    updates = 0
+    checkpoints = []
+    every = max(1, games // CHECKPOINTS)
+    rss_start = rss_mb()
+    first_ts = None
+    game_index = 0
+    started = time.perf_counter()
+
+    for event in stream.events(games):
+        if first_ts is None:
+            first_ts = event.ts
+            clock.current = event.ts
+        clock.set(event.ts)
+        if speed:
+            delay = started + (event.ts - first_ts) / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        t0 = time.perf_counter()
+        bench.handle(event.update)
+        latencies[updates] = time.perf_counter() - t0
+        updates += 1
+        with timed('analysis'):
+            predictor.check_and_update_rules(RULE_ANALYSIS_INTERVAL)
+        with timed('retention'):
+            predictor.apply_retention()
+
+        if 'channel_post' in event.update:
+            game_index += 1
+            if game_index % every == 0:
+                checkpoints.append({'games': game_index, 'elapsed_s': round(time.perf_counter() - started, 2),
+                                    'rss_mb': round(rss_mb(), 1)})
+    processing = time.perf_counter() - started
+    extra = bench.finish()
+
+    measured = sorted(latencies[:updates])
+    rss_end = rss_mb()
+    # Croissance en régime établi : depuis le premier point de mesure (10 % des jeux)
+    steady_from = checkpoints[0]['rss_mb'] if checkpoints else rss_start
+    totals = predictor.prediction_totals()
+    startup = measure_startup(workdir, startup_runs) if startup_runs > 0 else None
+
+    report = {
+        'bench': {
+            'target': target,
+            'games': games,
+            'updates': updates,
+            'speed': 'max' if not speed else f"x{speed:g}",
+            'seed': seed,
+            'state_dir': workdir,
+            'processing_s': round(processing, 3),
+            'updates_per_s': round(updates / processing, 1) if processing else 0.0,
+            'games_per_s': round(games / processing, 1) if processing else 0.0,
+        },
+        'latency': {
+            'p50_ms': round(percentile(measured, 50) * 1000, 3),
+            'p90_ms': round(percentile(measured, 90) * 1000, 3),
+            'p99_ms': round(percentile(measured, 99) * 1000, 3),
+            'max_ms': round(measured[-1] * 1000, 3) if measured else 0.0,
+        },
+        'rss': {
+            'start_mb': round(rss_start, 1),
+            'end_mb': round(rss_end, 1),
+            'growth_mb': round(rss_end - rss_start, 1),
+            'steady_growth_mb': round(rss_end - steady_from, 1),
+            'checkpoints': checkpoints,
+        },
+        'stages': stage_metrics.summary(),
+        'predictions': {status: totals.get(status, 0) for status in ('won', 'lost', 'expired', 'pending')},
+        **extra,
+    }
+    if startup:
+        report['startup'] = startup
+    return report
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> list:
+    """Régressions au-delà de la tolérance relative (débit en baisse, p99 ou RSS en hausse)."""
+    checks = [
+        ('latence p99 ms', report['latency']['p99_ms'], baseline['latency']['p99_ms'], True),
+        ('croissance RSS Mo', report['rss']['steady_growth_mb'], baseline['rss']['steady_growth_mb'], True),
+    ]
+    # Le débit n'est comparable qu'à rythme et cible identiques
+    if (report['bench']['speed'], report['bench']['target']) == (baseline['bench']['speed'], baseline['bench']['target']):
+        checks.insert(0, ('débit updates/s', report['bench']['updates_per_s'], baseline['bench']['updates_per_s'], False))
+    if 'startup' in report and 'startup' in baseline:
+        checks.append(('démarrage init s', report['startup']['snapshot']['init_s'], baseline['startup']['snapshot']['init_s'], True))
+    regressions = []
+    for label, current, previous, higher_is_worse in checks:
+        if not previous: continue
+        change = (current - previous) / abs(previous)
+        worse = change > tolerance if higher_is_worse else change < -tolerance
+        # Croissance RSS : ignorer les écarts de quelques Mo (bruit de l'allocateur)
+        if worse and label.startswith('croissance') and current - previous < 5: worse = False
+        # Démarrage : ignorer les écarts sous 10 ms (bruit du système de fichiers)
+        if worse and label.startswith('démarrage') and current - previous < 0.01: worse = False
+        print(f"{'⚠️' if worse else '✅'} {label:<20} {previous:>10} -> {current:<10} ({change:+.1%})")
+        if worse:
+            regressions.append(label)
+    return regressions
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    bench, latency, rss = report['bench'], report['latency'], report['rss']
+    lines = [
+        f"🏁 {bench['target']} : {bench['games']} jeux / {bench['updates']} updates ({bench['speed']}) "
+        f"en {bench['processing_s']} s → {bench['updates_per_s']:,.0f} updates/s, {bench['games_per_s']:,.0f} jeux/s",
+        f"⏱️ Latence par update : p50 {latency['p50_ms']} ms | p90 {latency['p90_ms']} ms | "
+        f"p99 {latency['p99_ms']} ms | max {latency['max_ms']} ms",
+        f"🧠 RSS : {rss['start_mb']} -> {rss['end_mb']} Mo (croissance {rss['growth_mb']} Mo, "
+        f"régime établi {rss['steady_growth_mb']} Mo)",
+        "   " + ' '.join(f"{c['games']}:{c['rss_mb']}" for c in rss['checkpoints']),
+        "",
+        f"{'Étape':<10} {'n':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'total ms':>10}",
+    ]
+    for stage, row in report['stages'].items():
+        lines.append(f"{stage:<10} {row['count']:>8} {row['p50_ms']:>8} {row['p99_ms']:>8} "
+                     f"{row['max_ms']:>8} {row['total_ms']:>10}")
+    lines += ["", f"🎯 Prédictions : {report['predictions']}"]
+    if 'edit_latency' in report:
+        edit = report['edit_latency']
+        lines.append(f"✏️ Update finale -> édition API : {edit['count']} éditions, p50 {edit['p50_ms']} ms, "
+                     f"p99 {edit['p99_ms']} ms, max {edit['max_ms']} ms")
+    if 'startup' in report:
+        startup = report['startup']
+        files, snap = startup['files'], startup['snapshot']
+        speedup = files['init_s'] / snap['init_s'] if snap['init_s'] else 0.0
+        lines.append(f"🚀 Démarrage à froid : fichiers {files['process_s']} s (init {files['init_s'] * 1000:.1f} ms) | "
+                     f"instantané {snap['process_s']} s (init {snap['init_s'] * 1000:.1f} ms, {startup['snapshot_kb']} Ko"
+                     f"{'' if snap['from_snapshot'] else ', non utilisé'}) → init ×{speedup:.1f}")
+    return '\n'.join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Banc de charge du chemin chaud sur un flux synthétique")
+    parser.add_argument('--target', choices=('predictor', 'handlers'), default='predictor')
+    parser.add_argument('--games', type=int, default=100000)
+    parser.add_argument('--speed', default='max', help="'max' ou multiple du rythme réel (10, 100, 1000…)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--wrap-at', type=int, help="Numérotation remise à 1 (ex. 1440 ; l'écart de 3 jeux "
+                                                    "bloque alors les prédictions après le premier tour)")
+    parser.add_argument('--state-dir', help="Dossier d'état (défaut : dossier temporaire)")
+    parser.add_argument('--api-latency-ms', type=float, default=0, help="Cible handlers : latence du faux serveur")
+    parser.add_argument('--api-jitter-ms', type=float, default=0)
+    parser.add_argument('--api-error-rate', type=float, default=0)
+    parser.add_argument('--api-rate-limit-rate', type=float, default=0)
+    parser.add_argument('--save', help="Écrire le rapport JSON dans ce fichier")
+    parser.add_argument('--baseline', help="Rapport JSON de référence à comparer")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Régression relative tolérée")
+    parser.add_argument('--startup-runs', type=int, default=3, help="Démarrages à froid mesurés par mode (0 : aucun)")
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    # Les modules du bot journalisent chaque message en INFO : coupé pendant la mesure
+    logging.disable(logging.INFO)
+    save = os.path.abspath(args.save) if args.save else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    report = run(
+        args.target, args.games, None if args.speed == 'max' else float(args.speed), args.seed,
+        args.wrap_at, args.state_dir,
+        api_options={
+            'latency': args.api_latency_ms / 1000, 'jitter': args.api_jitter_ms / 1000,
+            'error_rate': args.api_error_rate, 'rate_limit_rate': args.api_rate_limit_rate, 'seed': args.seed,
+        },
+        startup_runs=args.startup_runs
+    )
+    print(json.dumps(report, indent=2, ensure_ascii=False) if args.json else format_report(report))
+    if save:
+        with open(save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if baseline:
+        with open(baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"❌ Régression : {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
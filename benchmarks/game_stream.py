@@ -0,0 +1,170 @@
+# benchmarks/game_stream.py
+
+"""
+Générateur reproductible d'un flux réaliste du canal source, façon baccarat :
+- sabot de 8 jeux, tirage des troisièmes cartes selon les règles du punto banco
+  (groupes de 2 ou 3 cartes, naturels 8/9, égalités) ;
+- numérotation `#N123.` ou `🔵123🔵`, totaux devant les parenthèses au format #N ;
+- post temporaire ⏰, édition ▶ quand une troisième carte est tirée, puis édition finale ✅/🔰 ;
+  une partie des jeux est publiée directement finalisée ;
+- marqueurs `#T` / `🔵#R` sur les résultats finaux (toujours sur les 2/2 et les égalités,
+  sinon avec une probabilité donnée).
+Les événements sont des updates Telegram (channel_post / edited_channel_post) horodatées
+au rythme réel d'un jeu par minute.
+
+    python -m benchmarks.game_stream [--games 5] [--seed 1]
+"""
+import random
+import argparse
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+RANKS = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K']
+SUITS = ['♠️', '❤️', '♦️', '♣️']
+RANK_VALUES = {'A': 1, '10': 0, 'J': 0, 'Q': 0, 'K': 0, **{str(v): v for v in range(2, 10)}}
+
+# Canal source par défaut de CardPredictor
+SOURCE_CHANNEL_ID = -1002682552255
+# Rythme réel : un jeu par minute, édition ▶ et résultat final dans la minute
+REAL_GAME_SECONDS = 60.0
+DRAW_EDIT_DELAY = 15.0
+FINAL_EDIT_DELAY = 30.0
+SHOE_DECKS = 8
+SHOE_CUT = 14           # cartes restantes déclenchant un nouveau sabot
+
+
+class StreamEvent(NamedTuple):
+    ts: float
+    update: Dict[str, Any]
+
+
+class Shoe:
+    """Sabot de plusieurs jeux, rebattu sous la carte de coupe."""
+
+    def __init__(self, rng: random.Random, decks: int = SHOE_DECKS):
+        self.rng = rng
+        self.decks = decks
+        self.cards: List[str] = []
+
+    def draw(self) -> str:
+        if len(self.cards) <= SHOE_CUT:
+            self.cards = [rank + suit for rank in RANKS for suit in SUITS] * self.decks
+            self.rng.shuffle(self.cards)
+        return self.cards.pop()
+
+
+def card_value(card: str) -> int:
+    return RANK_VALUES[card[:-2]]
+
+
+def hand_total(cards: List[str]) -> int:
+    return sum(card_value(c) for c in cards) % 10
+
+
+def deal(shoe: Shoe) -> Tuple[List[str], List[str]]:
+    """Un coup complet : (cartes joueur, cartes banquier), troisièmes cartes selon le punto banco."""
+    player = [shoe.draw(), shoe.draw()]
+    banker = [shoe.draw(), shoe.draw()]
+    p, b = hand_total(player), hand_total(banker)
+    if p >= 8 or b >= 8:
+        return player, banker                       # naturel
+
+    third = None
+    if p <= 5:
+        player.append(shoe.draw())
+        third = card_value(player[2])
+
+    if third is None:
+        draw_banker = b <= 5
+    else:
+        draw_banker = (b <= 2 or (b == 3 and third != 8) or (b == 4 and 2 <= third <= 7)
+                       or (b == 5 and 4 <= third <= 7) or (b == 6 and third in (6, 7)))
+    if draw_banker:
+        banker.append(shoe.draw())
+    return player, banker
+
+
+class GameStream:
+    """Flux d'updates du canal source (reproductible à graine égale)."""
+
+    def __init__(self, seed: int = 1, start_game: int = 1, wrap_at: Optional[int] = None,
+                 blue_ratio: float = 0.3, direct_ratio: float = 0.1, marker_ratio: float = 0.3,
+                 star_ratio: float = 0.1, chat_id: int = SOURCE_CHANNEL_ID, start_ts: float = 1760000000.0):
+        """wrap_at : numérotation remise à 1 après ce numéro (comme le canal réel, 1440) ; None = croissante."""
+        self.rng = random.Random(seed)
+        self.shoe = Shoe(self.rng)
+        self.game = start_game
+        self.wrap_at = wrap_at
+        self.blue_ratio = blue_ratio
+        self.direct_ratio = direct_ratio
+        self.marker_ratio = marker_ratio
+        self.star_ratio = star_ratio
+        self.chat_id = chat_id
+        self.ts = start_ts
+        self.message_id = 1
+        self.update_id = 1
+
+    def events(self, games: int) -> Iterator[StreamEvent]:
+        for _ in range(games):
+            yield from self._game_events()
+            self.ts += REAL_GAME_SECONDS
+            self.game = 1 if self.wrap_at and self.game >= self.wrap_at else self.game + 1
+
+    def messages(self, games: int) -> Iterator[str]:
+        """Textes seuls, dans l'ordre de publication."""
+        for event in self.events(games):
+            post = event.update.get('channel_post') or event.update['edited_channel_post']
+            yield post['text']
+
+    # --- Construction des messages ---
+    def _game_events(self) -> Iterator[StreamEvent]:
+        player, banker = deal(self.shoe)
+        blue = self.rng.random() < self.blue_ratio
+        message_id = self.message_id
+        self.message_id += 1
+        final = self._text(player, banker, '🔰' if self.rng.random() < self.star_ratio else '✅', blue, final=True)
+
+        if self.rng.random() < self.direct_ratio:
+            yield self._event(self.ts, 'channel_post', message_id, final)
+            return
+        yield self._event(self.ts, 'channel_post', message_id, self._text(player[:2], banker[:2], '⏰', blue))
+        if len(player) == 3 or len(banker) == 3:
+            yield self._event(self.ts + DRAW_EDIT_DELAY, 'edited_channel_post', message_id,
+                              self._text(player, banker[:2], '▶', blue))
+        yield self._event(self.ts + FINAL_EDIT_DELAY, 'edited_channel_post', message_id, final)
+
+    def _text(self, player: List[str], banker: List[str], status: str, blue: bool, final: bool = False) -> str:
+        p, b = ''.join(player), ''.join(banker)
+        marker = final and (
+            (len(player), len(banker)) == (2, 2) or hand_total(player) == hand_total(banker)
+            or self.rng.random() < self.marker_ratio
+        )
+        if blue:
+            return f"🔵{self.game}🔵 {status}({p}) - ({b})" + (" 🔵#R" if marker else "")
+        return (f"#N{self.game}. {status}{hand_total(player)}({p}) - {hand_total(banker)}({b})"
+                + (f" #T{hand_total(player) + hand_total(banker)}" if marker else ""))
+
+    def _event(self, ts: float, kind: str, message_id: int, text: str) -> StreamEvent:
+        post = {'message_id': message_id, 'chat': {'id': self.chat_id, 'type': 'channel'},
+                'date': int(self.ts), 'text': text}
+        if kind == 'edited_channel_post':
+            post['edit_date'] = int(ts)
+        update = {'update_id': self.update_id, kind: post}
+        self.update_id += 1
+        return StreamEvent(ts, update)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Aperçu du flux synthétique du canal source")
+    parser.add_argument('--games', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--wrap-at', type=int, help="Numérotation remise à 1 après ce numéro (ex. 1440)")
+    args = parser.parse_args()
+
+    for event in GameStream(args.seed, wrap_at=args.wrap_at).events(args.games):
+        kind = 'edit' if 'edited_channel_post' in event.update else 'post'
+        post = event.update.get('channel_post') or event.update['edited_channel_post']
+        print(f"{event.ts:.0f} {kind:<4} {post['text']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,13 +5,14 @@ Telegram Bot implementation with advanced features and deployment capabilities
 """
 import os
 import logging
-import requests
 import json
 from typing import Dict, Any, Optional
 
 # Importation des classes de logique métier
 from handlers import TelegramHandlers
 from card_predictor import CardPredictor 
+from telegram_client import get_client
+from metrics import timed, increment
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -24,7 +25,8 @@ class TelegramBot:
 
     def __init__(self, token: str):
         self.token = token
-        self.base_url = f"https://api.telegram.org/bot{token}"
+        self.client = get_client(token)
+        self.base_url = self.client.base_url
         self.deployment_file_path = "final2025.zip" 
         
         # Initialize advanced handlers
@@ -48,9 +50,11 @@ class TelegramBot:
                  logger.info(f"🔄 Bot traite clic de bouton (callback_query)")
 
             logger.debug(f"Received update: {json.dumps(update, indent=2)}")
+            increment('updates_total', {'type': next((key for key in update if key != 'update_id'), 'unknown')})
 
             # Délégation du traitement complet aux handlers
-            self.handlers.handle_update(update)
+            with timed('update'):
+                self.handlers.handle_update(update)
             
             logger.info(f"✅ Update traité avec succès via webhook")
 
@@ -67,8 +71,6 @@ class TelegramBot:
     def send_document(self, chat_id: int, file_path: str) -> bool:
         """Send document file to user (Méthode incluse pour respecter le schéma)"""
         try:
-            url = f"{self.base_url}/sendDocument"
-
             if not os.path.exists(file_path):
                 logger.error(f"File not found for sending: {file_path}")
                 return False
@@ -82,8 +84,8 @@ class TelegramBot:
                     'caption': '📦 Deployment Package for render.com'
                 }
 
-                response = requests.post(url, data=data, files=files, timeout=60)
-                return response.json().get('ok', False)
+                response = self.client.call('sendDocument', data=data, files=files, timeout=60)
+                return bool(response and response.get('ok', False))
         except Exception as e:
             logger.error(f"Error sending document: {e}")
             return False
@@ -91,25 +93,20 @@ class TelegramBot:
     def set_webhook(self, webhook_url: str) -> bool:
         """Set webhook URL for the bot"""
         try:
-            url = f"{self.base_url}/setWebhook"
             # MISE À JOUR CRITIQUE: Inclure 'callback_query' et 'my_chat_member'
             data = {
                 'url': webhook_url,
                 'allowed_updates': ['message', 'edited_message', 'channel_post', 'edited_channel_post', 'callback_query', 'my_chat_member']
             }
 
-            response = requests.post(url, json=data, timeout=10)
-            result = response.json()
-            if result.get('ok'):
+            result = self.client.call('setWebhook', data, timeout=10)
+            if result and result.get('ok'):
                 logger.info(f"Webhook set successfully: {webhook_url}")
                 return True
             else:
                 logger.error(f"Failed to set webhook: {result}")
                 return False
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Network error setting webhook: {e}")
-            return False
         except Exception as e:
             logger.error(f"Error setting webhook: {e}")
             return False
@@ -117,10 +114,8 @@ class TelegramBot:
     def get_bot_info(self) -> Dict[str, Any]:
         """Get bot information"""
         try:
-            url = f"{self.base_url}/getMe"
-            response = requests.get(url, timeout=30)
-            result = response.json()
-            return result.get('result', {}) if result.get('ok') else {}
+            result = self.client.call('getMe', timeout=30, http_method='GET')
+            return result.get('result', {}) if result and result.get('ok') else {}
         except Exception as e:
             logger.error(f"Error getting bot info: {e}")
             return {}
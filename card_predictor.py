@@ -1,13 +1,40 @@
 # card_predictor.py
 
-import re
 import logging
 import time
 import os
 import json
+import bisect
+import threading
 from datetime import datetime
-from typing import Optional, Dict, List, Tuple, Any
+from functools import partial
+from typing import Optional, Callable, Dict, Iterable, List, Set, Tuple, Any, Union
 from collections import defaultdict
+from itertools import chain
+
+from config import (
+    PERSIST_FLUSH_INTERVAL, PERSIST_DIRTY_THRESHOLD,
+    JOURNAL_COMPACT_EVERY, JOURNAL_COMPACT_INTERVAL,
+    STORAGE_BACKEND, SQLITE_PATH,
+    MINING_HISTORY_SIZE, MINING_OFFSETS, MINING_MIN_COUNT,
+    INTER_STATS_MODE, INTER_WINDOW_SIZE, INTER_DECAY_HALF_LIFE, INTER_DATA_MAX_SAMPLES,
+    RETENTION_DAYS, RETENTION_PENDING_GAMES, RETENTION_INTERVAL, ARCHIVE_DIR,
+    PREDICTOR_SNAPSHOT_ENABLED, PREDICTOR_SNAPSHOT_INTERVAL, MULTI_WORKER
+)
+from persistence import PersistenceEngine, atomic_write_bytes, atomic_write_text
+from journal import AppendOnlyJournal
+from archive import (
+    PredictionArchive, MonthlyArchive, month_of,
+    ARCHIVE_PREDICTIONS, ARCHIVE_INTER_SAMPLES, ARCHIVE_GAME_CARDS
+)
+from inter_stats import InterStats, RESULT_SUITS
+from snapshot import SNAPSHOT_FILE, encode_snapshot, file_signature, read_snapshot
+from worker_coordination import FileLock
+from rule_mining import GameCardHistory, MinedRule, mine_rules
+from sqlite_store import SQLiteStore
+from message_parser import ParsedMessage, as_parsed, normalize_cards
+from metrics import timed, increment
+from cards import CARD_COUNT, encode_card, normalize_suit, suit_index, SUIT_INDEX
 
 logger = logging.getLogger(__name__)
 # Mis à jour à DEBUG pour vous aider à tracer la collecte.
@@ -28,11 +55,134 @@ STATIC_RULES = {
 # Symboles pour les status de vérification
 SYMBOL_MAP = {0: '✅0️⃣', 1: '✅1️⃣', 2: '✅2️⃣'}
 
+# Fichiers persistés -> attribut correspondant de CardPredictor
+PERSISTED_FILES = {
+    'predictions.json': 'predictions',
+    'processed.json': 'processed_messages',
+    'last_prediction_time.json': 'last_prediction_time',
+    'last_predicted_game_number.json': 'last_predicted_game_number',
+    'consecutive_fails.json': 'consecutive_fails',
+    'inter_data.json': 'inter_data',
+    'sequential_history.json': 'sequential_history',
+    'inter_mode_status.json': 'is_inter_mode_active',
+    'smart_rules.json': 'smart_rules',
+    'active_admin_chat_id.json': 'active_admin_chat_id',
+    'last_analysis_time.json': 'last_analysis_time',
+    'pending_edits.json': 'pending_edits',
+    'collected_games.json': 'collected_games',
+}
+
+# Fichiers alimentés par le journal INTER (réécrits uniquement lors de la compaction)
+INTER_JOURNAL_FILE = 'inter_journal.jsonl'
+JOURNALED_FILES = ('inter_data.json', 'sequential_history.json', 'collected_games.json', 'game_cards.json', 'inter_retired.json')
+
+# Agrégats (déclencheur, enseigne, compte) des échantillons INTER sortis de la mémoire
+INTER_RETIRED_FILE = 'inter_retired.json'
+
+# Cartes des groupes 1 et 2 par jeu (recherche de règles multi-décalages, voir rule_mining.py)
+GAME_CARDS_FILE = 'game_cards.json'
+
+# Nombre de jeux conservés dans l'historique séquentiel
+HISTORY_WINDOW = 50
+
+# Dernière prédiction : réservée par compare-and-set entre processus (MULTI_WORKER), verrou du mode JSON
+CLAIM_FILES = ('last_predicted_game_number.json', 'last_prediction_time.json')
+STATE_LOCK_FILE = 'state.lock'
+
+# Attributs d'état repris tels quels de l'instantané binaire (voir snapshot.py)
+SNAPSHOT_ATTRS = (
+    'predictions', 'processed_messages', 'last_prediction_time', 'last_predicted_game_number',
+    'consecutive_fails', 'pending_edits', 'config_data', 'active_admin_chat_id',
+    'sequential_history', 'inter_data', '_inter_seq', '_inter_by_game', '_inter_stats', 'game_cards',
+    '_is_inter_mode_active', '_smart_rules', 'last_analysis_time', 'collected_games', '_oldest_resolved',
+)
+
+class ImportedHistory:
+    """
+    État collecté par un import d'historique, tenu à part de l'état en direct pendant l'import
+    (fenêtre séquentielle, cartes par jeu, échantillons INTER), puis fusionné en une seule étape.
+    """
+
+    def __init__(self):
+        self.sequential_history: Dict[int, Dict] = {}
+        self.collected_games: Set[int] = set()
+        self.game_cards = GameCardHistory(maxlen=None)
+        self.inter_data: List[Optional[Dict]] = []
+        self._inter_by_game: Dict[int, List[int]] = {}   # jeu -> positions dans inter_data
+        self.last_date: Optional[str] = None
+
+    def apply(self, record: Dict):
+        """Même effet que CardPredictor._apply_journal_record, limité à l'historique importé."""
+        op = record['op']
+        if op == 'hist':
+            game_number = record['game']
+            self.sequential_history[game_number] = {'carte': record['carte'], 'date': record['date']}
+            self.collected_games.add(game_number)
+            self.last_date = record['date']
+            limit = game_number - record.get('window', HISTORY_WINDOW)
+            self.sequential_history = {k: v for k, v in self.sequential_history.items() if k >= limit}
+            self.collected_games = {g for g in self.collected_games if g >= limit}
+        elif op == 'inter':
+            entry = record['entry']
+            self._inter_by_game.setdefault(entry['numero_resultat'], []).append(len(self.inter_data))
+            self.inter_data.append(entry)
+        elif op == 'inter_del':
+            for index in self._inter_by_game.pop(record['game'], ()):
+                self.inter_data[index] = None
+        elif op == 'cards':
+            self.game_cards.apply(record)
+
+    def samples(self) -> List[Dict]:
+        return [entry for entry in self.inter_data if entry is not None]
+
+
 class CardPredictor:
     """Gère la logique de prédiction d'ENSEIGNE (Couleur) et la vérification."""
 
     def __init__(self, telegram_message_sender=None):
         
+        # Backend optionnel SQLite (sinon fichiers JSON)
+        self._store: Optional[SQLiteStore] = SQLiteStore(SQLITE_PATH) if STORAGE_BACKEND == 'sqlite' else None
+        
+        # Verrou d'état (partagé avec le thread de persistance)
+        self._lock = threading.RLock()
+        
+        # Horloge des règles temporelles (délai anti-spam, analyse périodique) ; remplaçable au rejeu
+        self.clock: Callable[[], float] = time.time
+        
+        # Table de décision compilée (code carte -> (enseigne prédite, origine)), voir _rebuild_decision_table
+        self._table_lock = threading.Lock()
+        self._smart_rules: List[Dict] = []
+        self._is_inter_mode_active: Optional[bool] = None
+        self._decision_table: Tuple[Optional[Tuple[str, str]], ...] = (None,) * CARD_COUNT
+        self._persistence = PersistenceEngine(
+            self._serialize_file, self._lock,
+            flush_interval=PERSIST_FLUSH_INTERVAL,
+            dirty_threshold=PERSIST_DIRTY_THRESHOLD,
+            writer=self._write_serialized,
+            maintenance=self._maintenance,
+            on_stop=partial(self.write_snapshot, force=True)
+        )
+        if self._store:
+            self._journal = self._store.journal()
+        else:
+            self._journal = AppendOnlyJournal(
+                INTER_JOURNAL_FILE,
+                compact_every=JOURNAL_COMPACT_EVERY,
+                compact_interval=JOURNAL_COMPACT_INTERVAL
+            )
+        # Verrou inter-processus des fichiers de réservation (mode JSON ; SQLite a ses transactions)
+        self._state_file_lock = FileLock(STATE_LOCK_FILE) if MULTI_WORKER and not self._store else None
+        # Réservation en cours : (jeu, jeu précédent, heure précédente), pour l'annuler si l'envoi échoue
+        self._claim_rollback: Optional[Tuple[int, int, float]] = None
+        # Prédictions résolues (hors du dictionnaire chaud)
+        self._archive = self._store.prediction_archive() if self._store else PredictionArchive()
+        # Archives gzip mensuelles des données sorties de la fenêtre chaude (voir apply_retention)
+        self._monthly = MonthlyArchive(ARCHIVE_DIR)
+        self._last_retention = 0.0
+        # Plus ancien `resolved_at` de l'archive chaude (None : inconnu, calculé à la prochaine passe)
+        self._oldest_resolved: Optional[float] = None
+
         # <<<<<<<<<<<<<<<< ZONE CRITIQUE À MODIFIER PAR L'UTILISATEUR >>>>>>>>>>>>>>>>
         # ⚠️ IDs DE CANAUX CONFIGURÉS
         self.HARDCODED_SOURCE_ID = -1002682552255  # <--- ID du canal SOURCE/DÉCLENCHEUR
@@ -40,17 +190,15 @@ class CardPredictor:
         # <<<<<<<<<<<<<<<< FIN ZONE CRITIQUE >>>>>>>>>>>>>>>>
 
         # --- A. Chargement des Données ---
-        self.predictions = self._load_data('predictions.json') 
-        self.processed_messages = self._load_data('processed.json', is_set=True) 
-        self.last_prediction_time = self._load_data('last_prediction_time.json', is_scalar=True) or 0
-        self.last_predicted_game_number = self._load_data('last_predicted_game_number.json', is_scalar=True) or 0
-        self.consecutive_fails = self._load_data('consecutive_fails.json', is_scalar=True) or 0
-        self.pending_edits: Dict[int, Dict] = self._load_data('pending_edits.json')
+        # Instantané binaire s'il est encore à jour (une lecture), sinon fichiers d'état
+        self.telegram_message_sender = telegram_message_sender
+        self._last_snapshot = 0.0
+        self._snapshot_sources_written: Optional[Dict] = None
+        self.loaded_from_snapshot = self._load_snapshot()
+        if not self.loaded_from_snapshot:
+            self._load_state_files()
         
         # --- B. Configuration Canaux (AVEC FALLBACK SÉCURISÉ) ---
-        raw_config = self._load_data('channels_config.json')
-        self.config_data = raw_config if isinstance(raw_config, dict) else {}
-        
         self.target_channel_id = self.config_data.get('target_channel_id')
         if not self.target_channel_id and self.HARDCODED_SOURCE_ID != 0:
             self.target_channel_id = self.HARDCODED_SOURCE_ID
@@ -59,17 +207,6 @@ class CardPredictor:
         if not self.prediction_channel_id and self.HARDCODED_PREDICTION_ID != 0:
             self.prediction_channel_id = self.HARDCODED_PREDICTION_ID
         
-        # --- C. Logique INTER (Intelligente) ---
-        self.telegram_message_sender = telegram_message_sender
-        self.active_admin_chat_id = self._load_data('active_admin_chat_id.json', is_scalar=True)
-        
-        self.sequential_history: Dict[int, Dict] = self._load_data('sequential_history.json') 
-        self.inter_data: List[Dict] = self._load_data('inter_data.json') 
-        self.is_inter_mode_active = self._load_data('inter_mode_status.json', is_scalar=True)
-        self.smart_rules = self._load_data('smart_rules.json')
-        self.last_analysis_time = self._load_data('last_analysis_time.json', is_scalar=True) or 0
-        self.collected_games = self._load_data('collected_games.json', is_set=True)
-        
         if self.is_inter_mode_active is None:
             self.is_inter_mode_active = True
         
@@ -78,241 +215,695 @@ class CardPredictor:
         if self.inter_data and not self.is_inter_mode_active and not self.smart_rules:
              self.analyze_and_set_smart_rules(initial_load=True)
 
+        # Démarrage après un long arrêt : la fenêtre chaude est rétablie tout de suite
+        self.apply_retention(force=True)
+
+    # --- Table de décision ---
+    @property
+    def smart_rules(self) -> List[Dict]:
+        return self._smart_rules
+
+    @smart_rules.setter
+    def smart_rules(self, rules: List[Dict]):
+        self._smart_rules = rules
+        self._rebuild_decision_table()
+
+    @property
+    def is_inter_mode_active(self) -> Optional[bool]:
+        return self._is_inter_mode_active
+
+    @is_inter_mode_active.setter
+    def is_inter_mode_active(self, active: Optional[bool]):
+        self._is_inter_mode_active = active
+        self._rebuild_decision_table()
+
+    def _rebuild_decision_table(self):
+        """
+        Fusionne règles INTER (prioritaires, si le mode est actif) et STATIC_RULES dans un
+        tuple indexé par code carte. Construit à part puis publié par une seule affectation :
+        les lecteurs (sans verrou) voient l'ancienne ou la nouvelle table, jamais un état partiel.
+        """
+        with self._table_lock:
+            table: List[Optional[Tuple[str, str]]] = [None] * CARD_COUNT
+            for trigger, suit in STATIC_RULES.items():
+                code = encode_card(trigger)
+                if code is not None:
+                    table[code] = (suit, 'STATIQUE')
+            if self._is_inter_mode_active and self._smart_rules:
+                # Parcours inversé : la première règle de la liste l'emporte pour un même déclencheur
+                for rule in reversed(self._smart_rules):
+                    code = encode_card(rule['trigger'])
+                    if code is not None:
+                        table[code] = (rule['predict'], 'INTER')
+            self._decision_table = tuple(table)
+
     # --- Persistance ---
+    def _read_raw(self, filename: str) -> Any:
+        """Lit un document brut (JSON ou SQLite). Renvoie None s'il n'existe pas."""
+        if self._store:
+            return self._store.load_document(filename)
+        if not os.path.exists(filename): return None
+        with open(filename, 'r') as f:
+            content = f.read().strip()
+            if not content: return None
+            return json.loads(content)
+
     def _load_data(self, filename: str, is_set: bool = False, is_scalar: bool = False) -> Any:
+        is_dict = filename in ['channels_config.json', 'predictions.json', 'sequential_history.json', 'smart_rules.json', 'pending_edits.json']
         try:
-            is_dict = filename in ['channels_config.json', 'predictions.json', 'sequential_history.json', 'smart_rules.json', 'pending_edits.json']
-            
-            if not os.path.exists(filename):
+            data = self._read_raw(filename)
+            if data is None:
                 return set() if is_set else (None if is_scalar else ({} if is_dict else []))
-            with open(filename, 'r') as f:
-                content = f.read().strip()
-                if not content: return set() if is_set else (None if is_scalar else ({} if is_dict else []))
-                data = json.loads(content)
-                if is_set: return set(data)
-                if filename in ['sequential_history.json', 'predictions.json', 'pending_edits.json'] and isinstance(data, dict): 
-                    return {int(k): v for k, v in data.items()}
-                return data
+            if is_set: return set(data)
+            if filename in ['sequential_history.json', 'predictions.json', 'pending_edits.json'] and isinstance(data, dict): 
+                return {int(k): v for k, v in data.items()}
+            return data
         except Exception as e:
             logger.error(f"⚠️ Erreur chargement {filename}: {e}")
-            is_dict = filename in ['channels_config.json', 'predictions.json', 'sequential_history.json', 'smart_rules.json', 'pending_edits.json']
             return set() if is_set else (None if is_scalar else ({} if is_dict else []))
 
+    def _serialize_data(self, data: Any, filename: str) -> str:
+        if isinstance(data, set): data = list(data)
+        if filename == 'channels_config.json' and isinstance(data, dict):
+            if 'target_channel_id' in data and data['target_channel_id'] is not None:
+                data['target_channel_id'] = int(data['target_channel_id'])
+            if 'prediction_channel_id' in data and data['prediction_channel_id'] is not None:
+                data['prediction_channel_id'] = int(data['prediction_channel_id'])
+        return json.dumps(data, indent=4)
+
+    def _serialize_file(self, filename: str) -> Optional[str]:
+        """Sérialise l'attribut associé à un fichier persisté (appelé sous verrou)."""
+        if filename == GAME_CARDS_FILE:
+            return json.dumps(self.game_cards.to_document(), separators=(',', ':'))
+        if filename == INTER_RETIRED_FILE:
+            return self._serialize_data(self._inter_stats.retired_document(), filename)
+        attr = PERSISTED_FILES.get(filename)
+        if attr is None: return None
+        return self._serialize_data(getattr(self, attr), filename)
+
+    def _write_serialized(self, filename: str, content: str):
+        """Écrit un document sérialisé vers le backend actif."""
+        if MULTI_WORKER and filename in CLAIM_FILES:
+            self._write_claim_file(filename)
+            return
+        with timed('persist'):
+            if self._store:
+                self._store.save_document(filename, json.loads(content))
+            else:
+                atomic_write_text(filename, content)
+
+    def _write_claim_file(self, filename: str):
+        """
+        Écriture différée d'un fichier de réservation : contenu resérialisé sous les verrous,
+        jamais antérieur à une réservation faite entre la sérialisation du flush et l'écriture.
+        """
+        with self._lock:
+            content = self._serialize_file(filename)
+            if self._store:
+                self._store.save_document(filename, json.loads(content))
+            else:
+                with self._state_file_lock:
+                    atomic_write_text(filename, content)
+
     def _save_data(self, data: Any, filename: str):
+        """Écriture immédiate (synchrone) d'un fichier."""
         try:
-            if isinstance(data, set): data = list(data)
-            if filename == 'channels_config.json' and isinstance(data, dict):
-                if 'target_channel_id' in data and data['target_channel_id'] is not None:
-                    data['target_channel_id'] = int(data['target_channel_id'])
-                if 'prediction_channel_id' in data and data['prediction_channel_id'] is not None:
-                    data['prediction_channel_id'] = int(data['prediction_channel_id'])
-            
-            with open(filename, 'w') as f: json.dump(data, f, indent=4)
+            self._write_serialized(filename, self._serialize_data(data, filename))
         except Exception as e: logger.error(f"❌ Erreur sauvegarde {filename}: {e}")
 
+    def _persist_prediction(self, game_number: int):
+        """Persiste une prédiction : une ligne en SQLite, sinon réécriture différée de predictions.json."""
+        if self._store:
+            try:
+                self._store.upsert_prediction(game_number, self.predictions[game_number])
+                return
+            except Exception as e:
+                logger.error(f"❌ Erreur sauvegarde prédiction {game_number}: {e}")
+        self._mark_dirty('predictions.json')
+
+    def _archive_prediction(self, game_number: int):
+        """Sort une prédiction résolue de l'index chaud et l'ajoute à l'archive (appelé sous verrou)."""
+        prediction = self.predictions.pop(game_number, None)
+        if prediction is None: return
+        prediction['resolved_at'] = self.clock()
+        if self._oldest_resolved is not None:
+            self._oldest_resolved = min(self._oldest_resolved, prediction['resolved_at'])
+        try:
+            self._archive.append(game_number, prediction)
+        except Exception as e:
+            logger.error(f"❌ Erreur archivage prédiction {game_number}: {e}")
+        if not self._store:
+            self._mark_dirty('predictions.json')
+
+    def _archive_resolved_predictions(self):
+        """Migration : les anciens predictions.json contiennent aussi les prédictions résolues."""
+        resolved = [game for game, p in self.predictions.items() if p.get('status') != 'pending']
+        if not resolved: return
+        with self._lock:
+            for game in sorted(resolved):
+                self._archive_prediction(game)
+        logger.info(f"📦 {len(resolved)} prédictions résolues déplacées vers l'archive.")
+
+    def _mark_dirty(self, *filenames: str):
+        """Programme l'écriture différée des fichiers indiqués."""
+        self._persistence.mark_dirty(*filenames)
+
     def _save_all_data(self):
-        self._save_data(self.predictions, 'predictions.json')
-        self._save_data(self.processed_messages, 'processed.json')
-        self._save_data(self.last_prediction_time, 'last_prediction_time.json')
-        self._save_data(self.last_predicted_game_number, 'last_predicted_game_number.json')
-        self._save_data(self.consecutive_fails, 'consecutive_fails.json')
-        self._save_data(self.inter_data, 'inter_data.json')
-        self._save_data(self.sequential_history, 'sequential_history.json')
-        self._save_data(self.is_inter_mode_active, 'inter_mode_status.json')
-        self._save_data(self.smart_rules, 'smart_rules.json')
-        self._save_data(self.active_admin_chat_id, 'active_admin_chat_id.json')
-        self._save_data(self.last_analysis_time, 'last_analysis_time.json')
-        self._save_data(self.pending_edits, 'pending_edits.json')
-        self._save_data(self.collected_games, 'collected_games.json')
+        """Programme l'écriture différée de tout l'état (hors fichiers journalisés, compactés à part)."""
+        self._mark_dirty(*(f for f in PERSISTED_FILES if f not in JOURNALED_FILES))
+
+    def flush(self) -> int:
+        """Force l'écriture immédiate des modifications en attente."""
+        return self._persistence.flush()
+
+    def shutdown(self):
+        """Arrêt propre : dernières écritures différées, puis instantané binaire."""
+        self._persistence.stop()
+
+    # --- Chargement de l'état ---
+    def _load_state_files(self):
+        """Chargement complet depuis les fichiers d'état (JSON ou SQLite) et le journal INTER."""
+        # Index des prédictions EN ATTENTE, par numéro de jeu cible
+        self.predictions: Dict[int, Dict] = self._load_data('predictions.json') 
+        self._archive_resolved_predictions()
+        self.processed_messages = self._load_data('processed.json', is_set=True) 
+        self.last_prediction_time = self._load_data('last_prediction_time.json', is_scalar=True) or 0
+        self.last_predicted_game_number = self._load_data('last_predicted_game_number.json', is_scalar=True) or 0
+        self.consecutive_fails = self._load_data('consecutive_fails.json', is_scalar=True) or 0
+        self.pending_edits: Dict[int, Dict] = self._load_data('pending_edits.json')
+        
+        raw_config = self._load_data('channels_config.json')
+        self.config_data = raw_config if isinstance(raw_config, dict) else {}
+        
+        # Logique INTER (Intelligente)
+        self.active_admin_chat_id = self._load_data('active_admin_chat_id.json', is_scalar=True)
+        
+        self.sequential_history: Dict[int, Dict] = self._load_data('sequential_history.json') 
+        self.inter_data: List[Dict] = self._load_data('inter_data.json') 
+        self.is_inter_mode_active = self._load_data('inter_mode_status.json', is_scalar=True)
+        self.smart_rules = self._load_data('smart_rules.json')
+        self.last_analysis_time = self._load_data('last_analysis_time.json', is_scalar=True) or 0
+        self.collected_games = self._load_data('collected_games.json', is_set=True)
+        # Échantillons identifiés par leur rang de collecte 'seq' : les numéros de jeu reviennent chaque jour
+        self._inter_seq = 0
+        self._inter_by_game: Dict[int, List[int]] = {}
+        self._inter_stats = InterStats(mode=INTER_STATS_MODE, window=INTER_WINDOW_SIZE, half_life=INTER_DECAY_HALF_LIFE)
+        self._inter_stats.load_retired(self._load_data(INTER_RETIRED_FILE))
+        for entry in self.inter_data:
+            self._index_inter_sample(entry)
+        # Non borné ici : la passe de rétention archive le surplus au-delà de MINING_HISTORY_SIZE
+        self.game_cards = GameCardHistory.from_document(self._load_data(GAME_CARDS_FILE, is_scalar=True), maxlen=None)
+        self._replay_journal()
+        with self._lock:
+            self._retire_inter_samples()
+
+    def _snapshot_sources(self) -> List[str]:
+        """Fichiers dont l'instantané dépend : s'ils changent, il est périmé."""
+        if self._store:
+            return [SQLITE_PATH, f"{SQLITE_PATH}-wal"]
+        return sorted({
+            *PERSISTED_FILES, *JOURNALED_FILES, 'channels_config.json',
+            INTER_JOURNAL_FILE, self._journal.rotated_path, self._archive.path,
+        })
+
+    @staticmethod
+    def _snapshot_config() -> Tuple:
+        """Réglages qui changent la forme de l'état : un instantané pris avec d'autres est ignoré."""
+        return (STORAGE_BACKEND, INTER_STATS_MODE, INTER_WINDOW_SIZE, INTER_DECAY_HALF_LIFE)
+
+    def _load_snapshot(self) -> bool:
+        if not PREDICTOR_SNAPSHOT_ENABLED: return False
+        started = time.perf_counter()
+        sources = self._snapshot_sources()
+        state = read_snapshot(SNAPSHOT_FILE, sources, self._snapshot_config())
+        if not state or any(attr not in state for attr in SNAPSHOT_ATTRS): return False
+        for attr in SNAPSHOT_ATTRS:
+            setattr(self, attr, state[attr])
+        self._rebuild_decision_table()
+        self._last_snapshot = time.time()
+        self._snapshot_sources_written = file_signature(sources)
+        logger.info(f"⚡ État chargé depuis l'instantané en {(time.perf_counter() - started) * 1000:.1f} ms")
+        return True
+
+    def write_snapshot(self, force: bool = False) -> bool:
+        """
+        Écrit l'instantané binaire quand l'état est stable : aucune écriture différée en attente
+        (les fichiers reflètent l'état) et fichiers modifiés depuis le dernier instantané.
+        Thread de persistance toutes les PREDICTOR_SNAPSHOT_INTERVAL secondes, et à l'arrêt (force).
+        """
+        if not PREDICTOR_SNAPSHOT_ENABLED: return False
+        now = time.time()
+        if not force and now - self._last_snapshot < PREDICTOR_SNAPSHOT_INTERVAL: return False
+        try:
+            with self._lock:
+                if self._persistence.pending(): return False
+                sources = file_signature(self._snapshot_sources())
+                if sources == self._snapshot_sources_written: return False
+                content = encode_snapshot({attr: getattr(self, attr) for attr in SNAPSHOT_ATTRS},
+                                          sources, self._snapshot_config())
+            atomic_write_bytes(SNAPSHOT_FILE, content)
+        except Exception as e:
+            logger.error(f"❌ Erreur écriture instantané: {e}")
+            return False
+        self._last_snapshot = now
+        self._snapshot_sources_written = sources
+        logger.info(f"⚡ Instantané de l'état écrit ({len(content) // 1024} Ko)")
+        return True
+
+    # --- Journal INTER (ajout seul) ---
+    def _journal_write(self, record: Dict):
+        """Applique un enregistrement à l'état puis l'ajoute au journal (appelé sous verrou)."""
+        self._apply_journal_record(record)
+        try:
+            self._journal.append(record)
+        except Exception as e:
+            logger.error(f"❌ Erreur écriture journal: {e}")
+            # Repli : snapshot complet au prochain flush
+            self._mark_dirty(*JOURNALED_FILES)
+            return
+        self._persistence.start()
+
+    def _apply_journal_record(self, record: Dict):
+        """Applique un enregistrement du journal. Idempotent (rejouable sur un snapshot plus récent)."""
+        op = record.get('op')
+        if op == 'hist':
+            game_number = record['game']
+            self.sequential_history[game_number] = {'carte': record['carte'], 'date': record['date']}
+            self.collected_games.add(game_number)
+            limit = game_number - record.get('window', HISTORY_WINDOW)
+            self.sequential_history = {k:v for k,v in self.sequential_history.items() if k >= limit}
+            self.collected_games = {g for g in self.collected_games if g >= limit}
+        elif op == 'inter':
+            entry = record['entry']
+            seq = entry.get('seq')
+            # Rang déjà vu : journal rejoué sur un snapshot qui contient l'échantillon
+            if seq is not None and seq <= self._inter_seq: return
+            self.inter_data.append(entry)
+            self._index_inter_sample(entry)
+        elif op == 'inter_retire':
+            # Les plus anciens échantillons quittent la mémoire ; leurs comptes restent agrégés.
+            # Bornés par rang ('seq') : rejoué sur un snapshot plus récent, rien n'est retiré deux fois
+            count = record['count']
+            through = record.get('seq')
+            if through is not None:
+                count = bisect.bisect_right(self.inter_data, through, hi=min(count, len(self.inter_data)), key=lambda e: e['seq'])
+            retired, self.inter_data = self.inter_data[:count], self.inter_data[count:]
+            for entry in retired:
+                self._unindex_inter_sample(entry.get('numero_resultat'), entry['seq'])
+                self._inter_stats.retire(entry['seq'])
+        elif op == 'cards':
+            self.game_cards.apply(record)
+        elif op == 'inter_del':
+            # Carte du jeu corrigée dans la fenêtre de collecte : seuls ses échantillons sont remplacés.
+            # Bornés au dernier rang connu à l'écriture : rejoué plus tard, il épargne les échantillons suivants
+            game_number = record['game']
+            through = record.setdefault('seq', self._inter_seq)
+            seqs = self._inter_by_game.get(game_number, [])
+            kept = [seq for seq in seqs if seq > through]
+            # inter_data est trié par rang : position par dichotomie, sans comparer les entrées par valeur
+            for seq in seqs[:len(seqs) - len(kept)]:
+                index = bisect.bisect_left(self.inter_data, seq, key=lambda e: e['seq'])
+                if index < len(self.inter_data) and self.inter_data[index]['seq'] == seq:
+                    del self.inter_data[index]
+                self._inter_stats.remove(seq)
+            if kept:
+                self._inter_by_game[game_number] = kept
+            else:
+                self._inter_by_game.pop(game_number, None)
+
+    def _index_inter_sample(self, entry: Dict):
+        """Indexe un échantillon ajouté en fin de inter_data (numéroté s'il est nouveau ou d'un ancien fichier)."""
+        seq = entry.get('seq')
+        if seq is None:
+            seq = entry['seq'] = self._inter_seq + 1
+        self._inter_seq = max(self._inter_seq, seq)
+        self._inter_by_game.setdefault(entry.get('numero_resultat'), []).append(seq)
+        self._inter_stats.add(seq, entry)
+
+    def _unindex_inter_sample(self, game_number: int, seq: int):
+        seqs = self._inter_by_game.get(game_number)
+        if not seqs: return
+        seqs.remove(seq)
+        if not seqs:
+            del self._inter_by_game[game_number]
+
+    def _replay_journal(self):
+        """Reconstruit l'état INTER : snapshot JSON (déjà chargé) + relecture du journal."""
+        replayed = 0
+        for record in self._journal.replay():
+            try:
+                self._apply_journal_record(record)
+                replayed += 1
+            except (KeyError, TypeError) as e:
+                logger.warning(f"⚠️ Enregistrement de journal invalide ignoré: {e}")
+        if replayed:
+            logger.info(f"🧠 Journal INTER rejoué: {replayed} enregistrement(s)")
+
+    def _maintenance(self):
+        """Tour du thread de persistance : compaction du journal, rétention et instantané s'ils sont dus."""
+        self._compact_journal()
+        self.apply_retention()
+        self.write_snapshot()
+
+    def _compact_journal(self, force: bool = False):
+        """Compacte le journal dans les snapshots JSON (appelé par le thread de persistance)."""
+        with self._lock:
+            if not force and not self._journal.needs_compaction(): return
+            contents = {f: self._serialize_file(f) for f in JOURNALED_FILES}
+            self._journal.rotate()
+        for filename, content in contents.items():
+            self._write_serialized(filename, content)
+        self._journal.discard_rotated()
+        logger.info("💾 Journal INTER compacté dans les snapshots.")
 
     def set_channel_id(self, channel_id: int, channel_type: str):
-        if not isinstance(self.config_data, dict): self.config_data = {}
-        if channel_type == 'source':
-            self.target_channel_id = channel_id
-            self.config_data['target_channel_id'] = channel_id
-        elif channel_type == 'prediction':
-            self.prediction_channel_id = channel_id
-            self.config_data['prediction_channel_id'] = channel_id
-        self._save_data(self.config_data, 'channels_config.json')
+        with self._lock:
+            if not isinstance(self.config_data, dict): self.config_data = {}
+            if channel_type == 'source':
+                self.target_channel_id = channel_id
+                self.config_data['target_channel_id'] = channel_id
+            elif channel_type == 'prediction':
+                self.prediction_channel_id = channel_id
+                self.config_data['prediction_channel_id'] = channel_id
+            self._save_data(self.config_data, 'channels_config.json')
         return True
 
     # --- Outils d'Extraction/Comptage ---
+    # Toutes les méthodes acceptent un texte brut ou un ParsedMessage (analysé une seule fois par update).
     
-    def _extract_parentheses_content(self, text: str) -> List[str]:
+    def _extract_parentheses_content(self, text: Union[str, ParsedMessage]) -> List[str]:
         """Extrait le contenu de toutes les sections de parenthèses (non incluses)."""
-        pattern = r'\(([^)]+)\)'
-        return re.findall(pattern, text)
+        return list(as_parsed(text).groups)
 
     def _count_cards_in_content(self, content: str) -> int:
         """Compte les symboles de cartes (♠️, ♥️, ♦️, ♣️) dans une chaîne, en normalisant ❤️ vers ♥️."""
-        normalized_content = content.replace("❤️", "♥️")
-        return len(re.findall(r'(\d+|[AKQJ])(♠️|♥️|♦️|♣️)', normalized_content, re.IGNORECASE))
+        return len(normalize_cards(content))
         
-    def has_pending_indicators(self, text: str) -> bool:
+    def has_pending_indicators(self, text: Union[str, ParsedMessage]) -> bool:
         """Vérifie si le message contient des indicateurs suggérant qu'il sera édité (temporaire)."""
-        indicators = ['⏰', '▶', '🕐', '➡️']
-        return any(indicator in text for indicator in indicators)
+        return as_parsed(text).has_pending
 
-    def has_completion_indicators(self, text: str) -> bool:
+    def has_completion_indicators(self, text: Union[str, ParsedMessage]) -> bool:
         """Vérifie si le message contient des indicateurs de complétion après édition (✅ ou 🔰)."""
-        completion_indicators = ['✅', '🔰']
-        return any(indicator in text for indicator in completion_indicators)
+        return as_parsed(text).has_completion
         
-    def is_final_result_structurally_valid(self, text: str) -> bool:
+    def is_final_result_structurally_valid(self, text: Union[str, ParsedMessage]) -> bool:
         """
         Vérifie si la structure du message correspond à un format de résultat final connu.
-        Gère les messages #T, #R et les formats édités basés sur le compte de cartes.
+        Gère les messages #T, #R et les formats édités basés sur le compte de cartes (3/2, 3/3, 2/3).
         """
-        matches = self._extract_parentheses_content(text)
-        num_sections = len(matches)
-
-        if num_sections < 2: return False
-
-        # Règle pour les messages finalisés (#T) ou normaux (#R)
-        if ('#T' in text or '🔵#R' in text) and num_sections >= 2:
-            return True
-
-        # Messages Édités (basé sur le compte de cartes)
-        if num_sections == 2:
-            content_1 = matches[0]
-            content_2 = matches[1]
-            
-            count_1 = self._count_cards_in_content(content_1)
-            count_2 = self._count_cards_in_content(content_2)
-
-            # Formats acceptés: 3/2, 3/3, 2/3 (3 cartes dans le premier groupe sont supportées)
-            if (count_1 == 3 and count_2 == 2) or \
-               (count_1 == 3 and count_2 == 3) or \
-               (count_1 == 2 and count_2 == 3):
-                return True
-
-        return False
+        return as_parsed(text).is_structurally_valid
         
     # --- Outils d'Extraction (Continuation) ---
-    def extract_game_number(self, message: str) -> Optional[int]:
-        match = re.search(r'#N(\d+)\.', message, re.IGNORECASE) 
-        if not match: match = re.search(r'🔵(\d+)🔵', message)
-        return int(match.group(1)) if match else None
+    def extract_game_number(self, message: Union[str, ParsedMessage]) -> Optional[int]:
+        return as_parsed(message).game_number
 
     def extract_card_details(self, content: str) -> List[Tuple[str, str]]:
-        # Normalise ♥️ en ❤️
-        normalized_content = content.replace("♥️", "❤️")
-        # Cherche Valeur + Enseigne (ex: 10♦️, A♠️)
-        return re.findall(r'(\d+|[AKQJ])(♠️|❤️|♦️|♣️)', normalized_content, re.IGNORECASE)
+        # Valeur + Enseigne normalisée (ex: ('10', '♦️'), ('A', '♥️'))
+        return [(card[:-2], card[-2:]) for card in normalize_cards(content)]
 
-    def get_first_card_info(self, message: str) -> Optional[Tuple[str, str]]:
+    def get_first_card_info(self, message: Union[str, ParsedMessage]) -> Optional[Tuple[str, str]]:
         """
         Retourne la PREMIÈRE carte du PREMIER groupe (déclencheur INTER/STATIQUE).
         """
-        match = re.search(r'\(([^)]*)\)', message)
-        if not match: return None
-        
-        details = self.extract_card_details(match.group(1))
-        if details:
-            v, c = details[0]
-            if c == "❤️": c = "♥️" 
-            return f"{v.upper()}{c}", c 
-        return None
+        parsed = as_parsed(message)
+        card = parsed.first_card
+        return (card, parsed.first_suit) if card else None
     
-    def get_all_cards_in_first_group(self, message: str) -> List[str]:
+    def get_all_cards_in_first_group(self, message: Union[str, ParsedMessage]) -> List[str]:
         """
         Retourne TOUTES les cartes du PREMIER groupe pour la vérification.
         """
-        match = re.search(r'\(([^)]*)\)', message)
-        if not match: return []
-        
-        details = self.extract_card_details(match.group(1))
-        cards = []
-        for v, c in details:
-            normalized_c = "♥️" if c == "❤️" else c
-            cards.append(f"{v.upper()}{normalized_c}")
-        return cards
+        return list(as_parsed(message).first_group_cards)
         
     # --- Logique INTER (Collecte et Analyse) ---
-    def collect_inter_data(self, game_number: int, message: str):
+    def collect_inter_data(self, game_number: int, message: Union[str, ParsedMessage]):
         """Collecte les données (N-2 -> N) même sur messages temporaires (⏰)."""
+        message = as_parsed(message)
+        
+        with self._lock:
+            for record in self._collection_records(game_number, message, datetime.fromtimestamp(self.clock()).isoformat()):
+                op = record['op']
+                if op == 'inter_del':
+                    # Mise à jour de la carte (cas rare mais possible)
+                    previous = self.sequential_history.get(game_number, {}).get('carte', 'N/A')
+                    logger.info(f"🧠 Jeu {game_number} mis à jour: {previous} -> {message.first_card}")
+                self._journal_write(record)
+                if op == 'inter':
+                    entry = record['entry']
+                    logger.info(f"🧠 Jeu {game_number} collecté pour INTER: {entry['declencheur']} -> {entry['result_suit']}")
+                    self._retire_inter_samples()
+
+    def _collection_records(self, game_number: int, message: ParsedMessage, date: str,
+                            state: Optional[ImportedHistory] = None) -> List[Dict]:
+        """
+        Enregistrements produits par la collecte d'un message, à appliquer dans l'ordre (sous verrou).
+        Partagé par la collecte en direct (journalisée, état du prédicteur) et l'import d'historique
+        (`state` : état importé, tenu à part jusqu'à la fusion).
+        """
         info = self.get_first_card_info(message)
-        if not info: return
+        if not info: return []
+        state = state if state is not None else self
         
         full_card, suit = info
-        result_suit_normalized = suit.replace("❤️", "♥️")
+        result_suit_normalized = normalize_suit(suit)
+        
+        # Cartes des deux groupes pour la recherche multi-décalages (à chaque changement)
+        records = []
+        cards_record = self._game_cards_record(game_number, message, state.game_cards)
+        if cards_record:
+            records.append(cards_record)
         
         # Vérifier si déjà dans collected_games
-        if game_number in self.collected_games:
-            existing_data = self.sequential_history.get(game_number)
+        if game_number in state.collected_games:
+            existing_data = state.sequential_history.get(game_number)
             if existing_data and existing_data.get('carte') == full_card:
                 logger.debug(f"🧠 Jeu {game_number} déjà collecté, ignoré.")
-                return
-            else:
-                # Mise à jour de la carte (cas rare mais possible)
-                logger.info(f"🧠 Jeu {game_number} mis à jour: {existing_data.get('carte') if existing_data else 'N/A'} -> {full_card}")
-                self.inter_data = [e for e in self.inter_data if e.get('numero_resultat') != game_number]
+                return records
+            records.append({'op': 'inter_del', 'game': game_number})
 
-        self.sequential_history[game_number] = {'carte': full_card, 'date': datetime.now().isoformat()}
-        self.collected_games.add(game_number)
-        
-        n_minus_2 = game_number - 2
-        trigger_entry = self.sequential_history.get(n_minus_2)
+        trigger_entry = state.sequential_history.get(game_number - 2)
+        records.append({'op': 'hist', 'game': game_number, 'carte': full_card, 'date': date, 'window': HISTORY_WINDOW})
         
         if trigger_entry:
-            trigger_card = trigger_entry['carte']
-            self.inter_data.append({
+            records.append({'op': 'inter', 'entry': {
                 'numero_resultat': game_number,
-                'declencheur': trigger_card, 
-                'numero_declencheur': n_minus_2,
+                'declencheur': trigger_entry['carte'], 
+                'numero_declencheur': game_number - 2,
                 'result_suit': result_suit_normalized, 
-                'date': datetime.now().isoformat()
-            })
-            logger.info(f"🧠 Jeu {game_number} collecté pour INTER: {trigger_card} -> {result_suit_normalized}")
+                'date': date
+            }})
+        return records
 
-        limit = game_number - 50
-        self.sequential_history = {k:v for k,v in self.sequential_history.items() if k >= limit}
-        self.collected_games = {g for g in self.collected_games if g >= limit}
+    def _retire_inter_samples(self, write: Optional[Callable[[Dict], None]] = None, before: Optional[str] = None) -> int:
+        """
+        Borne inter_data en mémoire (par lots de 10 % pour amortir la copie de liste) et, si `before`
+        (date ISO) est donné, retire aussi les échantillons plus anciens. Les échantillons retirés
+        sont ajoutés aux archives mensuelles ; leurs comptes restent dans les agrégats.
+        """
+        excess = len(self.inter_data) - INTER_DATA_MAX_SAMPLES
+        count = excess if excess > INTER_DATA_MAX_SAMPLES // 10 else 0
+        if before:
+            # inter_data est chronologique : préfixe des échantillons trop anciens
+            while count < len(self.inter_data) and (self.inter_data[count].get('date') or '') < before:
+                count += 1
+        if count <= 0: return 0
+        retired: Dict[str, List[Dict]] = defaultdict(list)
+        fallback = month_of(self.clock(), '')
+        for entry in self.inter_data[:count]:
+            retired[month_of(entry.get('date'), fallback)].append(entry)
+        try:
+            self._monthly.append(ARCHIVE_INTER_SAMPLES, retired)
+        except Exception as e:
+            logger.error(f"❌ Erreur archivage échantillons INTER: {e}")
+        (write or self._journal_write)({'op': 'inter_retire', 'count': count, 'seq': self.inter_data[count - 1]['seq']})
+        logger.info(f"🧠 {count} échantillons INTER anciens archivés et retirés de la mémoire (agrégats conservés).")
+        return count
+
+    # --- Rétention ---
+    def apply_retention(self, force: bool = False) -> Optional[Dict[str, int]]:
+        """
+        Rétablit la fenêtre chaude (toutes les RETENTION_INTERVAL secondes, thread de persistance) :
+        - prédictions en attente jamais vérifiées (écart > RETENTION_PENDING_GAMES jeux, ou plus
+          vieilles que RETENTION_DAYS) : statut 'expired', archivées ;
+        - échantillons INTER plus vieux que RETENTION_DAYS : archives mensuelles ;
+        - prédictions résolues plus vieilles que RETENTION_DAYS : archives mensuelles ;
+        - cartes par jeu au-delà de MINING_HISTORY_SIZE : archives mensuelles.
+        RETENTION_DAYS à 0 (défaut) : rien n'est retiré selon l'âge, seules les bornes en nombre s'appliquent.
+        """
+        now = self.clock()
+        # Horloge remplacée (rejeu) antérieure à la dernière passe : passe due
+        if not force and 0 <= now - self._last_retention < RETENTION_INTERVAL: return None
+        self._last_retention = now
+        cutoff = now - RETENTION_DAYS * 86400 if RETENTION_DAYS > 0 else None
+        counts = {'expired': 0, 'inter_samples': 0, 'predictions': 0, 'game_cards': 0}
+        try:
+            with self._lock:
+                counts['expired'] = self._expire_pending_predictions(cutoff)
+                if cutoff is not None:
+                    counts['inter_samples'] = self._retire_inter_samples(before=datetime.fromtimestamp(cutoff).isoformat())
+                    # Archive chaude réécrite seulement quand 10 % de la fenêtre est échue
+                    if self._oldest_resolved is None or self._oldest_resolved < cutoff - RETENTION_DAYS * 8640:
+                        counts['predictions'], self._oldest_resolved = self._archive.roll(cutoff, self._monthly)
+                counts['game_cards'] = self._trim_game_cards(month_of(now, ''))
+            if counts['game_cards']:
+                # Le snapshot ne doit plus contenir les cartes archivées
+                self._compact_journal(force=True)
+        except Exception as e:
+            logger.error(f"❌ Erreur passe de rétention: {e}")
+            return counts
+        if any(counts.values()):
+            logger.info(f"📦 Rétention : {counts}")
+        return counts
+
+    def _trim_game_cards(self, month: str) -> int:
+        """Archive les cartes par jeu au-delà de MINING_HISTORY_SIZE, par lots de 10 % (sous verrou)."""
+        if len(self.game_cards) - MINING_HISTORY_SIZE <= MINING_HISTORY_SIZE // 10: return 0
+        trimmed = self.game_cards.trim(MINING_HISTORY_SIZE)
+        if trimmed:
+            self._monthly.append(ARCHIVE_GAME_CARDS, {month: [
+                {'seq': seq, 'game': game, 'g1': list(g1), 'g2': list(g2)} for seq, game, g1, g2 in trimmed
+            ]})
+        return len(trimmed)
+
+    def _expire_pending_predictions(self, cutoff: Optional[float]) -> int:
+        """Archive comme 'expired' les prédictions en attente qui ne seront plus vérifiées (sous verrou)."""
+        if not self.predictions: return 0
+        current_game = self.game_cards.entries[-1][1] if self.game_cards.entries else None
+        stale = [
+            game for game, prediction in self.predictions.items()
+            if (current_game is not None and abs(current_game - game) > RETENTION_PENDING_GAMES)
+            or (cutoff is not None and prediction.get('created_at', cutoff) < cutoff)
+        ]
+        for game in stale:
+            prediction = self.predictions[game]
+            prediction['status'] = 'expired'
+            increment('predictions_resolved_total', {'status': 'expired', 'mode': 'inter' if prediction.get('is_inter') else 'statique'})
+            self._archive_prediction(game)
+        if stale:
+            logger.info(f"⌛ {len(stale)} prédiction(s) en attente expirée(s) : {sorted(stale)}")
+        return len(stale)
+
+    def prediction_totals(self) -> Dict[str, int]:
+        """Comptes par statut, archives mensuelles comprises (relit l'archive chaude : à la demande)."""
+        totals = self._monthly.totals(ARCHIVE_PREDICTIONS)
+        totals.pop('records', None)
+        for record in self._archive.iter_records():
+            status = record.get('status')
+            totals[status] = totals.get(status, 0) + 1
+        totals['pending'] = len(self.predictions)
+        return totals
+
+    def import_history(self, messages: Iterable[Tuple[ParsedMessage, str]]) -> Dict[str, int]:
+        """
+        Import en bloc de messages source (ordre chronologique, avec leur date ISO) : même collecte
+        que `collect_inter_data`, appliquée à un état à part (ImportedHistory) sans verrou ni journal,
+        pendant que le traitement en direct continue. L'historique importé est ensuite fusionné en une
+        seule étape sous verrou, compacté dans les snapshots, puis les règles sont recalculées.
+        """
+        counts = {'messages': 0, 'games': 0, 'inter': 0}
+        imported = ImportedHistory()
+        for message, date in messages:
+            counts['messages'] += 1
+            game_number = message.game_number
+            if not game_number: continue
+            for record in self._collection_records(game_number, message, date, imported):
+                imported.apply(record)
+                if record['op'] == 'hist':
+                    counts['games'] += 1
+                elif record['op'] == 'inter':
+                    counts['inter'] += 1
         
-        self._save_all_data()
+        self._merge_imported_history(imported)
+        # Historique importé plus ancien que la fenêtre chaude : directement aux archives
+        self.apply_retention(force=True)
+        self.analyze_and_set_smart_rules()
+        return counts
+
+    def _merge_imported_history(self, imported: ImportedHistory):
+        """
+        Fusionne l'historique importé en une étape sous verrou. La fenêtre séquentielle en direct
+        n'est pas touchée ; cartes par jeu et échantillons INTER restent chronologiques et sont
+        renumérotés à la suite des rangs déjà attribués (archives comprises), donc le journal
+        est compacté dans la même étape.
+        """
+        with self._lock:
+            # Cartes par jeu : l'historique importé (plus ancien) avant les entrées en direct
+            game_cards = GameCardHistory(maxlen=None)
+            seq = self.game_cards.last_seq
+            for _, game, group1, group2 in chain(imported.game_cards.entries, self.game_cards.entries):
+                seq += 1
+                game_cards.entries.append((seq, game, group1, group2))
+            game_cards.last_seq = seq
+            self.game_cards = game_cards
 
+            # Échantillons INTER triés par date (tri stable : à date égale, l'import d'abord) :
+            # _retire_inter_samples(before=...) suppose inter_data chronologique
+            samples = sorted(chain(imported.samples(), self.inter_data), key=lambda e: e.get('date') or '')
+            retired = self._inter_stats.retired_document()
+            self._inter_stats = InterStats(mode=INTER_STATS_MODE, window=INTER_WINDOW_SIZE, half_life=INTER_DECAY_HALF_LIFE)
+            self._inter_stats.load_retired(retired)
+            self._inter_by_game = {}
+            self.inter_data = samples
+            for entry in samples:
+                entry.pop('seq', None)
+                self._index_inter_sample(entry)
+
+            self._retire_inter_samples(self._apply_journal_record)
+            self._trim_game_cards(month_of(imported.last_date, month_of(self.clock(), '')))
+            self._compact_journal(force=True)
+
+    def _game_cards_record(self, game_number: int, message: ParsedMessage, game_cards: GameCardHistory) -> Optional[Dict]:
+        group1 = [code for code in map(encode_card, message.first_group_cards) if code is not None]
+        group2 = [code for code in map(encode_card, message.second_group_cards) if code is not None]
+        return game_cards.next_record(game_number, group1, group2)
+
+    def mine_trigger_rules(self, offsets=MINING_OFFSETS, min_count: int = MINING_MIN_COUNT,
+                           limit: int = 20) -> List[MinedRule]:
+        """Règles candidates multi-décalages (copie de l'historique sous verrou, calcul hors verrou)."""
+        with self._lock:
+            entries = list(self.game_cards.entries)
+        return mine_rules(entries, offsets, min_count, limit)
     
     def analyze_and_set_smart_rules(self, chat_id: int = None, initial_load: bool = False, force_activate: bool = False):
         """
         Analyse les données pour trouver les Top 2 déclencheurs par ENSEIGNE DE RÉSULTAT.
         Crée des règles même avec peu de données (minimum 1 occurrence).
         """
-        # Grouper par enseigne de RÉSULTAT (♠️, ♥️, ♦️, ♣️)
-        result_suit_groups = defaultdict(lambda: defaultdict(int))
-        
-        for entry in self.inter_data:
-            trigger_card = entry['declencheur']  # Ex: 6♦️
-            result_suit = entry['result_suit']   # Ex: ♣️
-            
-            # Compter combien de fois ce déclencheur mène à cette enseigne de résultat
-            result_suit_groups[result_suit][trigger_card] += 1
+        with self._lock:
+            self._analyze_locked(chat_id, initial_load, force_activate)
+
+        logger.info(f"🧠 Analyse terminée. Règles trouvées: {len(self.smart_rules)}. Mode actif: {self.is_inter_mode_active}")
         
-        self.smart_rules = []
+        # Notification si demandée
+        if chat_id and self.telegram_message_sender:
+            if self.smart_rules:
+                msg = f"✅ **Analyse terminée !**\n\n{len(self.smart_rules)} règles créées à partir de {len(self.inter_data)} jeux collectés.\n\n🧠 **Mode INTER activé automatiquement**"
+            else:
+                msg = f"⚠️ **Pas assez de données**\n\n{len(self.inter_data)} jeux collectés. Continuez à jouer pour créer des règles."
+            self.telegram_message_sender(chat_id, msg)
+
+    def _analyze_locked(self, chat_id: Optional[int], initial_load: bool, force_activate: bool):
+        # Les comptes déclencheur -> enseigne de RÉSULTAT sont tenus à jour par _inter_stats
+        smart_rules = []
         
         # Pour chaque enseigne de résultat (♠️, ♥️, ♦️, ♣️)
-        for result_suit in ['♠️', '♥️', '♦️', '♣️']:
+        for result_suit in RESULT_SUITS:
             result_normalized = "❤️" if result_suit == "♥️" else result_suit
             
-            triggers_for_this_suit = result_suit_groups.get(result_suit, {})
-            
-            if not triggers_for_this_suit:
-                continue
-            
-            # Trier par fréquence et prendre jusqu'à 2 meilleurs (même avec 1 seule occurrence)
-            top_triggers = sorted(
-                triggers_for_this_suit.items(), 
-                key=lambda x: x[1], 
-                reverse=True
-            )[:2]
+            # Jusqu'à 2 meilleurs déclencheurs (même avec 1 seule occurrence)
+            top_triggers = self._inter_stats.top(result_suit, self.clock())
             
             for trigger_card, count in top_triggers:
-                self.smart_rules.append({
+                smart_rules.append({
                     'trigger': trigger_card,
                     'predict': result_normalized,
                     'count': count,
                     'result_suit': result_normalized  # Pour affichage
                 })
         
+        self.smart_rules = smart_rules
+        
         # Activer le mode INTER si on a au moins 1 règle
         if force_activate:
             self.is_inter_mode_active = True
@@ -323,23 +914,13 @@ class CardPredictor:
         elif not initial_load:
             self.is_inter_mode_active = False
             
-        self.last_analysis_time = time.time()
-        self._save_all_data()
+        self.last_analysis_time = self.clock()
+        self._mark_dirty('smart_rules.json', 'inter_mode_status.json', 'active_admin_chat_id.json', 'last_analysis_time.json')
 
-        logger.info(f"🧠 Analyse terminée. Règles trouvées: {len(self.smart_rules)}. Mode actif: {self.is_inter_mode_active}")
-        
-        # Notification si demandée
-        if chat_id and self.telegram_message_sender:
-            if self.smart_rules:
-                msg = f"✅ **Analyse terminée !**\n\n{len(self.smart_rules)} règles créées à partir de {len(self.inter_data)} jeux collectés.\n\n🧠 **Mode INTER activé automatiquement**"
-            else:
-                msg = f"⚠️ **Pas assez de données**\n\n{len(self.inter_data)} jeux collectés. Continuez à jouer pour créer des règles."
-            self.telegram_message_sender(chat_id, msg)
-
-    def check_and_update_rules(self):
-        """Vérification périodique (30 minutes)."""
-        if time.time() - self.last_analysis_time > 1800:
-            logger.info("🧠 Mise à jour INTER périodique (30 min).")
+    def check_and_update_rules(self, interval: float = 1800):
+        """Vérification périodique (30 minutes par défaut), appelée par RuleScheduler."""
+        if self.clock() - self.last_analysis_time > interval:
+            logger.info(f"🧠 Mise à jour INTER périodique ({interval / 60:.0f} min).")
             # Force l'activation si on a des données
             if len(self.inter_data) >= 3:
                 self.analyze_and_set_smart_rules(chat_id=self.active_admin_chat_id, force_activate=True)
@@ -398,51 +979,44 @@ class CardPredictor:
 
     # --- CŒUR DU SYSTÈME : PRÉDICTION ---
     
-    def should_wait_for_edit(self, text: str, message_id: int) -> bool:
-        if self.has_pending_indicators(text):
-            game_number = self.extract_game_number(text)
-            if message_id not in self.pending_edits:
-                self.pending_edits[message_id] = {
-                    'game_number': game_number,
-                    'original_text': text,
-                    'timestamp': datetime.now().isoformat()
-                }
-                self._save_data(self.pending_edits, 'pending_edits.json')
+    def should_wait_for_edit(self, text: Union[str, ParsedMessage], message_id: int) -> bool:
+        parsed = as_parsed(text)
+        if parsed.has_pending:
+            game_number = parsed.game_number
+            text = parsed.text
+            with self._lock:
+                if message_id not in self.pending_edits:
+                    self.pending_edits[message_id] = {
+                        'game_number': game_number,
+                        'original_text': text,
+                        'timestamp': datetime.now().isoformat()
+                    }
+                    self._mark_dirty('pending_edits.json')
             return True
         return False
 
-    def should_predict(self, message: str) -> Tuple[bool, Optional[int], Optional[str]]:
-        self.check_and_update_rules()
-        
-        game_number = self.extract_game_number(message)
+    def should_predict(self, message: Union[str, ParsedMessage]) -> Tuple[bool, Optional[int], Optional[str]]:
+        # L'analyse périodique INTER est assurée par RuleScheduler (hors du traitement des messages)
+        message = as_parsed(message)
+        game_number = message.game_number
         if not game_number: return False, None, None
         
         # Règle : Ecart de 3 jeux
         if self.last_predicted_game_number and (game_number - self.last_predicted_game_number < 3):
             return False, None, None
             
-        # 3. Décision
-        info = self.get_first_card_info(message)
-        if not info: return False, None, None
-        first_card, _ = info 
+        # 3. Décision : INTER (prioritaire si actif) puis STATIQUE, fusionnés dans la table compilée
+        code = message.first_card_code
+        if code is None: return False, None, None
+        decision = self._decision_table[code]
         
         predicted_suit = None
-
-        # A. PRIORITÉ 1 : MODE INTER
-        if self.is_inter_mode_active and self.smart_rules:
-            for rule in self.smart_rules:
-                if rule['trigger'] == first_card:
-                    predicted_suit = rule['predict']
-                    logger.info(f"🔮 INTER: Déclencheur {first_card} -> Prédit {predicted_suit}")
-                    break
-            
-        # B. PRIORITÉ 2 : MODE STATIQUE
-        if not predicted_suit and first_card in STATIC_RULES:
-            predicted_suit = STATIC_RULES[first_card]
-            logger.info(f"🔮 STATIQUE: Déclencheur {first_card} -> Prédit {predicted_suit}")
+        if decision:
+            predicted_suit, origin = decision
+            logger.info(f"🔮 {origin}: Déclencheur {message.first_card} -> Prédit {predicted_suit}")
 
         if predicted_suit:
-            if self.last_prediction_time and time.time() < self.last_prediction_time + self.prediction_cooldown:
+            if self.last_prediction_time and self.clock() < self.last_prediction_time + self.prediction_cooldown:
                 return False, None, None
                 
             return True, game_number, predicted_suit
@@ -458,31 +1032,101 @@ class CardPredictor:
         target = game_number_source + 2
         txt = self.prepare_prediction_text(game_number_source, suit)
         
-        self.predictions[target] = {
-            'predicted_costume': suit, 
-            'status': 'pending', 
-            'predicted_from': game_number_source, 
-            'message_text': txt, 
-            'message_id': message_id_bot, 
-            'is_inter': self.is_inter_mode_active
-        }
-        
-        self.last_prediction_time = time.time()
-        self.last_predicted_game_number = game_number_source
-        self.consecutive_fails = 0
-        self._save_all_data()
+        with self._lock:
+            self.predictions[target] = {
+                'predicted_costume': suit, 
+                'status': 'pending', 
+                'predicted_from': game_number_source, 
+                'message_text': txt, 
+                'message_id': message_id_bot, 
+                'is_inter': self.is_inter_mode_active,
+                'created_at': self.clock()
+            }
+            
+            self.last_prediction_time = self.clock()
+            self.last_predicted_game_number = game_number_source
+            self.consecutive_fails = 0
+            self._persist_prediction(target)
+            self._mark_dirty('last_prediction_time.json', 'last_predicted_game_number.json', 'consecutive_fails.json')
+
+    # --- Réservation entre processus (MULTI_WORKER) ---
+    def _gap_allows(self, last_game: int, last_time: float, game_number: int, now: float) -> bool:
+        """Règles d'écart (3 jeux) et de délai de should_predict, appliquées à des valeurs données."""
+        if last_game and game_number - last_game < 3: return False
+        return not (last_time and now < last_time + self.prediction_cooldown)
+
+    def _compare_and_set_last_prediction(self, allowed: Callable[[int, float], bool],
+                                         game: int, timestamp: float) -> Tuple[bool, int, float]:
+        """Compare-and-set des fichiers de réservation dans l'état partagé : (écrit, jeu, heure)."""
+        if self._store:
+            return self._store.compare_and_set_last_prediction(allowed, game, timestamp)
+        with self._state_file_lock:
+            current_game = self._read_raw('last_predicted_game_number.json') or 0
+            current_time = self._read_raw('last_prediction_time.json') or 0
+            if not allowed(current_game, current_time):
+                return False, current_game, current_time
+            atomic_write_text('last_predicted_game_number.json', self._serialize_data(game, 'last_predicted_game_number.json'))
+            atomic_write_text('last_prediction_time.json', self._serialize_data(timestamp, 'last_prediction_time.json'))
+        return True, game, timestamp
+
+    def claim_prediction(self, game_number_source: int) -> bool:
+        """
+        Réserve la prédiction d'un jeu avant son envoi : compare-and-set de la dernière prédiction
+        dans l'état partagé, un seul processus l'emporte. En cas d'échec, l'état partagé plus récent
+        est repris et rien ne doit être envoyé. Sans MULTI_WORKER : toujours True, sans accès disque.
+        """
+        if not MULTI_WORKER: return True
+        now = self.clock()
+        previous: List[Tuple[int, float]] = []
+
+        def allowed(last_game: int, last_time: float) -> bool:
+            previous.append((last_game, last_time))
+            return self._gap_allows(last_game, last_time, game_number_source, now)
+
+        with self._lock:
+            try:
+                claimed, shared_game, shared_time = self._compare_and_set_last_prediction(allowed, game_number_source, now)
+            except Exception as e:
+                # Sans réservation possible, on s'abstient plutôt que de risquer un doublon
+                logger.error(f"❌ Erreur réservation de la prédiction {game_number_source}: {e}")
+                return False
+            self.last_predicted_game_number = shared_game
+            self.last_prediction_time = shared_time
+            if not claimed:
+                logger.warning(f"🔒 Jeu {game_number_source} : prédiction déjà réservée par un autre processus (dernier jeu {shared_game})")
+                return False
+            self._claim_rollback = (game_number_source,) + previous[-1]
+            return True
+
+    def release_prediction_claim(self, game_number_source: int):
+        """Annule une réservation dont l'envoi a échoué (restaure la prédiction précédente si personne n'a réservé depuis)."""
+        if not MULTI_WORKER: return
+        rollback = self._claim_rollback
+        if not rollback or rollback[0] != game_number_source: return
+        _, previous_game, previous_time = rollback
+        with self._lock:
+            self._claim_rollback = None
+            try:
+                _, shared_game, shared_time = self._compare_and_set_last_prediction(
+                    lambda last_game, last_time: last_game == game_number_source, previous_game, previous_time
+                )
+            except Exception as e:
+                logger.error(f"❌ Erreur annulation de la réservation {game_number_source}: {e}")
+                return
+            self.last_predicted_game_number = shared_game
+            self.last_prediction_time = shared_time
 
     # --- VERIFICATION LOGIQUE ---
 
-    def verify_prediction(self, message: str) -> Optional[Dict]:
+    def verify_prediction(self, message: Union[str, ParsedMessage]) -> Optional[Dict]:
         """Vérifie une prédiction (message normal)"""
         return self._verify_prediction_common(message, is_edited=False)
 
-    def verify_prediction_from_edit(self, message: str) -> Optional[Dict]:
+    def verify_prediction_from_edit(self, message: Union[str, ParsedMessage]) -> Optional[Dict]:
         """Vérifie une prédiction (message édité)"""
         return self._verify_prediction_common(message, is_edited=True)
 
-    def check_costume_in_first_parentheses(self, message: str, predicted_costume: str) -> bool:
+    def check_costume_in_first_parentheses(self, message: Union[str, ParsedMessage], predicted_costume: str) -> bool:
         """Vérifie si le costume prédit apparaît dans le PREMIER parenthèses"""
         # Récupérer TOUTES les cartes du premier groupe
         all_cards = self.get_all_cards_in_first_group(message)
@@ -494,25 +1138,27 @@ class CardPredictor:
         # Log pour montrer toutes les cartes vues
         logger.info(f"🎯 Vérification: {len(all_cards)} carte(s) dans premier groupe: {', '.join(all_cards)}")
         
-        # Normaliser le costume prédit
-        normalized_costume = predicted_costume.replace("❤️", "♥️")
+        # Normaliser le costume prédit (indice d'enseigne du codec)
+        normalized_costume = normalize_suit(predicted_costume)
+        target_suit = suit_index(predicted_costume)
         
         # Vérifier si au moins UNE carte du groupe a le costume prédit
         for card in all_cards:
-            if card.endswith(normalized_costume):
+            if SUIT_INDEX.get(card[-2:]) == target_suit:
                 logger.info(f"✅ Costume {normalized_costume} trouvé dans carte {card}")
                 return True
         
         logger.debug(f"❌ Costume {normalized_costume} non trouvé dans {', '.join(all_cards)}")
         return False
 
-    def _verify_prediction_common(self, message: str, is_edited: bool = False) -> Optional[Dict]:
+    def _verify_prediction_common(self, message: Union[str, ParsedMessage], is_edited: bool = False) -> Optional[Dict]:
         """Logique de vérification commune - UNIQUEMENT pour messages finalisés."""
-        game_number = self.extract_game_number(message)
+        message = as_parsed(message)
+        game_number = message.game_number
         if not game_number: return None
         
         # Validation Structurelle
-        is_structurally_valid = self.is_final_result_structurally_valid(message)
+        is_structurally_valid = message.is_structurally_valid
         
         if not is_structurally_valid: return None
 
@@ -521,67 +1167,89 @@ class CardPredictor:
         verification_result = None
 
         # --- ÉTAPE 3 : Vérification du gain/perte ---
-        for predicted_game in sorted(self.predictions.keys()):
-            prediction = self.predictions[predicted_game]
+        # Seuls les jeux cibles [N-5, N] peuvent être vérifiés : accès direct à l'index
+        with self._lock:
+            for predicted_game in range(game_number - 5, game_number + 1):
+                prediction = self.predictions.get(predicted_game)
+                if prediction is None: continue
 
-            if prediction.get('status') != 'pending': continue
+                if prediction.get('status') != 'pending': continue
 
-            verification_offset = game_number - predicted_game
-            
-            if verification_offset < 0 or verification_offset > 5: continue
+                verification_offset = game_number - predicted_game
 
-            predicted_costume = prediction.get('predicted_costume')
-            if not predicted_costume: continue
+                predicted_costume = prediction.get('predicted_costume')
+                if not predicted_costume: continue
 
-            # CAS A: SUCCÈS (Décalage 0, 1 ou 2)
-            costume_found = self.check_costume_in_first_parentheses(message, predicted_costume)
+                # CAS A: SUCCÈS (Décalage 0, 1 ou 2)
+                costume_found = self.check_costume_in_first_parentheses(message, predicted_costume)
             
-            if costume_found and verification_offset <= 2:
-                status_symbol = SYMBOL_MAP.get(verification_offset, f"✅{verification_offset}️⃣")
-                updated_message = f"🔵{predicted_game}🔵:Enseigne {predicted_costume} statut :{status_symbol}"
-
-                prediction['status'] = 'won'
-                prediction['verification_count'] = verification_offset
-                prediction['final_message'] = updated_message
-                self.consecutive_fails = 0
-                self._save_all_data()
-
-                verification_result = {
-                    'type': 'edit_message',
-                    'predicted_game': str(predicted_game),
-                    'new_message': updated_message,
-                    'message_id_to_edit': prediction.get('message_id')
-                }
-                break 
+                if costume_found and verification_offset <= 2:
+                    status_symbol = SYMBOL_MAP.get(verification_offset, f"✅{verification_offset}️⃣")
+                    updated_message = f"🔵{predicted_game}🔵:Enseigne {predicted_costume} statut :{status_symbol}"
 
-            # CAS B: ÉCHEC (Seulement confirmé si on a dépassé l'offset 2)
-            elif verification_offset >= 2:
-                status_symbol = "❌" 
-                updated_message = f"🔵{predicted_game}🔵:Enseigne {predicted_costume} statut :{status_symbol}"
+                    prediction['status'] = 'won'
+                    increment('predictions_resolved_total', {'status': 'won', 'mode': 'inter' if prediction.get('is_inter') else 'statique'})
+                    prediction['verification_count'] = verification_offset
+                    prediction['final_message'] = updated_message
+                    self.consecutive_fails = 0
+                    self._archive_prediction(predicted_game)
+                    self._mark_dirty('consecutive_fails.json')
 
-                prediction['status'] = 'lost'
-                prediction['final_message'] = updated_message
+                    verification_result = {
+                        'type': 'edit_message',
+                        'predicted_game': str(predicted_game),
+                        'new_message': updated_message,
+                        'message_id_to_edit': prediction.get('message_id')
+                    }
+                    break 
+
+                # CAS B: ÉCHEC (Seulement confirmé si on a dépassé l'offset 2)
+                elif verification_offset >= 2:
+                    status_symbol = "❌" 
+                    updated_message = f"🔵{predicted_game}🔵:Enseigne {predicted_costume} statut :{status_symbol}"
+
+                    prediction['status'] = 'lost'
+                    increment('predictions_resolved_total', {'status': 'lost', 'mode': 'inter' if prediction.get('is_inter') else 'statique'})
+                    prediction['final_message'] = updated_message
                 
-                if prediction.get('is_inter'):
-                    self.is_inter_mode_active = False 
-                    logger.info("❌ Échec INTER : Désactivation automatique.")
-                else:
-                    self.consecutive_fails += 1
-                    if self.consecutive_fails >= 2:
-                        self.analyze_and_set_smart_rules(force_activate=True) 
-                        logger.info("⚠️ 2 Échecs Statiques : Activation automatique INTER.")
+                    if prediction.get('is_inter'):
+                        self.is_inter_mode_active = False 
+                        logger.info("❌ Échec INTER : Désactivation automatique.")
+                    else:
+                        self.consecutive_fails += 1
+                        if self.consecutive_fails >= 2:
+                            self.analyze_and_set_smart_rules(force_activate=True) 
+                            logger.info("⚠️ 2 Échecs Statiques : Activation automatique INTER.")
                 
-                self._save_all_data()
+                    self._archive_prediction(predicted_game)
+                    self._mark_dirty('consecutive_fails.json', 'inter_mode_status.json')
 
-                verification_result = {
-                    'type': 'edit_message',
-                    'predicted_game': str(predicted_game),
-                    'new_message': updated_message,
-                    'message_id_to_edit': prediction.get('message_id')
-                }
-                break 
+                    verification_result = {
+                        'type': 'edit_message',
+                        'predicted_game': str(predicted_game),
+                        'new_message': updated_message,
+                        'message_id_to_edit': prediction.get('message_id')
+                    }
+                    break 
 
         return verification_result
 
-# Global instance
-card_predictor = CardPredictor()
+
+# --- Instance partagée ---
+_instance: Optional[CardPredictor] = None
+_instance_lock = threading.Lock()
+
+
+def get_card_predictor(telegram_message_sender=None) -> CardPredictor:
+    """
+    Instance unique du processus, créée au premier appel : l'état n'est chargé qu'une fois,
+    quel que soit le nombre d'appelants (handlers, import d'historique…).
+    """
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = CardPredictor(telegram_message_sender=telegram_message_sender)
+    if telegram_message_sender and _instance.telegram_message_sender is None:
+        _instance.telegram_message_sender = telegram_message_sender
+    return _instance
@@ -0,0 +1,51 @@
+# cards.py
+
+"""
+Codec canonique des cartes : chaque carte devient un petit entier
+code = rang × 4 + enseigne (0..51). Les variantes ❤️/♥️ et la casse du rang
+sont résolues une fois pour toutes par table de correspondance.
+"""
+from typing import Dict, Optional
+
+RANKS = ('A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K')
+SUITS = ('♠️', '♥️', '♦️', '♣️')
+
+CARD_COUNT = len(RANKS) * len(SUITS)   # 52
+SUIT_COUNT = len(SUITS)                # 4
+
+# Enseigne -> indice (❤️ est l'alias historique de ♥️)
+SUIT_INDEX: Dict[str, int] = {suit: i for i, suit in enumerate(SUITS)}
+SUIT_INDEX['❤️'] = SUIT_INDEX['♥️']
+
+# Carte texte -> code (toutes les variantes acceptées)
+CARD_CODES: Dict[str, int] = {}
+for _r, _rank in enumerate(RANKS):
+    for _suit, _s in SUIT_INDEX.items():
+        for _variant in {_rank, _rank.lower()}:
+            CARD_CODES[f"{_variant}{_suit}"] = _r * SUIT_COUNT + _s
+
+# Code -> carte canonique (♥️)
+CARD_NAMES = tuple(f"{rank}{suit}" for rank in RANKS for suit in SUITS)
+
+
+def encode_card(card: str) -> Optional[int]:
+    """'10♦️' -> 38 ; None si la carte n'est pas reconnue."""
+    return CARD_CODES.get(card)
+
+
+def decode_card(code: int) -> str:
+    return CARD_NAMES[code]
+
+
+def suit_index(suit: str) -> Optional[int]:
+    return SUIT_INDEX.get(suit)
+
+
+def card_suit(code: int) -> int:
+    return code % SUIT_COUNT
+
+
+def normalize_suit(suit: str) -> str:
+    """Enseigne canonique (❤️ -> ♥️) ; inchangée si inconnue."""
+    index = SUIT_INDEX.get(suit)
+    return suit if index is None else SUITS[index]
@@ -18,6 +18,94 @@ CALLBACK_SOURCE = "config_source"
 CALLBACK_PREDICTION = "config_prediction"
 CALLBACK_CANCEL = "config_cancel"
 
+# --- PERSISTANCE (écriture différée en arrière-plan) ---
+# Intervalle max (secondes) entre deux écritures disque, et nombre de modifications déclenchant une écriture anticipée
+PERSIST_FLUSH_INTERVAL = float(os.getenv('PERSIST_FLUSH_INTERVAL') or 5)
+PERSIST_DIRTY_THRESHOLD = int(os.getenv('PERSIST_DIRTY_THRESHOLD') or 50)
+
+# --- JOURNAL INTER (ajout seul + compaction dans les snapshots JSON) ---
+JOURNAL_COMPACT_EVERY = int(os.getenv('JOURNAL_COMPACT_EVERY') or 1000)
+JOURNAL_COMPACT_INTERVAL = float(os.getenv('JOURNAL_COMPACT_INTERVAL') or 600)
+
+# --- BACKEND DE STOCKAGE ('json' par défaut, ou 'sqlite') ---
+STORAGE_BACKEND = (os.getenv('STORAGE_BACKEND') or 'json').lower()
+SQLITE_PATH = os.getenv('SQLITE_PATH') or 'bot_state.db'
+
+# --- WEBHOOK ASYNCHRONE (file d'attente + workers) ---
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS') or 4)
+WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE') or 1000)
+
+# --- PLUSIEURS WORKERS GUNICORN (MULTI_WORKER=true, voir worker_coordination.py) ---
+# File partagée des updates (SQLite WAL), verrou du processus leader, attente max du leader
+# entre deux lectures de la file (secondes), nouvelle tentative d'élection des autres workers.
+# Aucun gain de débit : seul le leader traite les updates, les autres ne font que les déposer
+# dans la file (coût en plus à chaque update). Le mode sert la disponibilité, pas la charge.
+MULTI_WORKER = (os.getenv('MULTI_WORKER') or 'false').lower() == 'true'
+WORKER_SPOOL_PATH = os.getenv('WORKER_SPOOL_PATH') or 'update_spool.db'
+WORKER_LOCK_PATH = os.getenv('WORKER_LOCK_PATH') or 'worker_leader.lock'
+WORKER_SPOOL_POLL = float(os.getenv('WORKER_SPOOL_POLL') or 0.05)
+WORKER_LEADER_RETRY = float(os.getenv('WORKER_LEADER_RETRY') or 1)
+
+# --- ENVOIS SORTANTS (limites par chat et globale, en messages/seconde) ---
+OUTBOUND_CHAT_RATE = float(os.getenv('OUTBOUND_CHAT_RATE') or 1)
+OUTBOUND_CHAT_BURST = float(os.getenv('OUTBOUND_CHAT_BURST') or 3)
+OUTBOUND_GLOBAL_RATE = float(os.getenv('OUTBOUND_GLOBAL_RATE') or 30)
+
+# --- CACHE D'ANALYSE DES MESSAGES (nombre max de textes mémorisés) ---
+PARSE_CACHE_SIZE = int(os.getenv('PARSE_CACHE_SIZE') or 512)
+
+# --- ANALYSE INTER PÉRIODIQUE (secondes ; la gigue aléatoire évite des échéances synchronisées) ---
+RULE_ANALYSIS_INTERVAL = float(os.getenv('RULE_ANALYSIS_INTERVAL') or 1800)
+RULE_ANALYSIS_JITTER = float(os.getenv('RULE_ANALYSIS_JITTER') or 60)
+
+# --- STATISTIQUES INTER ---
+# Statistique qui pilote les règles : 'total' (tous les jeux), 'window' (N derniers jeux) ou 'decay' (demi-vie)
+INTER_STATS_MODE = (os.getenv('INTER_STATS_MODE') or 'total').lower()
+INTER_WINDOW_SIZE = int(os.getenv('INTER_WINDOW_SIZE') or 500)
+INTER_DECAY_HALF_LIFE = float(os.getenv('INTER_DECAY_HALF_LIFE') or 24) * 3600   # heures -> secondes
+# Échantillons INTER bruts gardés en mémoire (les plus anciens ne subsistent que dans les agrégats)
+INTER_DATA_MAX_SAMPLES = int(os.getenv('INTER_DATA_MAX_SAMPLES') or 5000)
+
+# --- RÉTENTION (fenêtre chaude bornée ; le reste part dans des archives gzip mensuelles) ---
+# Jours gardés en chaud (échantillons INTER, prédictions résolues), prédictions en attente
+# expirées au-delà de N jeux d'écart, fréquence de la passe (secondes), dossier des archives.
+# RETENTION_DAYS à 0 : aucun retrait selon l'âge (à activer explicitement)
+RETENTION_DAYS = float(os.getenv('RETENTION_DAYS') or 0)
+RETENTION_PENDING_GAMES = int(os.getenv('RETENTION_PENDING_GAMES') or 20)
+RETENTION_INTERVAL = float(os.getenv('RETENTION_INTERVAL') or 3600)
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR') or 'archives'
+
+# --- DÉMARRAGE RAPIDE (instantané binaire de l'état du prédicteur) ---
+# Instantané relu en une seule lecture au démarrage s'il correspond encore aux fichiers d'état ;
+# réécrit à l'arrêt et, au plus toutes les N secondes, quand l'état a changé
+PREDICTOR_SNAPSHOT_ENABLED = (os.getenv('PREDICTOR_SNAPSHOT') or 'true').lower() == 'true'
+PREDICTOR_SNAPSHOT_INTERVAL = float(os.getenv('PREDICTOR_SNAPSHOT_INTERVAL') or 300)
+
+# --- RECHERCHE DE RÈGLES MULTI-DÉCALAGES (/mine) ---
+# Jeux conservés (cartes des groupes 1 et 2), décalages N-k étudiés, occurrences minimales d'une règle
+MINING_HISTORY_SIZE = int(os.getenv('MINING_HISTORY_SIZE') or 20000)
+MINING_OFFSETS = tuple(int(k) for k in (os.getenv('MINING_OFFSETS') or '1,2,3,4,5').split(',') if k.strip())
+MINING_MIN_COUNT = int(os.getenv('MINING_MIN_COUNT') or 5)
+
+# --- ÉVALUATION FANTÔME (/shadow : moteurs alternatifs évalués sans publication) ---
+SHADOW_ENABLED = (os.getenv('SHADOW_ENABLED') or 'true').lower() == 'true'
+SHADOW_TOP_K = int(os.getenv('SHADOW_TOP_K') or 4)
+SHADOW_QUEUE_SIZE = int(os.getenv('SHADOW_QUEUE_SIZE') or 1000)
+
+# --- IMPORT D'HISTORIQUE (/import : fichiers lus uniquement dans ce dossier) ---
+HISTORY_IMPORT_DIR = os.getenv('HISTORY_IMPORT_DIR') or 'imports'
+
+# --- API TELEGRAM (remplaçable par un faux serveur local pour le rejeu, voir replay.py) ---
+TELEGRAM_API_BASE = os.getenv('TELEGRAM_API_BASE') or 'https://api.telegram.org'
+
+# --- ENREGISTREMENT DES UPDATES (JSONL tournant ; vide = désactivé) ---
+UPDATE_RECORD_FILE = os.getenv('UPDATE_RECORD_FILE') or ''
+UPDATE_RECORD_MAX_BYTES = int(float(os.getenv('UPDATE_RECORD_MAX_MB') or 50) * 1024 * 1024)
+UPDATE_RECORD_BACKUPS = int(os.getenv('UPDATE_RECORD_BACKUPS') or 5)
+
+# --- DIAGNOSTICS (/debug/* : profil, tracemalloc, tailles mémoire ; vide = routes désactivées) ---
+DIAGNOSTICS_TOKEN = os.getenv('DIAGNOSTICS_TOKEN') or ''
+
 class Config:
     """Configuration class for bot settings"""
     
@@ -0,0 +1,306 @@
+# diagnostics.py
+
+"""
+Diagnostics à chaud du processus (lenteurs, fuites mémoire), exposés par des routes
+Flask protégées par DIAGNOSTICS_TOKEN (en-tête `X-Admin-Token` ou paramètre `token`) :
+- échantillonneur de piles : relève périodiquement la pile de tous les threads
+  (workers du webhook, envois, persistance…) pendant une durée bornée, en arrière-plan
+  pour ne pas bloquer le worker gunicorn qui reçoit aussi le webhook ;
+- tracemalloc : instantané de référence puis top N des allocations qui ont grandi depuis ;
+- tailles des grandes structures en mémoire du prédicteur et des handlers.
+Sans DIAGNOSTICS_TOKEN, les routes répondent 404.
+"""
+import sys
+import hmac
+import time
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Bornes de l'échantillonneur
+MAX_PROFILE_SECONDS = 60.0
+MIN_SAMPLE_INTERVAL = 0.001
+# Objets parcourus au plus par structure pour l'estimation de taille profonde
+MAX_SIZE_WALK = 200000
+
+
+class StackSampler:
+    """Profilage par échantillonnage des piles (sys._current_frames), un profil à la fois."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._result: Optional[Dict[str, Any]] = None
+        self._collapsed: Counter = Counter()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float = 10.0, interval: float = 0.005, thread_filter: str = '') -> bool:
+        """Lance un profil en arrière-plan ; False si un profil est déjà en cours."""
+        with self._lock:
+            if self.running: return False
+            seconds = min(max(seconds, 0.1), MAX_PROFILE_SECONDS)
+            interval = max(interval, MIN_SAMPLE_INTERVAL)
+            self._result = {'status': 'running', 'seconds': seconds, 'interval': interval, 'started': time.time()}
+            self._thread = threading.Thread(
+                target=self._run, args=(seconds, interval, thread_filter), name='diagnostics-sampler', daemon=True
+            )
+            self._thread.start()
+            logger.info(f"🔬 Profil par échantillonnage lancé ({seconds} s, pas {interval * 1000:.0f} ms)")
+            return True
+
+    def result(self, top: int = 30) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if self._result is None: return None
+            result = dict(self._result)
+        for key in ('self', 'total'):
+            if key in result:
+                result[key] = result[key][:top]
+        return result
+
+    def collapsed(self) -> str:
+        """Piles repliées (`thread;f1;f2 n`), format d'entrée des outils de flamegraph."""
+        with self._lock:
+            return '\n'.join(f"{stack} {count}" for stack, count in self._collapsed.most_common()) + '\n'
+
+    def _run(self, seconds: float, interval: float, thread_filter: str) -> None:
+        own = threading.get_ident()
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        thread_counts: Counter = Counter()
+        collapsed: Counter = Counter()
+        samples = 0
+        deadline = time.perf_counter() + seconds
+        try:
+            while time.perf_counter() < deadline:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own: continue
+                    name = names.get(ident, str(ident))
+                    if thread_filter and thread_filter not in name: continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                        frame = frame.f_back
+                    if not stack: continue
+                    thread_counts[name] += 1
+                    self_counts[stack[0]] += 1
+                    total_counts.update(set(stack))
+                    collapsed[';'.join([name] + stack[::-1])] += 1
+                samples += 1
+                time.sleep(interval)
+        except Exception as e:
+            logger.error(f"❌ Erreur profil par échantillonnage: {e}")
+
+        thread_samples = sum(thread_counts.values()) or 1
+        with self._lock:
+            self._collapsed = collapsed
+            self._result.update({
+                'status': 'done',
+                'samples': samples,
+                'threads': dict(thread_counts.most_common()),
+                'self': [{'frame': f, 'samples': n, 'pct': round(n * 100 / thread_samples, 1)} for f, n in self_counts.most_common()],
+                'total': [{'frame': f, 'samples': n, 'pct': round(n * 100 / thread_samples, 1)} for f, n in total_counts.most_common()],
+            })
+        logger.info(f"🔬 Profil terminé : {samples} relevés")
+
+
+class MemoryTracker:
+    """tracemalloc : instantané de référence puis différences top N."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+
+    def start(self, frames: int = 1) -> Dict[str, Any]:
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(max(1, frames))
+                logger.info(f"🧮 tracemalloc démarré ({frames} trame(s))")
+            self._baseline = self._snapshot()
+            return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        with self._lock:
+            tracemalloc.stop()
+            self._baseline = None
+            logger.info("🧮 tracemalloc arrêté")
+            return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        return {
+            'tracing': tracemalloc.is_tracing(),
+            'traced_kb': round(current / 1024, 1),
+            'peak_kb': round(peak / 1024, 1),
+            'overhead_kb': round(tracemalloc.get_tracemalloc_memory() / 1024, 1),
+            'has_baseline': self._baseline is not None,
+        }
+
+    def diff(self, top: int = 20, key_type: str = 'lineno', reset: bool = False) -> Optional[Dict[str, Any]]:
+        """Top N des écarts depuis la référence (None si tracemalloc n'est pas actif)."""
+        with self._lock:
+            if not tracemalloc.is_tracing() or self._baseline is None: return None
+            snapshot = self._snapshot()
+            stats = snapshot.compare_to(self._baseline, key_type)
+            if reset:
+                self._baseline = snapshot
+            return {
+                **self.status(),
+                'key_type': key_type,
+                'top': [{
+                    'location': str(stat.traceback),
+                    'size_kb': round(stat.size / 1024, 1),
+                    'size_diff_kb': round(stat.size_diff / 1024, 1),
+                    'count': stat.count,
+                    'count_diff': stat.count_diff,
+                } for stat in stats[:top]],
+            }
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        # Les allocations de tracemalloc lui-même faussent les écarts
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+
+
+def deep_size(obj: Any, limit: int = MAX_SIZE_WALK) -> int:
+    """Taille approximative (octets) d'un objet et de son contenu (dict, list, set, tuple)."""
+    seen = set()
+    stack = [obj]
+    size = 0
+    while stack and len(seen) < limit:
+        current = stack.pop()
+        if id(current) in seen: continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+    return size
+
+
+def structure_sizes(handlers, user_message_counts: Optional[Dict] = None, deep: bool = True) -> Dict[str, Dict[str, Any]]:
+    """Nombre d'éléments (et taille estimée) des structures susceptibles de croître sans fin."""
+    structures: Dict[str, Any] = {}
+    predictor = handlers.card_predictor
+    if predictor:
+        structures.update({
+            'predictions': predictor.predictions,
+            'inter_data': predictor.inter_data,
+            'sequential_history': predictor.sequential_history,
+            'processed_messages': predictor.processed_messages,
+            'smart_rules': predictor.smart_rules,
+            'inter_by_game': predictor._inter_by_game,
+        })
+    if user_message_counts is not None:
+        structures['user_message_counts'] = user_message_counts
+
+    sizes = {}
+    for name, value in structures.items():
+        try:
+            # Copie superficielle : les workers peuvent modifier la structure pendant le parcours
+            snapshot = dict(value) if isinstance(value, dict) else list(value)
+            row = {'len': len(snapshot)}
+            if deep:
+                row['approx_kb'] = round(deep_size(snapshot) / 1024, 1)
+            sizes[name] = row
+        except Exception as e:
+            logger.error(f"❌ Erreur mesure {name}: {e}")
+            sizes[name] = {'error': str(e)}
+
+    if predictor:
+        sizes['game_cards'] = {'len': len(predictor.game_cards)}
+    sizes['parse_cache'] = {'len': handlers.parse_cache.stats()['size']}
+    return sizes
+
+
+# --- Routes Flask ---
+def register_routes(app, handlers, token: str, user_message_counts: Optional[Dict] = None) -> None:
+    """
+    Ajoute les routes /debug/* à l'application (désactivées, 404, si token est vide).
+    `handlers` : les handlers, ou une fonction qui les renvoie (None hors du processus leader).
+    """
+    from flask import Response, jsonify, request
+
+    current_handlers = handlers if callable(handlers) else (lambda: handlers)
+
+    sampler = StackSampler()
+    memory = MemoryTracker()
+
+    def authorized() -> bool:
+        if not token: return False
+        given = request.headers.get('X-Admin-Token') or request.args.get('token') or ''
+        return hmac.compare_digest(given.encode('utf-8'), token.encode('utf-8'))
+
+    def guarded(view):
+        def wrapper():
+            if not authorized():
+                return 'Not Found', 404
+            try:
+                return view()
+            except Exception as e:
+                logger.error(f"❌ Erreur diagnostic {view.__name__}: {e}")
+                return jsonify({'error': str(e)}), 500
+        wrapper.__name__ = f"diagnostics_{view.__name__}"
+        return wrapper
+
+    def profile_start():
+        started = sampler.start(
+            float(request.args.get('seconds', 10)),
+            float(request.args.get('interval_ms', 5)) / 1000,
+            request.args.get('thread', '')
+        )
+        if not started:
+            return jsonify({'error': 'profil déjà en cours'}), 409
+        return jsonify(sampler.result()), 202
+
+    def profile_result():
+        if request.args.get('format') == 'collapsed':
+            return Response(sampler.collapsed(), mimetype='text/plain')
+        result = sampler.result(int(request.args.get('top', 30)))
+        if result is None:
+            return jsonify({'error': 'aucun profil (POST /debug/profile)'}), 404
+        return jsonify(result), 200
+
+    def memory_start():
+        return jsonify(memory.start(int(request.args.get('frames', 1)))), 200
+
+    def memory_stop():
+        return jsonify(memory.stop()), 200
+
+    def memory_diff():
+        result = memory.diff(
+            int(request.args.get('top', 20)),
+            request.args.get('key', 'lineno'),
+            request.args.get('reset', 'false').lower() == 'true'
+        )
+        if result is None:
+            return jsonify({'error': 'tracemalloc inactif (POST /debug/memory/start)', **memory.status()}), 409
+        return jsonify(result), 200
+
+    def structures():
+        deep = request.args.get('deep', 'true').lower() == 'true'
+        active = current_handlers()
+        if active is None:
+            return jsonify({'error': 'processus non leader : aucune structure du bot ici'}), 409
+        return jsonify(structure_sizes(active, user_message_counts, deep)), 200
+
+    app.add_url_rule('/debug/profile', view_func=guarded(profile_start), methods=['POST'])
+    app.add_url_rule('/debug/profile', view_func=guarded(profile_result), methods=['GET'])
+    app.add_url_rule('/debug/memory/start', view_func=guarded(memory_start), methods=['POST'])
+    app.add_url_rule('/debug/memory/stop', view_func=guarded(memory_stop), methods=['POST'])
+    app.add_url_rule('/debug/memory', view_func=guarded(memory_diff), methods=['GET'])
+    app.add_url_rule('/debug/structures', view_func=guarded(structures), methods=['GET'])
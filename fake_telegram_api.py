@@ -0,0 +1,181 @@
+# fake_telegram_api.py
+
+"""
+Faux serveur de l'API Bot Telegram, pour le rejeu et les tests de charge hors ligne.
+Répond à /bot<token>/<méthode> comme l'API réelle (sendMessage renvoie un message_id
+croissant, editMessageText, getMe, setWebhook…) et compte les appels par méthode.
+Le bot s'y connecte avec TELEGRAM_API_BASE=http://127.0.0.1:<port>.
+
+Dégradations injectables (tirages reproductibles avec --seed) :
+- latence fixe + gigue uniforme,
+- erreurs 5xx (proportion des appels),
+- limites 429 avec `retry_after` (proportion des appels).
+Un écouteur optionnel reçoit (méthode, payload, horodatage) de chaque appel servi,
+pour mesurer par exemple la latence webhook -> editMessageText.
+
+    python fake_telegram_api.py [--port 8081] [--latency-ms 0] [--jitter-ms 0]
+                                [--error-rate 0] [--rate-limit-rate 0] [--retry-after 1] [--seed N]
+"""
+import sys
+import json
+import time
+import logging
+import random
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class FakeTelegramAPI:
+    """Serveur HTTP local (thread d'arrière-plan) imitant l'API Bot."""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 retry_after: int = 1, seed: Optional[int] = None,
+                 listener: Optional[Callable[[str, Dict[str, Any], float], None]] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.listener = listener
+        self.calls: Counter = Counter()
+        self.faults: Counter = Counter()          # 'error' / 'rate_limit' -> réponses dégradées
+        self.sent: Dict[Any, int] = Counter()     # chat_id -> messages envoyés
+        self._random = random.Random(seed)
+        self._next_message_id = 1
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                api._handle(self, parse_qs(urlparse(self.path).query))
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                content_type = self.headers.get('Content-Type', '')
+                if content_type.startswith('application/json'):
+                    payload = json.loads(body or b'{}')
+                elif content_type.startswith('application/x-www-form-urlencoded'):
+                    payload = parse_qs(body.decode('utf-8'))
+                else:
+                    payload = {}   # multipart (sendDocument) : contenu ignoré
+                api._handle(self, payload)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeTelegramAPI':
+        self._thread = threading.Thread(target=self.server.serve_forever, name='fake-telegram-api', daemon=True)
+        self._thread.start()
+        logger.info(f"🧪 Faux serveur Telegram à l'écoute sur {self.base_url}")
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'calls': dict(self.calls), 'faults': dict(self.faults),
+                    'sent_per_chat': {str(k): v for k, v in self.sent.items()}}
+
+    # --- Réponses ---
+    def _handle(self, request: BaseHTTPRequestHandler, payload: Dict[str, Any]) -> None:
+        method = urlparse(request.path).path.rsplit('/', 1)[-1]
+        payload = {k: (v[0] if isinstance(v, list) and len(v) == 1 else v) for k, v in payload.items()}
+        with self._lock:
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            draw = self._random.random() if (self.error_rate or self.rate_limit_rate) else 1.0
+        if delay > 0:
+            time.sleep(delay)
+
+        if draw < self.rate_limit_rate:
+            status, body = 429, {'ok': False, 'error_code': 429,
+                                 'description': f"Too Many Requests: retry after {self.retry_after}",
+                                 'parameters': {'retry_after': self.retry_after}}
+            fault = 'rate_limit'
+        elif draw < self.rate_limit_rate + self.error_rate:
+            status, body = 502, {'ok': False, 'error_code': 502, 'description': 'Bad Gateway'}
+            fault = 'error'
+        else:
+            status, body, fault = 200, {'ok': True, 'result': self._result(method, payload)}, None
+
+        if fault:
+            with self._lock:
+                self.faults[fault] += 1
+        elif self.listener:
+            try:
+                self.listener(method, payload, time.perf_counter())
+            except Exception as e:
+                logger.error(f"❌ Erreur écouteur du faux serveur: {e}")
+        data = json.dumps(body).encode('utf-8')
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+
+    def _result(self, method: str, payload: Dict[str, Any]) -> Any:
+        with self._lock:
+            self.calls[method] += 1
+            if method == 'sendMessage':
+                message_id = self._next_message_id
+                self._next_message_id += 1
+                self.sent[payload.get('chat_id')] += 1
+                return {'message_id': message_id, 'date': int(time.time()),
+                        'chat': {'id': payload.get('chat_id')}, 'text': payload.get('text')}
+            if method == 'editMessageText':
+                return {'message_id': payload.get('message_id'), 'date': int(time.time()),
+                        'chat': {'id': payload.get('chat_id')}, 'text': payload.get('text')}
+            if method == 'getMe':
+                return {'id': 1, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_bot'}
+            return True
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Faux serveur de l'API Bot Telegram")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency-ms', type=float, default=0, help="Latence ajoutée à chaque réponse")
+    parser.add_argument('--jitter-ms', type=float, default=0, help="Latence aléatoire supplémentaire (0..jitter)")
+    parser.add_argument('--error-rate', type=float, default=0, help="Proportion de réponses 502")
+    parser.add_argument('--rate-limit-rate', type=float, default=0, help="Proportion de réponses 429")
+    parser.add_argument('--retry-after', type=int, default=1, help="retry_after des réponses 429 (s)")
+    parser.add_argument('--seed', type=int, help="Graine des tirages (latence, erreurs)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    api = FakeTelegramAPI(
+        args.host, args.port, args.latency_ms / 1000, args.jitter_ms / 1000,
+        args.error_rate, args.rate_limit_rate, args.retry_after, args.seed
+    ).start()
+    try:
+        while True:
+            time.sleep(60)
+            stats = api.stats()
+            logger.info(f"📊 Appels : {stats['calls']} | dégradations : {stats['faults']}")
+    except KeyboardInterrupt:
+        api.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
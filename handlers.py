@@ -3,9 +3,24 @@
 import logging
 import time
 import json
+import threading
 from collections import defaultdict
+from functools import partial
 from typing import Dict, Any, Optional
-import requests
+
+from config import (
+    OUTBOUND_CHAT_RATE, OUTBOUND_CHAT_BURST, OUTBOUND_GLOBAL_RATE, PARSE_CACHE_SIZE,
+    RULE_ANALYSIS_INTERVAL, RULE_ANALYSIS_JITTER, MINING_OFFSETS, MINING_MIN_COUNT,
+    SHADOW_ENABLED, SHADOW_TOP_K, SHADOW_QUEUE_SIZE, INTER_DECAY_HALF_LIFE, INTER_DATA_MAX_SAMPLES,
+    HISTORY_IMPORT_DIR
+)
+from telegram_client import get_client
+from outbound import OutboundScheduler, PRIORITY_PREDICTION, PRIORITY_ADMIN
+from message_parser import ParseCache
+from rule_scheduler import RuleScheduler
+from shadow import ShadowEvaluator
+from history_import import import_file, resolve_import_path
+from metrics import timed, increment
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -13,12 +28,17 @@ logger.setLevel(logging.INFO)
 # Importation Robuste
 try:
     # Assurez-vous d'utiliser la version de CardPredictor que j'ai corrigée (avec Top 2 par enseigne)
-    from card_predictor import CardPredictor
+    from card_predictor import CardPredictor, get_card_predictor
 except ImportError:
     logger.error("❌ IMPOSSIBLE D'IMPORTER CARDPREDICTOR")
     CardPredictor = None
+    get_card_predictor = None
 
 user_message_counts = defaultdict(list)
+_rate_limit_lock = threading.Lock()
+
+# Attente maximale d'un envoi encore en file : au-delà, il est annulé s'il n'est pas parti
+SEND_QUEUE_TIMEOUT = 30
 
 # --- MESSAGES UTILISATEUR NETTOYÉS ---
 WELCOME_MESSAGE = """
@@ -43,6 +63,9 @@ Je prédis la prochaine Enseigne (Couleur) en utilisant :
 
 **🔹 Collecte de Données**
 • `/collect` - Voir toutes les données collectées par enseigne
+• `/mine [décalage]` - Règles candidates multi-décalages (N-1 à N-5, groupes 1 et 2)
+• `/shadow` - Comparer les moteurs alternatifs évalués en fantôme (sans publication)
+• `/import <fichier>` - Importer un export du canal source (dossier d'import du serveur)
 
 **🔹 Configuration**
 • `/config` - Configurer les rôles des canaux (Source/Prédiction)
@@ -81,22 +104,54 @@ HELP_MESSAGE = """
 class TelegramHandlers:
     def __init__(self, bot_token: str):
         self.bot_token = bot_token
-        self.base_url = f"https://api.telegram.org/bot{bot_token}"
+        self.client = get_client(bot_token)
+        self.base_url = self.client.base_url
+        self.outbound = OutboundScheduler(
+            self.client,
+            chat_rate=OUTBOUND_CHAT_RATE,
+            chat_burst=OUTBOUND_CHAT_BURST,
+            global_rate=OUTBOUND_GLOBAL_RATE
+        )
+        self.parse_cache = ParseCache(PARSE_CACHE_SIZE)
+        self._import_thread: Optional[threading.Thread] = None
+        # Horloge de la limite de débit par utilisateur (remplaçable au rejeu)
+        self.clock = time.time
         
         if CardPredictor:
-            # On passe la fonction d'envoi pour les notifs INTER
-            self.card_predictor = CardPredictor(telegram_message_sender=self.send_message)
+            # Instance partagée du processus ; la fonction d'envoi sert aux notifs INTER (mises en file sans attendre)
+            self.card_predictor = get_card_predictor(telegram_message_sender=partial(self.send_message, wait=False))
+            # Analyse INTER périodique en arrière-plan
+            self.rule_scheduler = RuleScheduler(self.card_predictor, RULE_ANALYSIS_INTERVAL, RULE_ANALYSIS_JITTER)
+            self.rule_scheduler.start()
+            # Moteurs alternatifs évalués en fantôme (thread dédié, file bornée)
+            self.shadow = ShadowEvaluator.for_predictor(
+                self.card_predictor,
+                top_k=SHADOW_TOP_K,
+                half_life=INTER_DECAY_HALF_LIFE,
+                max_samples=INTER_DATA_MAX_SAMPLES,
+                queue_size=SHADOW_QUEUE_SIZE,
+                analysis_interval=RULE_ANALYSIS_INTERVAL
+            ) if SHADOW_ENABLED else None
         else:
             self.card_predictor = None
+            self.rule_scheduler = None
+            self.shadow = None
 
     # --- MESSAGERIE ---
     def _check_rate_limit(self, user_id):
-        now = time.time()
-        user_message_counts[user_id] = [t for t in user_message_counts[user_id] if now - t < 60]
-        user_message_counts[user_id].append(now)
-        return len(user_message_counts[user_id]) <= 30
-
-    def send_message(self, chat_id: int, text: str, parse_mode='Markdown', message_id: Optional[int] = None, edit=False, reply_markup: Optional[Dict] = None) -> Optional[int]:
+        now = self.clock()
+        with _rate_limit_lock:
+            user_message_counts[user_id] = [t for t in user_message_counts[user_id] if now - t < 60]
+            user_message_counts[user_id].append(now)
+            return len(user_message_counts[user_id]) <= 30
+
+    def send_message(self, chat_id: int, text: str, parse_mode='Markdown', message_id: Optional[int] = None, edit=False, reply_markup: Optional[Dict] = None, wait: bool = True) -> Optional[int]:
+        """
+        Envoie (ou édite) un message via le planificateur sortant.
+        Un envoi attend la réponse et renvoie le message_id (sauf wait=False) ; une édition est
+        mise en file (fusionnée avec les éditions en attente du même message) et renvoie None.
+        Un envoi encore en file après SEND_QUEUE_TIMEOUT secondes est annulé : None, rien n'est publié.
+        """
         if not chat_id or not text: return None
         
         method = 'editMessageText' if (message_id or edit) else 'sendMessage'
@@ -106,12 +161,23 @@ class TelegramHandlers:
         if reply_markup: 
             payload['reply_markup'] = json.dumps(reply_markup) if isinstance(reply_markup, dict) else reply_markup
 
+        # Canal de prédiction : priorité haute et latences distinctes
+        predictor = getattr(self, 'card_predictor', None)
+        is_prediction = bool(predictor and chat_id == predictor.prediction_channel_id)
         try:
-            r = requests.post(f"{self.base_url}/{method}", json=payload, timeout=10)
-            if r.status_code == 200:
-                return r.json().get('result', {}).get('message_id')
-            else:
-                logger.error(f"Erreur Telegram {r.status_code}: {r.text}")
+            job = self.outbound.submit(
+                method, payload,
+                priority=PRIORITY_PREDICTION if is_prediction else PRIORITY_ADMIN,
+                tag='prediction' if is_prediction else None
+            )
+            if method == 'editMessageText' or not wait: return None
+            r = job.wait(timeout=SEND_QUEUE_TIMEOUT)
+            if not job.done() and not job.cancel():
+                # Appel déjà parti : le message sera publié, on attend sa réponse (bornée par les
+                # reprises du client) pour que la prédiction soit enregistrée et vérifiée
+                r = job.wait()
+            if r and r.get('ok'):
+                return r.get('result', {}).get('message_id')
         except Exception as e:
             logger.error(f"Exception envoi message: {e}")
         return None
@@ -125,12 +191,13 @@ class TelegramHandlers:
             # Liste des fichiers à inclure
             files_to_include = [
                 'main.py', 'bot.py', 'handlers.py', 'card_predictor.py', 
-                'config.py', 'requirements.txt', 'RENDER_DEPLOYMENT_INSTRUCTIONS.md',
+                'config.py', 'persistence.py', 'journal.py', 'sqlite_store.py', 'update_queue.py',
+                'telegram_client.py', 'outbound.py', 'message_parser.py', 'archive.py', 'inter_stats.py', 'cards.py', 'rule_scheduler.py', 'rule_mining.py', 'backtest.py', 'shadow.py', 'history_import.py', 'metrics.py', 'update_recorder.py', 'replay.py', 'fake_telegram_api.py', 'diagnostics.py', 'snapshot.py', 'worker_coordination.py', 'requirements.txt', 'RENDER_DEPLOYMENT_INSTRUCTIONS.md',
                 # Fichiers de données INTER
                 'inter_data.json', 'smart_rules.json', 'sequential_history.json',
-                'collected_games.json', 'inter_mode_status.json',
+                'collected_games.json', 'inter_mode_status.json', 'inter_journal.jsonl', 'game_cards.json', 'inter_retired.json',
                 # Fichiers de prédictions
-                'predictions.json', 'processed.json', 'pending_edits.json',
+                'predictions.json', 'predictions_archive.jsonl', 'processed.json', 'pending_edits.json',
                 # Fichiers de configuration
                 'active_admin_chat_id.json',
                 # Fichiers d'état
@@ -138,6 +205,10 @@ class TelegramHandlers:
                 'last_prediction_time.json', 'consecutive_fails.json'
             ]
             
+            # Écrire l'état en attente avant de l'inclure dans le package
+            if self.card_predictor:
+                self.card_predictor.flush()
+            
             # Créer le fichier zip directement sans tempdir
             zip_filename = 'fin23.zip'
             
@@ -162,7 +233,6 @@ class TelegramHandlers:
                             logger.warning(f"⚠️ Fichier JSON optionnel non trouvé: {filename}")
             
             # Envoyer le fichier
-            url = f"{self.base_url}/sendDocument"
             with open(zip_filename, 'rb') as f:
                 files = {'document': (zip_filename, f, 'application/zip')}
                 # Compter les données collectées
@@ -174,15 +244,15 @@ class TelegramHandlers:
                     'caption': f'📦 **fin23.zip - Package Replit Deployment**\n\n✅ Port : 5000 (Replit)\n✅ Tous les fichiers inclus\n✅ **{data_count} jeux collectés**\n✅ **{rules_count} règles INTER**\n✅ Instructions incluses\n\n**Déploiement :**\n1. Utilisez Replit Deployments\n2. Variables env : BOT_TOKEN\n3. WEBHOOK_URL auto-configuré\n\nVoir RENDER_DEPLOYMENT_INSTRUCTIONS.md pour les détails',
                     'parse_mode': 'Markdown'
                 }
-                response = requests.post(url, data=data, files=files, timeout=60)
+                response = self.client.call('sendDocument', data=data, files=files, timeout=60)
             
-            if response.json().get('ok'):
+            if response and response.get('ok'):
                 logger.info(f"✅ fin23.zip envoyé avec succès")
                 # Supprimer le fichier local après envoi
                 if os.path.exists(zip_filename):
                     os.remove(zip_filename)
             else:
-                self.send_message(chat_id, f"❌ Erreur : {response.text}")
+                self.send_message(chat_id, f"❌ Erreur : {response}")
                     
         except Exception as e:
             logger.error(f"Erreur /deploy : {e}")
@@ -254,6 +324,90 @@ class TelegramHandlers:
         
         self.send_message(chat_id, message, reply_markup=keyboard)
 
+    # --- GESTION COMMANDE /mine ---
+    def _handle_command_mine(self, chat_id: int, text: str):
+        if not self.card_predictor: 
+            self.send_message(chat_id, "❌ Le moteur de prédiction n'est pas chargé.")
+            return
+        
+        parts = text.split()
+        offsets = MINING_OFFSETS
+        if len(parts) > 1:
+            if not parts[1].isdigit() or not 1 <= int(parts[1]) <= 5:
+                self.send_message(chat_id, "⚠️ Usage : `/mine [1-5]`")
+                return
+            offsets = (int(parts[1]),)
+        
+        started = time.perf_counter()
+        rules = self.card_predictor.mine_trigger_rules(offsets=offsets, limit=15)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        games = len(self.card_predictor.game_cards)
+        
+        message = "⛏️ **RÈGLES CANDIDATES (multi-décalages)**\n\n"
+        message += f"Jeux analysés : {games} | Décalages : {', '.join(f'N-{k}' for k in offsets)}\n\n"
+        if rules:
+            for rule in rules:
+                trigger = rule.trigger.replace("♥️", "❤️")
+                predict = rule.predict.replace("♥️", "❤️")
+                message += (f"• N-{rule.offset} G{rule.group} {trigger} → {predict} : "
+                            f"{rule.confidence:.0%} ({rule.count}x, support {rule.support:.1%})\n")
+        else:
+            message += f"⚠️ Aucune règle avec au moins {MINING_MIN_COUNT} occurrences.\n"
+        message += f"\n⏱️ Calcul : {elapsed_ms:.0f} ms"
+        self.send_message(chat_id, message)
+
+    # --- GESTION COMMANDE /shadow ---
+    def _handle_command_shadow(self, chat_id: int):
+        if not self.shadow:
+            self.send_message(chat_id, "⚠️ Évaluation fantôme désactivée (`SHADOW_ENABLED=false`).")
+            return
+        
+        stats = self.shadow.stats()
+        hours = (time.time() - stats['since']) / 3600
+        message = "👻 **ÉVALUATION FANTÔME**\n\n"
+        message += f"Depuis {hours:.1f} h | Messages : {stats['processed']} | Abandonnés : {stats['dropped']}\n\n"
+        for row in stats['engines']:
+            rate = f"{row['win_rate']:.1%}" if row['win_rate'] is not None else "—"
+            mode = f" | INTER {'actif' if row['inter_active'] else 'inactif'} ({row['inter_rules']} règles)" if row['engine'] != 'statique' else ""
+            message += (f"• **{row['engine']}** : {rate} ({row['wins']}/{row['wins'] + row['losses']})\n"
+                        f"   ✅0️⃣/1️⃣/2️⃣ {'/'.join(map(str, row['wins_by_offset']))} | ❌ {row['losses']} | "
+                        f"séries +{row['longest_win_streak']}/-{row['longest_loss_streak']}{mode}\n")
+        message += "\nℹ️ Prédictions simulées, jamais publiées."
+        self.send_message(chat_id, message)
+
+    # --- GESTION COMMANDE /import ---
+    def _handle_command_import(self, chat_id: int, text: str):
+        if not self.card_predictor: 
+            self.send_message(chat_id, "❌ Le moteur de prédiction n'est pas chargé.")
+            return
+        
+        parts = text.split(maxsplit=1)
+        path = resolve_import_path(HISTORY_IMPORT_DIR, parts[1].strip()) if len(parts) > 1 else None
+        if not path:
+            self.send_message(chat_id, f"⚠️ Usage : `/import <fichier>` (export `result.json` ou `.jsonl` placé dans `{HISTORY_IMPORT_DIR}/`)")
+            return
+        if self._import_thread and self._import_thread.is_alive():
+            self.send_message(chat_id, "⏳ Un import est déjà en cours.")
+            return
+        
+        def run():
+            try:
+                result = import_file(self.card_predictor, path)
+                self.send_message(chat_id, (
+                    f"📥 **IMPORT TERMINÉ**\n\n"
+                    f"Messages : {result['messages']} | Jeux : {result['games']} | Échantillons INTER : {result['inter']}\n"
+                    f"Règles INTER : {result['rules']}\n"
+                    f"⏱️ {result['seconds']} s ({result['messages_per_s']} msg/s, {result['mb_per_s']} Mo/s)"
+                ), wait=False)
+            except Exception as e:
+                logger.error(f"❌ Erreur import historique: {e}")
+                self.send_message(chat_id, f"❌ Import échoué : {e}", wait=False)
+        
+        # Import hors du worker d'updates (peut durer plusieurs minutes)
+        self._import_thread = threading.Thread(target=run, name='history-import', daemon=True)
+        self._import_thread.start()
+        self.send_message(chat_id, f"📥 Import de `{path}` lancé…")
+
     # --- GESTION COMMANDE /inter ---
     def _handle_command_inter(self, chat_id: int, text: str):
         if not self.card_predictor: 
@@ -270,7 +424,7 @@ class TelegramHandlers:
         
         elif action == 'default':
             self.card_predictor.is_inter_mode_active = False
-            self.card_predictor._save_all_data()
+            self.card_predictor._mark_dirty('inter_mode_status.json')
             self.send_message(chat_id, "❌ **MODE INTER DÉSACTIVÉ**\nRetour aux règles statiques.")
             
         elif action == 'status':
@@ -297,7 +451,7 @@ class TelegramHandlers:
         
         elif data == 'inter_default':
             self.card_predictor.is_inter_mode_active = False
-            self.card_predictor._save_all_data()
+            self.card_predictor._mark_dirty('inter_mode_status.json')
             # Mise à jour du message pour confirmer l'action
             msg, kb = self.card_predictor.get_inter_status()
             self.send_message(chat_id, msg, message_id=msg_id, edit=True, reply_markup=kb)
@@ -342,18 +496,29 @@ class TelegramHandlers:
                     self._handle_command_deploy(chat_id)
                 elif text.startswith('/collect'):
                     self._handle_command_collect(chat_id)
+                elif text.startswith('/mine'):
+                    self._handle_command_mine(chat_id, text)
+                elif text.startswith('/shadow'):
+                    self._handle_command_shadow(chat_id)
+                elif text.startswith('/import'):
+                    self._handle_command_import(chat_id, text)
                 
                 # Traitement Canal Source
                 elif str(chat_id) == str(self.card_predictor.target_channel_id):
+                    # Analyse unique du message, partagée par toutes les étapes
+                    with timed('parse'):
+                        parsed, _, _ = self.parse_cache.lookup(text)
                     
                     # A. Collecter TOUJOURS (même messages temporaires ⏰)
-                    game_num = self.card_predictor.extract_game_number(text)
+                    game_num = parsed.game_number
                     if game_num:
-                        self.card_predictor.collect_inter_data(game_num, text)
+                        with timed('collect'):
+                            self.card_predictor.collect_inter_data(game_num, parsed)
                     
                     # B. Vérifier UNIQUEMENT sur messages finalisés (✅ ou 🔰)
-                    if self.card_predictor.has_completion_indicators(text) or '🔰' in text:
-                        res = self.card_predictor._verify_prediction_common(text)
+                    if parsed.has_completion:
+                        with timed('verify'):
+                            res = self.card_predictor._verify_prediction_common(parsed)
                         
                         if res and res['type'] == 'edit_message':
                             mid_to_edit = res.get('message_id_to_edit') 
@@ -362,13 +527,24 @@ class TelegramHandlers:
                                 self.send_message(self.card_predictor.prediction_channel_id, res['new_message'], message_id=mid_to_edit, edit=True)
                     
                     # C. Prédire (même sur messages temporaires ⏰)
-                    ok, num, val = self.card_predictor.should_predict(text)
-                    if ok:
+                    with timed('predict'):
+                        ok, num, val = self.card_predictor.should_predict(parsed)
+                    # Plusieurs workers : réservation atomique avant l'envoi (pas de doublon)
+                    if ok and self.card_predictor.claim_prediction(num):
                         txt = self.card_predictor.prepare_prediction_text(num, val)
-                        mid = self.send_message(self.card_predictor.prediction_channel_id, txt)
+                        with timed('send'):
+                            mid = self.send_message(self.card_predictor.prediction_channel_id, txt)
                         
                         if mid:
-                            self.card_predictor.make_prediction(num, val, mid)
+                            increment('predictions_sent_total')
+                            with timed('record'):
+                                self.card_predictor.make_prediction(num, val, mid)
+                        else:
+                            self.card_predictor.release_prediction_claim(num)
+                    
+                    # D. Évaluation fantôme (après le traitement réel, dépôt non bloquant)
+                    if self.shadow:
+                        self.shadow.submit(parsed)
 
             # 2. Messages édités (CRITIQUE pour vérification)
             elif ('edited_message' in update and 'text' in update['edited_message']) or ('edited_channel_post' in update and 'text' in update['edited_channel_post']):
@@ -379,20 +555,33 @@ class TelegramHandlers:
                 
                 # Traitement Canal Source - Vérification sur messages édités
                 if str(chat_id) == str(self.card_predictor.target_channel_id):
+                    with timed('parse'):
+                        parsed, is_valid, seen = self.parse_cache.lookup(text)
+                    
+                    # Texte identique déjà traité : collecte et vérification déjà faites
+                    if seen:
+                        logger.debug("♻️ Édition identique déjà traitée, ignorée.")
+                        return
+                    
                     # Collecter TOUJOURS
-                    game_num = self.card_predictor.extract_game_number(text)
+                    game_num = parsed.game_number
                     if game_num:
-                        self.card_predictor.collect_inter_data(game_num, text)
+                        with timed('collect'):
+                            self.card_predictor.collect_inter_data(game_num, parsed)
                     
-                    # Vérifier UNIQUEMENT sur messages finalisés (✅ ou 🔰)
-                    if self.card_predictor.has_completion_indicators(text) or '🔰' in text:
-                        res = self.card_predictor.verify_prediction_from_edit(text)
+                    # Vérifier UNIQUEMENT sur messages finalisés (✅ ou 🔰) et structurellement valides
+                    if parsed.has_completion and is_valid:
+                        with timed('verify'):
+                            res = self.card_predictor.verify_prediction_from_edit(parsed)
                         
                         if res and res['type'] == 'edit_message':
                             mid_to_edit = res.get('message_id_to_edit')
                             
                             if mid_to_edit:
                                 self.send_message(self.card_predictor.prediction_channel_id, res['new_message'], message_id=mid_to_edit, edit=True)
+                    
+                    if self.shadow:
+                        self.shadow.submit(parsed, edited=True)
 
             # 3. Callbacks
             elif 'callback_query' in update:
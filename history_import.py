@@ -0,0 +1,205 @@
+# history_import.py
+
+"""
+Import en bloc de l'historique du canal source.
+Lit en flux un export JSON de Telegram Desktop (`result.json`) ou un dump JSONL
+(un message ou une update de l'API Bot par ligne), analyse chaque message avec le
+parseur du bot et reconstruit `sequential_history`/`inter_data`, les cartes par jeu
+et les statistiques INTER en une seule passe (voir CardPredictor.import_history).
+La mémoire reste constante : le fichier est lu par blocs, jamais chargé en entier.
+
+    python history_import.py result.json
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from message_parser import ParsedMessage, parse_message
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+CHUNK_SIZE = 1 << 20
+MESSAGES_KEY = '"messages"'
+# Clés d'update de l'API Bot portant un message
+UPDATE_MESSAGE_KEYS = ('channel_post', 'message', 'edited_channel_post', 'edited_message')
+
+
+class ImportProgress:
+    """Compteurs de lecture (octets lus, messages) pour le débit."""
+
+    def __init__(self):
+        self.bytes_read = 0
+        self.messages = 0
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def summary(self) -> Dict[str, float]:
+        elapsed = self.elapsed or 1e-9
+        return {
+            'bytes': self.bytes_read,
+            'messages': self.messages,
+            'seconds': round(self.elapsed, 2),
+            'messages_per_s': round(self.messages / elapsed),
+            'mb_per_s': round(self.bytes_read / elapsed / 1e6, 2),
+        }
+
+
+# --- Lecture en flux ---
+def iter_export_messages(path: str, progress: Optional[ImportProgress] = None,
+                         chunk_size: int = CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Objets des tableaux "messages" d'un export Telegram Desktop, un par un.
+    Un tampon d'au plus quelques blocs est conservé (décodage incrémental avec raw_decode).
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer, pos, eof = '', 0, False
+
+        def fill() -> bool:
+            nonlocal buffer, pos, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            if progress:
+                progress.bytes_read += len(chunk.encode('utf-8'))
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            return True
+
+        while True:
+            # 1. Début du prochain tableau "messages" (un export complet en contient un par discussion)
+            index = buffer.find(MESSAGES_KEY, pos)
+            while index < 0:
+                pos = max(pos, len(buffer) - len(MESSAGES_KEY))
+                if not fill(): return
+                index = buffer.find(MESSAGES_KEY, pos)
+            pos = index + len(MESSAGES_KEY)
+            while True:
+                start = buffer.find('[', pos)
+                if start >= 0: break
+                if not fill(): return
+            pos = start + 1
+
+            # 2. Éléments du tableau
+            while True:
+                while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos >= len(buffer):
+                    if not fill(): return
+                    continue
+                if buffer[pos] == ']':
+                    pos += 1
+                    break
+                try:
+                    obj, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # Objet coupé par la fin du bloc
+                    if not fill():
+                        raise ValueError(f"Export JSON tronqué ou invalide: {path}")
+                    continue
+                pos = end
+                yield obj
+
+
+def iter_jsonl_messages(path: str, progress: Optional[ImportProgress] = None) -> Iterator[Dict[str, Any]]:
+    """Messages d'un dump JSONL (message Telegram Desktop, message ou update de l'API Bot par ligne)."""
+    with open(path, 'rb') as f:
+        for line in f:
+            if progress:
+                progress.bytes_read += len(line)
+            line = line.strip()
+            if not line: continue
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                logger.warning("⚠️ Ligne JSONL invalide ignorée.")
+                continue
+            for key in UPDATE_MESSAGE_KEYS:
+                if key in obj:
+                    obj = obj[key]
+                    break
+            yield obj
+
+
+def message_text(message: Dict[str, Any]) -> str:
+    """Texte d'un message ; les exports Desktop découpent le texte formaté en segments."""
+    text = message.get('text', '')
+    if isinstance(text, list):
+        return ''.join(part if isinstance(part, str) else part.get('text', '') for part in text)
+    return text or ''
+
+
+def message_date(message: Dict[str, Any]) -> str:
+    """Date ISO d'un message (export Desktop : ISO ; API Bot : horodatage Unix)."""
+    date = message.get('edit_date') or message.get('date')
+    if isinstance(date, (int, float)):
+        return datetime.fromtimestamp(date).isoformat()
+    if isinstance(date, str) and date:
+        return date
+    return datetime.now().isoformat()
+
+
+def iter_source_messages(path: str, progress: Optional[ImportProgress] = None) -> Iterator[Tuple[ParsedMessage, str]]:
+    """(message analysé, date ISO) pour chaque message texte portant un numéro de jeu."""
+    if path.endswith('.jsonl'):
+        messages = iter_jsonl_messages(path, progress)
+    else:
+        messages = iter_export_messages(path, progress)
+    for message in messages:
+        if message.get('type', 'message') != 'message': continue
+        text = message_text(message)
+        if not text: continue
+        if progress:
+            progress.messages += 1
+        parsed = parse_message(text)
+        if parsed.game_number:
+            yield parsed, message_date(message)
+
+
+def import_file(predictor, path: str) -> Dict[str, Any]:
+    """Importe un fichier dans le prédicteur ; renvoie les compteurs et le débit."""
+    progress = ImportProgress()
+    counts = predictor.import_history(iter_source_messages(path, progress))
+    result = dict(counts)
+    result.update(progress.summary())
+    result['rules'] = len(predictor.smart_rules)
+    logger.info(
+        f"📥 Import terminé : {result['messages']} messages, {result['games']} jeux, {result['inter']} échantillons INTER "
+        f"en {result['seconds']} s ({result['messages_per_s']} msg/s, {result['mb_per_s']} Mo/s)"
+    )
+    return result
+
+
+def resolve_import_path(directory: str, name: str) -> Optional[str]:
+    """Chemin d'un fichier du dossier d'import (nom simple uniquement), None s'il n'existe pas."""
+    path = os.path.join(directory, os.path.basename(name))
+    return path if os.path.isfile(path) else None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Import de l'historique du canal source (export Telegram Desktop ou JSONL)")
+    parser.add_argument('path', help="result.json (Telegram Desktop) ou dump .jsonl")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    from card_predictor import get_card_predictor
+
+    predictor = get_card_predictor()
+    result = import_file(predictor, args.path)
+    predictor.shutdown()
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,271 @@
+# inter_stats.py
+
+"""
+Compteurs INTER incrémentaux : déclencheur -> enseigne de résultat.
+Les comptes vivent dans des matrices fixes 52×4 (`array`, indexées par code
+carte × enseigne, voir cards.py), mises à jour en O(1) à chaque ajout/suppression
+d'échantillon. Trois statistiques sont tenues en parallèle :
+- 'total'  : tous les échantillons (y compris ceux retirés de la mémoire),
+- 'window' : les N derniers échantillons (tampon circulaire),
+- 'decay'  : poids exponentiellement décroissant avec l'âge (demi-vie).
+L'analyse des règles ne coûte plus que O(règles) au lieu de O(historique).
+"""
+from array import array
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Iterable, List, Optional, Tuple, Union
+
+from cards import CARD_COUNT, SUIT_COUNT, SUITS, decode_card, encode_card, suit_index
+
+RESULT_SUITS = SUITS
+
+# Nombre de déclencheurs retenus par enseigne de résultat
+TOP_TRIGGERS = 2
+
+STATS_MODES = ('total', 'window', 'decay')
+
+# Cellules d'une matrice déclencheur × enseigne
+MATRIX_SIZE = CARD_COUNT * SUIT_COUNT
+
+# Exposant (en demi-vies) au-delà duquel les poids décroissants sont renormalisés
+MAX_DECAY_EXPONENT = 40
+
+
+def entry_timestamp(entry: Dict) -> float:
+    """Horodatage d'un échantillon (champ 'date' ISO), 0 si absent ou illisible."""
+    try:
+        return datetime.fromisoformat(entry['date']).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return 0.0
+
+
+class WindowedCounts:
+    """Comptes des `size` derniers échantillons : tampon circulaire de cellules, par identifiant d'échantillon."""
+
+    def __init__(self, size: int):
+        self.size = max(1, size)
+        self.counts = array('I', [0]) * MATRIX_SIZE
+        self._cells = array('i', [-1]) * self.size
+        self._samples: List[Optional[int]] = [None] * self.size
+        self._slots: Dict[int, int] = {}
+        self._pos = 0
+
+    def add(self, sample_id: int, cell: int) -> None:
+        old = self._cells[self._pos]
+        if old >= 0:
+            self.counts[old] -= 1
+            del self._slots[self._samples[self._pos]]
+        self._cells[self._pos] = cell
+        self._samples[self._pos] = sample_id
+        self._slots[sample_id] = self._pos
+        self.counts[cell] += 1
+        self._pos = (self._pos + 1) % self.size
+
+    def remove(self, sample_id: int) -> None:
+        slot = self._slots.pop(sample_id, None)
+        if slot is None: return
+        self.counts[self._cells[slot]] -= 1
+        self._cells[slot] = -1
+        self._samples[slot] = None
+
+
+class DecayedCounts:
+    """
+    Scores à décroissance exponentielle. Chaque échantillon pèse 2^((t - t_ref) / demi-vie) :
+    le vieillissement de tous les scores revient à un facteur commun, donc l'ajout reste O(1)
+    et l'ordre des scores est celui des poids ramenés à l'instant présent.
+    """
+
+    def __init__(self, half_life: float):
+        self.half_life = half_life
+        self.scores = array('d', [0.0]) * MATRIX_SIZE
+        self._ref: Optional[float] = None
+        self.latest: Optional[float] = None   # horodatage du plus récent échantillon
+
+    def _exponent(self, timestamp: float) -> float:
+        return (timestamp - self._ref) / self.half_life
+
+    def add(self, cell: int, timestamp: float) -> None:
+        if self._ref is None:
+            self._ref = timestamp
+        if self.latest is None or timestamp > self.latest:
+            self.latest = timestamp
+        exponent = self._exponent(timestamp)
+        if exponent > MAX_DECAY_EXPONENT:
+            self._rebase(timestamp)
+            exponent = 0.0
+        self.scores[cell] += 2.0 ** exponent
+
+    def remove(self, cell: int, timestamp: float) -> None:
+        if self._ref is None: return
+        self.scores[cell] = max(0.0, self.scores[cell] - 2.0 ** min(self._exponent(timestamp), MAX_DECAY_EXPONENT))
+
+    def value(self, cell: int, now: float) -> float:
+        """Score ramené à l'instant `now` (un échantillon de maintenant vaut 1)."""
+        if self._ref is None: return 0.0
+        return self.scores[cell] * 2.0 ** -max(self._exponent(now), -MAX_DECAY_EXPONENT)
+
+    def _rebase(self, timestamp: float) -> None:
+        factor = 2.0 ** -self._exponent(timestamp)
+        for cell in range(MATRIX_SIZE):
+            self.scores[cell] *= factor
+        self._ref = timestamp
+
+
+class InterStats:
+    """
+    `counts[code * 4 + enseigne]` = nombre d'échantillons (déclencheur, enseigne résultat).
+    Chaque cellule garde aussi le rang d'arrivée de ses échantillons : le premier sert
+    à départager les égalités (ordre de première apparition, comme l'ancien tri stable).
+    Un échantillon « retiré » (sorti de la mémoire) reste compté dans `counts` et `retired`.
+    Les échantillons sont désignés par un identifiant fourni par l'appelant (rang de collecte),
+    jamais par leur numéro de jeu : la numérotation du canal recommence chaque jour.
+    """
+
+    def __init__(self, top_n: int = TOP_TRIGGERS, mode: str = 'total',
+                 window: int = 500, half_life: float = 86400):
+        self.top_n = top_n
+        self.mode = mode if mode in STATS_MODES else 'total'
+        self.counts = array('I', [0]) * MATRIX_SIZE
+        self.retired = array('I', [0]) * MATRIX_SIZE
+        self.first_seen = array('Q', [0]) * MATRIX_SIZE
+        self.windowed = WindowedCounts(window)
+        self.decayed = DecayedCounts(half_life)
+        self.skipped = 0
+        self._seq = 0
+        self._cell_seqs: Dict[int, Deque[int]] = {}
+        self._entry_cell: Dict[int, Tuple[int, int, float]] = {}  # échantillon -> (cellule, rang, horodatage)
+        self._top: List[List[int]] = [[] for _ in range(SUIT_COUNT)]
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Dict], **options) -> 'InterStats':
+        stats = cls(**options)
+        for index, entry in enumerate(entries, 1):
+            stats.add(entry.get('seq', index), entry)
+        return stats
+
+    def __len__(self) -> int:
+        return len(self._entry_cell)
+
+    # --- Mises à jour ---
+    def add(self, sample_id: int, entry: Dict) -> None:
+        """Ajoute un échantillon (ignoré si cet identifiant est déjà compté)."""
+        if sample_id in self._entry_cell: return
+        code = encode_card(entry['declencheur'])
+        suit = suit_index(entry['result_suit'])
+        if code is None or suit is None:
+            self.skipped += 1
+            return
+
+        cell = code * SUIT_COUNT + suit
+        timestamp = entry_timestamp(entry)
+        self._seq += 1
+        self._entry_cell[sample_id] = (cell, self._seq, timestamp)
+        seqs = self._cell_seqs.get(cell)
+        if seqs is None:
+            seqs = self._cell_seqs[cell] = deque()
+        if not self.first_seen[cell]:
+            self.first_seen[cell] = self._seq
+        seqs.append(self._seq)
+        self.counts[cell] += 1
+        self.windowed.add(sample_id, cell)
+        self.decayed.add(cell, timestamp)
+        self._promote(suit, code)
+
+    def remove(self, sample_id: int) -> None:
+        located = self._entry_cell.pop(sample_id, None)
+        if located is None: return
+        cell, seq, timestamp = located
+        self._forget(cell, seq)
+        self.counts[cell] -= 1
+        if not self.retired[cell]:
+            # Les échantillons retirés sont plus anciens que tous ceux en mémoire
+            seqs = self._cell_seqs.get(cell)
+            self.first_seen[cell] = seqs[0] if seqs else 0
+        self.windowed.remove(sample_id)
+        self.decayed.remove(cell, timestamp)
+        # Une baisse peut faire sortir le déclencheur du Top : recalcul de cette enseigne (52 cellules)
+        suit = cell % SUIT_COUNT
+        column = self.counts[suit::SUIT_COUNT]
+        self._top[suit] = self._rank(suit, [code for code in range(CARD_COUNT) if column[code]], self.counts)
+
+    def retire(self, sample_id: int) -> None:
+        """Sort un échantillon de la mémoire en conservant son effet agrégé."""
+        located = self._entry_cell.pop(sample_id, None)
+        if located is None: return
+        cell, seq, _ = located
+        self._forget(cell, seq)
+        self.retired[cell] += 1
+
+    def load_retired(self, rows: Optional[List[Dict]]) -> None:
+        """Restaure les agrégats retirés (à appeler avant les échantillons en mémoire)."""
+        for row in rows or []:
+            code, suit = encode_card(row.get('declencheur', '')), suit_index(row.get('result_suit', ''))
+            count = int(row.get('count') or 0)
+            if code is None or suit is None or count <= 0: continue
+            cell = code * SUIT_COUNT + suit
+            if not self.first_seen[cell]:
+                self._seq += 1
+                self.first_seen[cell] = self._seq
+            self.counts[cell] += count
+            self.retired[cell] += count
+            self._promote(suit, code)
+
+    def retired_document(self) -> List[Dict]:
+        """Agrégats retirés, dans l'ordre de première apparition."""
+        cells = sorted((cell for cell in range(MATRIX_SIZE) if self.retired[cell]), key=lambda c: self.first_seen[c])
+        return [
+            {'declencheur': decode_card(cell // SUIT_COUNT), 'result_suit': SUITS[cell % SUIT_COUNT], 'count': self.retired[cell]}
+            for cell in cells
+        ]
+
+    # --- Lecture ---
+    def count(self, suit: str, trigger: str) -> int:
+        code, index = encode_card(trigger), suit_index(suit)
+        if code is None or index is None: return 0
+        return self.counts[code * SUIT_COUNT + index]
+
+    def top(self, suit: str, now: Optional[float] = None) -> List[Tuple[str, Union[int, float]]]:
+        """
+        Top des déclencheurs d'une enseigne selon le mode : [(carte, valeur), ...].
+        `now` : horloge de l'appelant (rejeu, backtest) pour le mode 'decay' ; à défaut,
+        la date du plus récent échantillon, jamais l'horloge murale.
+        """
+        index = suit_index(suit)
+        if index is None: return []
+        if self.mode == 'window':
+            values = self.windowed.counts
+            codes = self._rank(index, self._nonzero(index, values), values)
+            return [(decode_card(code), values[code * SUIT_COUNT + index]) for code in codes]
+        if self.mode == 'decay':
+            values = self.decayed.scores
+            codes = self._rank(index, self._nonzero(index, values), values)
+            now = now if now is not None else self.decayed.latest
+            return [(decode_card(code), round(self.decayed.value(code * SUIT_COUNT + index, now), 2)) for code in codes]
+        return [(decode_card(code), self.counts[code * SUIT_COUNT + index]) for code in self._top[index]]
+
+    # --- Interne ---
+    def _forget(self, cell: int, seq: int) -> None:
+        seqs = self._cell_seqs[cell]
+        if seqs[0] == seq:
+            seqs.popleft()
+        else:
+            seqs.remove(seq)
+        if not seqs:
+            del self._cell_seqs[cell]
+
+    @staticmethod
+    def _nonzero(suit: int, values) -> List[int]:
+        return [code for code in range(CARD_COUNT) if values[code * SUIT_COUNT + suit] > 0]
+
+    def _rank(self, suit: int, codes: Iterable[int], values) -> List[int]:
+        first_seen = self.first_seen
+        return sorted(
+            codes,
+            key=lambda code: (-values[code * SUIT_COUNT + suit], first_seen[code * SUIT_COUNT + suit])
+        )[:self.top_n]
+
+    def _promote(self, suit: int, code: int) -> None:
+        """Un compte vient d'augmenter : seul ce déclencheur peut entrer dans le Top."""
+        top = self._top[suit]
+        self._top[suit] = self._rank(suit, top if code in top else top + [code], self.counts)
@@ -0,0 +1,115 @@
+# journal.py
+
+"""
+Journal en ajout seul (JSONL) avec compaction périodique dans un snapshot.
+Chaque écriture coûte O(1) ; un crash pendant l'écriture ne corrompt que la dernière ligne.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class AppendOnlyJournal:
+    """
+    Journal JSONL. `rotate()` met de côté le journal courant pendant l'écriture
+    du snapshot ; `discard_rotated()` le supprime une fois le snapshot écrit.
+    Au démarrage, `replay()` relit le journal mis de côté puis le journal courant.
+    """
+
+    def __init__(self, path: str, compact_every: int = 1000, compact_interval: float = 600.0):
+        self.path = path
+        self.rotated_path = f"{path}.1"
+        self.compact_every = compact_every
+        self.compact_interval = compact_interval
+
+        self._fh = None
+        self._lock = threading.Lock()
+        self.records_since_compaction = 0
+        self.last_compaction = time.time()
+
+    # --- Écriture ---
+    def append(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            fh = self._open()
+            fh.write(line + '\n')
+            fh.flush()
+            self.records_since_compaction += 1
+
+    def _open(self):
+        if self._fh is None:
+            # Si un crash a laissé une ligne incomplète, on repart sur une nouvelle ligne
+            needs_newline = False
+            if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+                with open(self.path, 'rb') as f:
+                    f.seek(-1, os.SEEK_END)
+                    needs_newline = f.read(1) != b'\n'
+            self._fh = open(self.path, 'a', encoding='utf-8')
+            if needs_newline:
+                self._fh.write('\n')
+        return self._fh
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+    # --- Relecture ---
+    def replay(self) -> Iterator[Dict[str, Any]]:
+        """Relit les enregistrements (journal mis de côté puis courant), en ignorant les lignes corrompues."""
+        count = 0
+        for path in (self.rotated_path, self.path):
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                for line_number, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"⚠️ Ligne {line_number} corrompue ignorée dans {path}")
+                        continue
+                    count += 1
+                    yield record
+        self.records_since_compaction = count
+
+    # --- Compaction ---
+    def needs_compaction(self, now: Optional[float] = None) -> bool:
+        if self.records_since_compaction == 0:
+            return False
+        now = now if now is not None else time.time()
+        return (self.records_since_compaction >= self.compact_every or
+                now - self.last_compaction >= self.compact_interval)
+
+    def rotate(self) -> None:
+        """Met de côté le journal courant (à appeler sous le verrou d'état, après sérialisation du snapshot)."""
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+            self.records_since_compaction = 0
+            self.last_compaction = time.time()
+            if not os.path.exists(self.path):
+                return
+            if os.path.exists(self.rotated_path):
+                # Compaction précédente interrompue : on concatène
+                with open(self.path, 'r', encoding='utf-8') as src, open(self.rotated_path, 'a', encoding='utf-8') as dst:
+                    dst.write(src.read())
+                os.remove(self.path)
+            else:
+                os.replace(self.path, self.rotated_path)
+
+    def discard_rotated(self) -> None:
+        """Supprime le journal mis de côté (le snapshot le contient désormais)."""
+        with self._lock:
+            if os.path.exists(self.rotated_path):
+                os.remove(self.rotated_path)
@@ -2,15 +2,30 @@
 
 """
 Main entry point for the Telegram bot deployment on render.com
+
+Un seul worker gunicorn (défaut) : le bot est construit ici, le webhook alimente sa file.
+MULTI_WORKER=true : chaque worker dépose les updates dans une file partagée ; seul le
+worker leader construit le bot et les traite (voir worker_coordination.py).
 """
 import os
+import atexit
 import logging
-from flask import Flask, request, jsonify
-import requests
+from typing import Any, Callable, Dict, Optional
+from flask import Flask, Response, request, jsonify
 
 # Importe la configuration et le bot
-from config import Config
+from config import (
+    Config, WEBHOOK_WORKERS, WEBHOOK_QUEUE_SIZE,
+    UPDATE_RECORD_FILE, UPDATE_RECORD_MAX_BYTES, UPDATE_RECORD_BACKUPS, DIAGNOSTICS_TOKEN,
+    MULTI_WORKER, WORKER_SPOOL_PATH, WORKER_LOCK_PATH, WORKER_SPOOL_POLL, WORKER_LEADER_RETRY
+)
 from bot import TelegramBot 
+from update_queue import UpdateDispatcher
+from update_recorder import UpdateRecorder
+from metrics import stage_metrics, render_prometheus
+from handlers import user_message_counts
+from worker_coordination import UpdateSpool, WorkerCoordinator
+import diagnostics
 
 # Configure logging
 logging.basicConfig(
@@ -26,12 +41,44 @@ except ValueError as e:
     logger.error(f"❌ Erreur d'initialisation de la configuration: {e}")
     exit(1) 
 
-# 'bot' est l'instance de la classe TelegramBot
-bot = TelegramBot(config.BOT_TOKEN) 
+# 'bot' est l'instance de la classe TelegramBot (None dans un worker non leader)
+bot: Optional[TelegramBot] = None
+dispatcher: Optional[UpdateDispatcher] = None
+recorder: Optional[UpdateRecorder] = None
+
+# Plusieurs workers : file partagée des updates, traitée par le seul processus leader
+spool = UpdateSpool(WORKER_SPOOL_PATH) if MULTI_WORKER else None
+coordinator: Optional[WorkerCoordinator] = None
+
+
+def start_processing():
+    """Construit le bot et sa file de traitement ; renvoie la fonction d'entrée des updates."""
+    global bot, dispatcher, recorder
+    bot = TelegramBot(config.BOT_TOKEN)
+
+    # File d'attente : le webhook acquitte immédiatement, les workers traitent (ordre préservé par chat)
+    dispatcher = UpdateDispatcher(bot.handle_update, workers=WEBHOOK_WORKERS, max_queue_size=WEBHOOK_QUEUE_SIZE)
+
+    # Enregistrement optionnel des updates brutes (rejouables avec replay.py)
+    recorder = UpdateRecorder(UPDATE_RECORD_FILE, UPDATE_RECORD_MAX_BYTES, UPDATE_RECORD_BACKUPS) if UPDATE_RECORD_FILE else None
+
+    setup_webhook()
+    return ingest
+
+
+def ingest(update: Dict[str, Any], on_done: Optional[Callable[[], None]] = None) -> bool:
+    """Entrée d'une update dans le traitement ; False si la file est pleine. `on_done` : fin du traitement."""
+    if recorder:
+        recorder.record(update)
+    return dispatcher.submit(update, on_done)
+
 
 # Initialize Flask app
 app = Flask(__name__)
 
+# Routes de diagnostic /debug/* (protégées par DIAGNOSTICS_TOKEN ; handlers du processus leader)
+diagnostics.register_routes(app, lambda: bot.handlers if bot else None, DIAGNOSTICS_TOKEN, user_message_counts)
+
 
 # --- LOGIQUE WEBHOOK ---
 
@@ -43,9 +90,15 @@ def webhook():
         if not update:
             return jsonify({'status': 'ok'}), 200
 
-        # Délégation du traitement complet à bot.handle_update
-        if update:
-            bot.handle_update(update)
+        if spool:
+            # Multi-worker : file partagée, traitée dans l'ordre d'arrivée par le processus leader
+            spool.put(update)
+            return 'OK', 200
+
+        # Mise en file : traitement par bot.handle_update en arrière-plan
+        if not ingest(update):
+            # File pleine : Telegram renverra l'update plus tard
+            return 'Busy', 503
         
         return 'OK', 200
     except Exception as e:
@@ -55,7 +108,58 @@ def webhook():
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint for render.com"""
-    return {'status': 'healthy', 'service': 'telegram-bot'}, 200
+    workers = coordinator.stats() if coordinator else None
+    if bot is None:
+        # Worker non leader : il ne fait que déposer les updates dans la file partagée
+        return {'status': 'healthy', 'service': 'telegram-bot', 'workers': workers}, 200
+    return {
+        'status': 'healthy',
+        'service': 'telegram-bot',
+        'workers': workers,
+        'queue': dispatcher.stats(),
+        'telegram_api': bot.client.latency_summary(),
+        'outbound': bot.handlers.outbound.stats(),
+        'parse_cache': bot.handlers.parse_cache.stats(),
+        'rule_scheduler': bot.handlers.rule_scheduler.stats() if bot.handlers.rule_scheduler else None,
+        'shadow': bot.handlers.shadow.stats() if bot.handlers.shadow else None,
+        'stages': stage_metrics.summary()
+    }, 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Métriques au format texte Prometheus (étapes, compteurs, files, cache)"""
+    workers = {}
+    if coordinator:
+        worker_stats = coordinator.stats()
+        workers = {'worker_leader': 1 if coordinator.is_leader else 0, 'update_spool_depth': worker_stats['spool_depth']}
+    if bot is None:
+        return Response(render_prometheus(workers, {'updates_spooled_total': spool.put_count}),
+                        mimetype='text/plain; version=0.0.4')
+    queue = dispatcher.stats()
+    outbound = bot.handlers.outbound.stats()
+    parse_cache = bot.handlers.parse_cache.stats()
+    predictor = bot.handlers.card_predictor
+    gauges = {
+        'update_queue_depth': queue['depth'],
+        'outbound_queue_depth': outbound['depth'],
+        'outbound_inflight': outbound['inflight'],
+        'parse_cache_size': parse_cache['size'],
+        'pending_predictions': len(predictor.predictions) if predictor else 0,
+        'inter_mode_active': 1 if predictor and predictor.is_inter_mode_active else 0,
+        **workers,
+    }
+    totals = {
+        'updates_submitted_total': queue['submitted'],
+        'updates_rejected_total': queue['rejected'],
+        'updates_failed_total': queue['failed'],
+        'outbound_sent_total': outbound['sent'],
+        'outbound_coalesced_total': outbound['coalesced'],
+        'parse_cache_hits_total': parse_cache['hits'],
+        'parse_cache_misses_total': parse_cache['misses'],
+    }
+    if spool:
+        totals['updates_spooled_total'] = spool.put_count
+    return Response(render_prometheus(gauges, totals), mimetype='text/plain; version=0.0.4')
 
 @app.route('/', methods=['GET'])
 def home():
@@ -94,8 +198,33 @@ def setup_webhook():
     except Exception as e:
         logger.error(f"❌ Erreur critique lors du setup du webhook: {e}")
 
-# Configure webhook au démarrage (fonctionne avec Gunicorn)
-setup_webhook()
+def shutdown():
+    """
+    Arrêt ordonné (seul hook de sortie) : plus d'entrées depuis la file partagée, updates en file
+    traitées, messages sortants envoyés, puis dernières écritures différées et instantané du prédicteur.
+    """
+    if coordinator:
+        coordinator.stop()
+    if dispatcher:
+        dispatcher.stop()
+    if bot:
+        bot.handlers.outbound.join(timeout=10)
+    predictor = bot.handlers.card_predictor if bot else None
+    if predictor:
+        try:
+            predictor.shutdown()
+        except Exception as e:
+            logger.error(f"❌ Erreur à l'arrêt du prédicteur: {e}")
+
+atexit.register(shutdown)
+
+# Démarrage du traitement (fonctionne avec Gunicorn) : tout de suite avec un seul worker,
+# sinon dans le worker qui obtient le rôle de leader (webhook configuré à ce moment-là)
+if MULTI_WORKER:
+    coordinator = WorkerCoordinator(spool, WORKER_LOCK_PATH, start_processing,
+                                    poll_interval=WORKER_SPOOL_POLL, retry_interval=WORKER_LEADER_RETRY).start()
+else:
+    start_processing()
 
 if __name__ == '__main__':
     # Get port from environment 
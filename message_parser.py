@@ -0,0 +1,155 @@
+# message_parser.py
+
+"""
+Analyse en une seule passe des messages du canal source.
+Toutes les étapes (collecte INTER, vérification, prédiction) consomment le même `ParsedMessage`.
+"""
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional, Tuple, Union
+
+from cards import CARD_CODES
+
+# Expressions précompilées
+GAME_NUMBER_N_RE = re.compile(r'#N(\d+)\.', re.IGNORECASE)
+GAME_NUMBER_BLUE_RE = re.compile(r'🔵(\d+)🔵')
+PARENTHESES_RE = re.compile(r'\(([^)]*)\)')
+CARD_RE = re.compile(r'(\d+|[AKQJ])(♠️|♥️|♦️|♣️)', re.IGNORECASE)
+
+# Indicateurs (testés en ligne dans parse_message) :
+# temporaire ⏰ ▶ 🕐 ➡️ ; finalisé ✅ 🔰
+# Formats (cartes groupe 1, cartes groupe 2) acceptés pour un résultat final édité
+VALID_EDITED_COUNTS = ((3, 2), (3, 3), (2, 3))
+
+
+class ParsedMessage(NamedTuple):
+    """Résultat compact de l'analyse d'un message (cartes normalisées en ♥️)."""
+    text: str
+    game_number: Optional[int]
+    groups: Tuple[str, ...]                 # contenus de parenthèses non vides (❤️ normalisé)
+    first_group_cards: Tuple[str, ...]      # cartes du PREMIER groupe, ex: ('10♦️', 'K♠️')
+    group_card_counts: Tuple[int, ...]      # nombre de cartes des deux premiers groupes non vides
+    has_pending: bool                       # ⏰ ▶ 🕐 ➡️ : message temporaire
+    has_completion: bool                    # ✅ 🔰 : message finalisé
+    has_final_marker: bool                  # #T ou 🔵#R
+
+    @property
+    def first_card(self) -> Optional[str]:
+        return self.first_group_cards[0] if self.first_group_cards else None
+
+    @property
+    def first_suit(self) -> Optional[str]:
+        card = self.first_card
+        return card[-2:] if card else None
+
+    @property
+    def second_group_cards(self) -> Tuple[str, ...]:
+        """Cartes du DEUXIÈME groupe (calculées à la demande)."""
+        return normalize_cards(self.groups[1]) if len(self.groups) > 1 else ()
+
+    @property
+    def first_card_code(self) -> Optional[int]:
+        """Code entier de la première carte (voir cards.py), None si inconnue."""
+        card = self.first_card
+        return CARD_CODES.get(card) if card else None
+
+    @property
+    def is_structurally_valid(self) -> bool:
+        """Structure d'un résultat final connu (#T / #R, ou compte de cartes 3/2, 3/3, 2/3)."""
+        if len(self.groups) < 2: return False
+        if self.has_final_marker: return True
+        if len(self.groups) == 2:
+            return self.group_card_counts[:2] in VALID_EDITED_COUNTS
+        return False
+
+
+def normalize_cards(content: str) -> Tuple[str, ...]:
+    """Extrait les cartes d'un contenu, valeur en majuscule et ❤️ normalisé en ♥️."""
+    return tuple(f"{v.upper()}{c}" for v, c in CARD_RE.findall(content.replace("❤️", "♥️")))
+
+
+def parse_message(text: str) -> ParsedMessage:
+    """Analyse un message en une passe."""
+    match = GAME_NUMBER_N_RE.search(text) or GAME_NUMBER_BLUE_RE.search(text)
+    game_number = int(match.group(1)) if match else None
+
+    # ❤️ -> ♥️ une seule fois (ne déplace aucune parenthèse)
+    normalized = text.replace("❤️", "♥️")
+    raw_groups = PARENTHESES_RE.findall(normalized)
+    groups = tuple(g for g in raw_groups if g)
+
+    first_matches = CARD_RE.findall(raw_groups[0]) if raw_groups else []
+    first_group_cards = tuple(f"{v.upper()}{c}" for v, c in first_matches)
+
+    # Compte de cartes des deux premiers groupes (seuls utiles à la validation structurelle)
+    if raw_groups and raw_groups[0]:
+        counts = (len(first_matches),) + tuple(len(CARD_RE.findall(g)) for g in groups[1:2])
+    else:
+        counts = tuple(len(CARD_RE.findall(g)) for g in groups[:2])
+
+    return ParsedMessage(
+        text,
+        game_number,
+        groups,
+        first_group_cards,
+        counts,
+        '⏰' in text or '▶' in text or '🕐' in text or '➡️' in text,
+        '✅' in text or '🔰' in text,
+        '#T' in text or '🔵#R' in text,
+    )
+
+
+def as_parsed(message: Union[str, ParsedMessage]) -> ParsedMessage:
+    """Accepte un texte brut ou un message déjà analysé."""
+    return message if isinstance(message, ParsedMessage) else parse_message(message)
+
+
+class ParseCache:
+    """
+    Cache LRU borné : empreinte du texte -> (ParsedMessage, verdict structurel).
+    Les éditions successives d'un même message (⏰ -> ▶ -> ✅) et les renvois
+    identiques ne sont analysés qu'une fois.
+    """
+
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[bytes, Tuple[ParsedMessage, bool]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+    def lookup(self, text: str) -> Tuple[ParsedMessage, bool, bool]:
+        """Renvoie (message analysé, verdict structurel, déjà vu)."""
+        key = self._key(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0], entry[1], True
+            self.misses += 1
+
+        parsed = parse_message(text)
+        entry = (parsed, parsed.is_structurally_valid)
+        with self._lock:
+            self._entries[key] = entry
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry[0], entry[1], False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            }
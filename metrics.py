@@ -0,0 +1,194 @@
+# metrics.py
+
+"""
+Mesures du traitement des updates :
+- chronométrage par étape (analyse, collecte, vérification, prédiction, envoi, persistance…) :
+  fenêtre glissante pour les percentiles de /health et de replay.py, et histogramme cumulatif
+  à bornes fixes pour Prometheus ;
+- compteurs étiquetés (updates par type, prédictions envoyées, gains/pertes…).
+`render_prometheus` produit le format texte exposé par la route /metrics.
+Coût par mesure : une recherche dichotomique et quelques incréments sous verrou.
+"""
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from telegram_client import LatencyStats
+
+# Bornes des histogrammes de durée (secondes)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_PREFIX = 'bot_'
+
+# Aide des métriques exposées (HELP Prometheus)
+METRIC_HELP = {
+    'stage_duration_seconds': "Durée des étapes de traitement des updates",
+    'updates_total': "Updates reçues par type",
+    'predictions_sent_total': "Prédictions publiées",
+    'predictions_resolved_total': "Prédictions vérifiées par statut",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Histogramme cumulatif à bornes fixes (sémantique Prometheus : valeur <= borne)."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        total, rows = 0, []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            rows.append((format(bound, 'g'), total))
+        rows.append(('+Inf', self.count))
+        return rows
+
+
+class StageMetrics:
+    """Durées par étape (thread-safe)."""
+
+    def __init__(self, maxlen: Optional[int] = 1000):
+        self.maxlen = maxlen
+        self._stages: Dict[str, LatencyStats] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float, ok: bool = True) -> None:
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = LatencyStats(self.maxlen)
+                self._histograms[stage] = Histogram()
+            stats.add(seconds, ok)
+            self._histograms[stage].observe(seconds)
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.record(stage, time.perf_counter() - started, ok)
+
+    def reset(self, maxlen: Optional[int] = 1000) -> None:
+        """Repart de zéro (maxlen=None : toutes les durées sont gardées, pour un rejeu complet)."""
+        with self._lock:
+            self.maxlen = maxlen
+            self._stages.clear()
+            self._histograms.clear()
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            result = {}
+            for stage, stats in sorted(self._stages.items()):
+                row = stats.summary()
+                row['p90_ms'] = round(stats.percentile(90) * 1000, 1)
+                row['total_ms'] = round(self._histograms[stage].sum * 1000, 1)
+                result[stage] = row
+            return result
+
+    def histograms(self) -> Dict[str, Histogram]:
+        with self._lock:
+            return {stage: _copy_histogram(h) for stage, h in sorted(self._histograms.items())}
+
+
+class Counters:
+    """Compteurs étiquetés (thread-safe)."""
+
+    def __init__(self):
+        self._values: Dict[Tuple[str, Labels], float] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, labels: Optional[Dict[str, Any]] = None, value: float = 1) -> None:
+        key = (name, tuple(sorted((k, str(v)) for k, v in (labels or {}).items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def value(self, name: str, labels: Optional[Dict[str, Any]] = None) -> float:
+        key = (name, tuple(sorted((k, str(v)) for k, v in (labels or {}).items())))
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def items(self) -> List[Tuple[str, Labels, float]]:
+        with self._lock:
+            return sorted((name, labels, value) for (name, labels), value in self._values.items())
+
+
+def _copy_histogram(histogram: Histogram) -> Histogram:
+    copy = Histogram(histogram.buckets)
+    copy.counts = list(histogram.counts)
+    copy.sum, copy.count = histogram.sum, histogram.count
+    return copy
+
+
+# Registres partagés par le bot
+stage_metrics = StageMetrics()
+counters = Counters()
+
+
+def timed(stage: str):
+    """`with timed('collect'): ...` — chronomètre un bloc dans le registre partagé."""
+    return stage_metrics.timer(stage)
+
+
+def increment(name: str, labels: Optional[Dict[str, Any]] = None, value: float = 1) -> None:
+    counters.increment(name, labels, value)
+
+
+# --- Format texte Prometheus ---
+def _labels(pairs: Labels) -> str:
+    if not pairs: return ''
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in pairs)
+    return '{' + ','.join(escaped) + '}'
+
+
+def render_prometheus(gauges: Optional[Dict[str, float]] = None, totals: Optional[Dict[str, float]] = None) -> str:
+    """
+    Histogrammes d'étapes et compteurs partagés, au format texte 0.0.4, plus les valeurs
+    lues au moment de la requête : jauges (profondeurs de file…) et totaux tenus par
+    d'autres composants (succès/échecs du cache d'analyse…), exposés comme compteurs.
+    """
+    lines = []
+    name = METRIC_PREFIX + 'stage_duration_seconds'
+    lines += [f"# HELP {name} {METRIC_HELP['stage_duration_seconds']}", f"# TYPE {name} histogram"]
+    for stage, histogram in stage_metrics.histograms().items():
+        for bound, count in histogram.cumulative():
+            lines.append(f"{name}_bucket{_labels((('stage', stage), ('le', bound)))} {count}")
+        lines.append(f"{name}_sum{_labels((('stage', stage),))} {histogram.sum:.6f}")
+        lines.append(f"{name}_count{_labels((('stage', stage),))} {histogram.count}")
+
+    declared = set()
+    for counter, labels, value in counters.items():
+        name = METRIC_PREFIX + counter
+        if name not in declared:
+            declared.add(name)
+            if counter in METRIC_HELP:
+                lines.append(f"# HELP {name} {METRIC_HELP[counter]}")
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_labels(labels)} {value:g}")
+
+    for total, value in sorted((totals or {}).items()):
+        name = METRIC_PREFIX + total
+        lines += [f"# TYPE {name} counter", f"{name} {float(value):g}"]
+    for gauge, value in sorted((gauges or {}).items()):
+        name = METRIC_PREFIX + gauge
+        lines += [f"# TYPE {name} gauge", f"{name} {float(value):g}"]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,246 @@
+# outbound.py
+
+"""
+Planificateur des envois sortants vers Telegram :
+- seaux à jetons par chat (et global) pour rester sous les limites anti-flood,
+- priorité au canal de prédiction sur les réponses admin,
+- fusion des éditions en attente d'un même message (seul le dernier texte est envoyé),
+- annulation d'un envoi abandonné par l'appelant tant qu'il n'est pas parti.
+"""
+import time
+import heapq
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+PRIORITY_PREDICTION = 0
+PRIORITY_ADMIN = 1
+
+
+class TokenBucket:
+    """Seau à jetons : `rate` jetons/seconde, au plus `capacity` en réserve."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Temps avant qu'un jeton soit disponible (0 si disponible maintenant)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+
+class OutboundJob:
+    """
+    Appel API en attente d'envoi. `wait()` renvoie la réponse JSON (ou None).
+    `cancel()` retire l'appel de la file s'il n'est pas encore parti.
+    """
+
+    def __init__(self, method: str, payload: Dict[str, Any], chat_id: Any, priority: int, seq: int,
+                 tag: Optional[str] = None, coalesce_key: Optional[Tuple] = None):
+        self.method = method
+        self.payload = payload
+        self.chat_id = chat_id
+        self.priority = priority
+        self.seq = seq
+        self.tag = tag
+        self.coalesce_key = coalesce_key
+        self.coalesced = 0
+        self.result: Optional[Dict[str, Any]] = None
+        self.started = False
+        self.cancelled = False
+        self._state_lock = threading.Lock()
+        self._done = threading.Event()
+
+    def __lt__(self, other: 'OutboundJob') -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        self._done.wait(timeout)
+        return self.result
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def cancel(self) -> bool:
+        """Abandonne l'envoi ; False si l'appel API est déjà parti (sa réponse arrivera quand même)."""
+        with self._state_lock:
+            if self.started: return False
+            self.cancelled = True
+        self._done.set()
+        return True
+
+    def _start(self) -> bool:
+        """Marque l'appel comme parti ; False s'il a été annulé entre-temps."""
+        with self._state_lock:
+            if self.cancelled: return False
+            self.started = True
+            return True
+
+
+class OutboundScheduler:
+    """
+    File de priorité des envois. Un seul appel en cours par chat (ordre préservé),
+    plusieurs chats en parallèle via un petit pool d'envoi.
+    """
+
+    def __init__(self, client, chat_rate: float = 1.0, chat_burst: float = 3.0,
+                 global_rate: float = 30.0, senders: int = 4):
+        self.client = client
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+
+        self._heap: List[OutboundJob] = []
+        self._buckets: Dict[Any, TokenBucket] = {}
+        self._pending_edits: Dict[Tuple, OutboundJob] = {}
+        self._inflight_chats = set()
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=senders, thread_name_prefix='outbound-send')
+        self._thread: Optional[threading.Thread] = None
+
+        self.sent = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    # --- API ---
+    def submit(self, method: str, payload: Dict[str, Any], priority: int = PRIORITY_ADMIN,
+               tag: Optional[str] = None) -> OutboundJob:
+        """Met un appel en file. Les éditions d'un même message encore en attente sont fusionnées."""
+        chat_id = payload.get('chat_id')
+        coalesce_key = (chat_id, payload['message_id']) if method == 'editMessageText' and payload.get('message_id') else None
+
+        with self._cond:
+            if coalesce_key is not None:
+                existing = self._pending_edits.get(coalesce_key)
+                if existing is not None and not existing.cancelled:
+                    # Le dernier texte l'emporte ; la priorité la plus haute est conservée
+                    existing.payload = payload
+                    existing.coalesced += 1
+                    self.coalesced += 1
+                    if priority < existing.priority:
+                        existing.priority = priority
+                        heapq.heapify(self._heap)
+                    return existing
+
+            self._seq += 1
+            job = OutboundJob(method, payload, chat_id, priority, self._seq, tag, coalesce_key)
+            heapq.heappush(self._heap, job)
+            if coalesce_key is not None:
+                self._pending_edits[coalesce_key] = job
+            self._ensure_started()
+            self._cond.notify_all()
+        return job
+
+    def depth(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'depth': len(self._heap),
+                'inflight': len(self._inflight_chats),
+                'sent': self.sent,
+                'coalesced': self.coalesced,
+                'cancelled': self.cancelled,
+            }
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Attend que tous les envois en file soient terminés."""
+        deadline = time.time() + timeout if timeout is not None else None
+        with self._cond:
+            while self._heap or self._inflight_chats:
+                remaining = deadline - time.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining if remaining is not None else 0.1)
+        return True
+
+    # --- Boucle de planification ---
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='outbound-scheduler', daemon=True)
+            self._thread.start()
+
+    def _bucket(self, chat_id: Any) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _next_ready(self, now: float) -> Tuple[Optional[OutboundJob], float]:
+        """Renvoie le premier job envoyable (par priorité) ou le délai avant le prochain possible."""
+        global_wait = self.global_bucket.wait_time(now)
+        if global_wait > 0:
+            return None, global_wait
+
+        skipped = []
+        job = None
+        wait = None
+        while self._heap:
+            candidate = heapq.heappop(self._heap)
+            if candidate.chat_id in self._inflight_chats:
+                skipped.append(candidate)
+                continue
+            chat_wait = self._bucket(candidate.chat_id).wait_time(now)
+            if chat_wait > 0:
+                wait = chat_wait if wait is None else min(wait, chat_wait)
+                skipped.append(candidate)
+                continue
+            job = candidate
+            break
+        for candidate in skipped:
+            heapq.heappush(self._heap, candidate)
+        return job, (wait if wait is not None else 1.0)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                job, wait = self._next_ready(now)
+                if job is None:
+                    self._cond.wait(wait if self._heap else None)
+                    continue
+                if job.coalesce_key is not None:
+                    self._pending_edits.pop(job.coalesce_key, None)
+                if not job._start():
+                    # Abandonné par l'appelant avant son tour : jamais envoyé
+                    self.cancelled += 1
+                    self._cond.notify_all()
+                    continue
+                self.global_bucket.take(now)
+                self._bucket(job.chat_id).take(now)
+                self._inflight_chats.add(job.chat_id)
+            try:
+                self._executor.submit(self._send, job)
+            except RuntimeError:
+                # Pool d'envoi fermé par l'interpréteur à la sortie : envoi direct pendant la vidange finale
+                self._send(job)
+
+    def _send(self, job: OutboundJob) -> None:
+        try:
+            job.result = self.client.call(job.method, job.payload, timeout=10, tag=job.tag)
+        except Exception as e:
+            logger.error(f"Exception envoi {job.method}: {e}")
+        finally:
+            with self._cond:
+                self._inflight_chats.discard(job.chat_id)
+                self.sent += 1
+                self._cond.notify_all()
+            job._done.set()
@@ -0,0 +1,155 @@
+# persistence.py
+
+"""
+Moteur de persistance "write-behind" : les modifications marquent des fichiers
+comme modifiés, un thread d'arrière-plan les écrit par lots (intervalle ou seuil).
+"""
+import os
+import logging
+import threading
+from typing import Callable, Optional, Set
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def atomic_write_bytes(filename: str, content: bytes) -> None:
+    """Écrit un fichier de manière atomique (fichier temporaire + os.replace)."""
+    tmp_filename = f"{filename}.tmp"
+    with open(tmp_filename, 'wb') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_filename, filename)
+
+
+def atomic_write_text(filename: str, content: str) -> None:
+    atomic_write_bytes(filename, content.encode('utf-8'))
+
+
+class PersistenceEngine:
+    """
+    Regroupe les écritures disque hors du chemin critique du webhook.
+
+    `serialize(filename)` est appelé sous `state_lock` et renvoie le contenu texte
+    à écrire (ou None pour ignorer). L'écriture elle-même se fait hors du verrou.
+    `maintenance()` (optionnel) est appelé à chaque tour du thread, après le flush ;
+    `on_stop()` (optionnel) une fois à l'arrêt, après le dernier flush.
+    """
+
+    def __init__(self, serialize: Callable[[str], Optional[str]], state_lock,
+                 flush_interval: float = 5.0, dirty_threshold: int = 50,
+                 writer: Callable[[str, str], None] = atomic_write_text,
+                 maintenance: Optional[Callable[[], None]] = None,
+                 on_stop: Optional[Callable[[], None]] = None):
+        self.serialize = serialize
+        self.state_lock = state_lock
+        self.flush_interval = flush_interval
+        self.dirty_threshold = dirty_threshold
+        self.writer = writer
+        self.maintenance = maintenance
+        self.on_stop = on_stop
+
+        self._dirty: Set[str] = set()
+        self._dirty_count = 0
+        self._dirty_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.flush_count = 0
+        self.files_written = 0
+
+    # --- API ---
+    def mark_dirty(self, *filenames: str) -> None:
+        """Marque des fichiers à réécrire. Démarre le thread au premier appel."""
+        with self._dirty_lock:
+            self._dirty.update(filenames)
+            self._dirty_count += 1
+            threshold_reached = self._dirty_count >= self.dirty_threshold
+
+        self._ensure_started()
+        if threshold_reached:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Écrit immédiatement tous les fichiers modifiés. Renvoie le nombre de fichiers écrits."""
+        with self._flush_lock:
+            with self._dirty_lock:
+                filenames = sorted(self._dirty)
+                self._dirty.clear()
+                self._dirty_count = 0
+            if not filenames:
+                return 0
+
+            # Sérialisation sous verrou d'état (cohérence), écriture hors verrou
+            contents = {}
+            with self.state_lock:
+                for filename in filenames:
+                    try:
+                        content = self.serialize(filename)
+                    except Exception as e:
+                        logger.error(f"❌ Erreur sérialisation {filename}: {e}")
+                        continue
+                    if content is not None:
+                        contents[filename] = content
+
+            written = 0
+            for filename, content in contents.items():
+                try:
+                    self.writer(filename, content)
+                    written += 1
+                except Exception as e:
+                    logger.error(f"❌ Erreur sauvegarde {filename}: {e}")
+                    with self._dirty_lock:
+                        self._dirty.add(filename)
+
+            self.flush_count += 1
+            self.files_written += written
+            logger.debug(f"💾 Flush: {written}/{len(filenames)} fichier(s) écrit(s)")
+            return written
+
+    def start(self) -> None:
+        """Démarre le thread d'arrière-plan (sans rien marquer)."""
+        self._ensure_started()
+
+    def pending(self) -> Set[str]:
+        with self._dirty_lock:
+            return set(self._dirty)
+
+    def stop(self) -> None:
+        """Arrête le thread et écrit les dernières modifications (appelé à l'arrêt)."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+        if self.on_stop:
+            try:
+                self.on_stop()
+            except Exception as e:
+                logger.error(f"❌ Erreur à l'arrêt de la persistance: {e}")
+
+    # --- Thread d'arrière-plan ---
+    def _ensure_started(self) -> None:
+        if self._thread is not None or self._stopped.is_set():
+            return
+        with self._flush_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='persistence-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.flush()
+                if self.maintenance:
+                    self.maintenance()
+            except Exception as e:
+                logger.error(f"❌ Erreur thread de persistance: {e}")
@@ -0,0 +1,227 @@
+# replay.py
+
+"""
+Rejeu déterministe d'un enregistrement d'updates (update_recorder.py) à travers
+TelegramBot.handle_update, hors ligne :
+- les appels Telegram partent vers un faux serveur local (fake_telegram_api.py),
+- l'horloge du prédicteur et de la limite de débit suit les horodatages enregistrés
+  (délai anti-spam, analyse INTER périodique, rétention), quelle que soit la vitesse de rejeu,
+- l'état part d'un dossier vierge, ou d'une copie de l'état de production (--state-from).
+Rapport : débit, percentiles de latence par étape, état final du prédicteur.
+
+    python replay.py updates.jsonl [--speed max|realtime] [--factor 10] [--state-from DIR] [--json]
+                     [--api-latency-ms 50 --api-jitter-ms 100 --api-error-rate 0.02 --api-rate-limit-rate 0.01 --seed 1]
+"""
+import os
+import sys
+import json
+import glob
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+from typing import Any, Dict, Optional
+
+from update_recorder import iter_recording
+from fake_telegram_api import FakeTelegramAPI
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Fichiers d'état copiés par --state-from
+STATE_PATTERNS = ('*.json', '*.jsonl', '*.bin', '*.db')
+# Limites d'envoi levées pendant le rejeu (sauf --keep-rate-limits)
+UNLIMITED_RATES = {'OUTBOUND_CHAT_RATE': '100000', 'OUTBOUND_CHAT_BURST': '100000', 'OUTBOUND_GLOBAL_RATE': '100000'}
+
+
+class ReplayClock:
+    """Horloge pilotée par les horodatages de l'enregistrement."""
+
+    def __init__(self, start: Optional[float] = None):
+        self.current = start if start is not None else time.time()
+
+    def set(self, ts: float) -> None:
+        # Jamais de retour en arrière (enregistrements concaténés, horloges décalées)
+        if ts > self.current:
+            self.current = ts
+
+    def now(self) -> float:
+        return self.current
+
+
+def copy_state(source: str, destination: str) -> int:
+    copied = 0
+    for pattern in STATE_PATTERNS:
+        for path in glob.glob(os.path.join(source, pattern)):
+            shutil.copy2(path, destination)
+            copied += 1
+    return copied
+
+
+def predictor_state(predictor) -> Dict[str, Any]:
+    totals = predictor.prediction_totals()
+    return {
+        'pending_predictions': len(predictor.predictions),
+        'archived_won': totals.get('won', 0),
+        'archived_lost': totals.get('lost', 0),
+        'archived_expired': totals.get('expired', 0),
+        'last_predicted_game_number': predictor.last_predicted_game_number,
+        'consecutive_fails': predictor.consecutive_fails,
+        'inter_mode_active': bool(predictor.is_inter_mode_active),
+        'smart_rules': len(predictor.smart_rules),
+        'inter_data': len(predictor.inter_data),
+        'game_cards': len(predictor.game_cards),
+    }
+
+
+def run(recording: str, speed: str = 'max', factor: float = 1.0, state_dir: Optional[str] = None,
+        state_from: Optional[str] = None, api_base: Optional[str] = None, api_latency: float = 0.0,
+        keep_rate_limits: bool = False, token: Optional[str] = None,
+        api_faults: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """api_faults : options de dégradation du faux serveur (jitter, error_rate, rate_limit_rate, retry_after, seed)."""
+    recording = os.path.abspath(recording)
+
+    # 1. Environnement, AVANT l'import des modules du bot (config lu à l'import)
+    api = None
+    if not api_base:
+        api = FakeTelegramAPI(latency=api_latency, **(api_faults or {})).start()
+        api_base = api.base_url
+    os.environ['TELEGRAM_API_BASE'] = api_base
+    os.environ['UPDATE_RECORD_FILE'] = ''
+    os.environ.setdefault('SHADOW_ENABLED', 'false')
+    if not keep_rate_limits:
+        os.environ.update(UNLIMITED_RATES)
+
+    # 2. Dossier d'état isolé
+    workdir = state_dir or tempfile.mkdtemp(prefix='replay-')
+    os.makedirs(workdir, exist_ok=True)
+    if state_from:
+        logger.info(f"📂 {copy_state(state_from, workdir)} fichier(s) d'état copiés depuis {state_from}")
+    os.chdir(workdir)
+
+    from bot import TelegramBot
+    from config import RULE_ANALYSIS_INTERVAL
+    from metrics import stage_metrics, timed
+
+    stage_metrics.reset(maxlen=None)
+    bot = TelegramBot(token or os.getenv('BOT_TOKEN') or '123456:REPLAY')
+    handlers = bot.handlers
+    predictor = handlers.card_predictor
+    if handlers.rule_scheduler:
+        # Analyse périodique (et rétention) rejouées de façon synchrone, sur l'horloge de l'enregistrement
+        handlers.rule_scheduler.stop()
+    clock = ReplayClock()
+    if predictor:
+        predictor.clock = clock.now
+    handlers.clock = clock.now
+
+    # 3. Rejeu
+    updates = 0
+    first_ts = None
+    started = time.perf_counter()
+    for ts, update in iter_recording(recording):
+        if first_ts is None:
+            first_ts = ts
+            clock.current = ts
+        clock.set(ts)
+        if speed == 'realtime':
+            delay = started + (ts - first_ts) / factor - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        bot.handle_update(update)
+        if predictor:
+            with timed('analysis'):
+                predictor.check_and_update_rules(RULE_ANALYSIS_INTERVAL)
+            with timed('retention'):
+                predictor.apply_retention()
+        updates += 1
+    processing = time.perf_counter() - started
+
+    # 4. Fin : envois en attente, écriture de l'état
+    handlers.outbound.join(timeout=30)
+    if predictor:
+        predictor.shutdown()
+    elapsed = time.perf_counter() - started
+
+    report = {
+        'replay': {
+            'recording': recording,
+            'state_dir': workdir,
+            'speed': speed if speed == 'max' else f"realtime x{factor}",
+            'updates': updates,
+            'recorded_span_s': round(clock.current - first_ts, 1) if first_ts is not None else 0.0,
+            'processing_s': round(processing, 3),
+            'elapsed_s': round(elapsed, 3),
+            'updates_per_s': round(updates / processing, 1) if processing else 0.0,
+        },
+        'stages': stage_metrics.summary(),
+        'telegram_api': bot.client.latency_summary(),
+        'fake_api': api.stats() if api else None,
+        'predictor': predictor_state(predictor) if predictor else None,
+    }
+    if api:
+        api.stop()
+    return report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    replay = report['replay']
+    lines = [
+        f"▶️ Rejeu : {replay['updates']} updates ({replay['speed']}) en {replay['processing_s']} s "
+        f"→ {replay['updates_per_s']} updates/s (période enregistrée : {replay['recorded_span_s']} s)",
+        f"📂 État : {replay['state_dir']}",
+        "",
+        f"{'Étape':<10} {'n':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} {'total ms':>10}",
+    ]
+    for stage, row in report['stages'].items():
+        lines.append(f"{stage:<10} {row['count']:>7} {row['p50_ms']:>8} {row['p90_ms']:>8} "
+                     f"{row['p99_ms']:>8} {row['max_ms']:>8} {row['total_ms']:>10}")
+    if report['fake_api']:
+        lines += ["", f"📡 Appels API : {report['fake_api']['calls']}"]
+        if report['fake_api']['faults']:
+            lines.append(f"⚠️ Dégradations injectées : {report['fake_api']['faults']}")
+    if report['predictor']:
+        lines += ["", "🧠 État final du prédicteur :"]
+        lines += [f"  {key}: {value}" for key, value in report['predictor'].items()]
+    return '\n'.join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Rejeu d'un enregistrement d'updates contre un faux serveur Telegram")
+    parser.add_argument('recording', help="Fichier JSONL de update_recorder (les fichiers tournés .N sont inclus)")
+    parser.add_argument('--speed', choices=('max', 'realtime'), default='max')
+    parser.add_argument('--factor', type=float, default=1.0, help="Accélération du mode realtime")
+    parser.add_argument('--state-dir', help="Dossier de travail (défaut : dossier temporaire)")
+    parser.add_argument('--state-from', help="Copier l'état initial depuis ce dossier")
+    parser.add_argument('--api-base', help="API existante (défaut : faux serveur local démarré par l'outil)")
+    parser.add_argument('--api-latency-ms', type=float, default=0, help="Latence du faux serveur")
+    parser.add_argument('--api-jitter-ms', type=float, default=0, help="Gigue de latence du faux serveur")
+    parser.add_argument('--api-error-rate', type=float, default=0, help="Proportion de réponses 502")
+    parser.add_argument('--api-rate-limit-rate', type=float, default=0, help="Proportion de réponses 429")
+    parser.add_argument('--api-retry-after', type=int, default=1, help="retry_after des réponses 429 (s)")
+    parser.add_argument('--seed', type=int, help="Graine des dégradations du faux serveur")
+    parser.add_argument('--keep-rate-limits', action='store_true', help="Garder les limites d'envoi configurées")
+    parser.add_argument('--json', action='store_true', help="Rapport JSON")
+    parser.add_argument('--verbose', action='store_true', help="Journaux du bot")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format='%(message)s')
+    if not args.verbose:
+        # Les modules du bot forcent INFO sur leurs loggers : coupure globale pendant le rejeu
+        logging.disable(logging.INFO)
+
+    report = run(
+        args.recording, args.speed, args.factor, args.state_dir, args.state_from,
+        args.api_base, args.api_latency_ms / 1000, args.keep_rate_limits,
+        api_faults={
+            'jitter': args.api_jitter_ms / 1000, 'error_rate': args.api_error_rate,
+            'rate_limit_rate': args.api_rate_limit_rate, 'retry_after': args.api_retry_after, 'seed': args.seed,
+        }
+    )
+    print(json.dumps(report, indent=2, ensure_ascii=False) if args.json else format_report(report))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,216 @@
+# rule_mining.py
+
+"""
+Recherche de règles multi-décalages : pour chaque jeu N, toutes les cartes des
+groupes 1 et 2 des jeux N-1 … N-5 sont mises en regard de l'enseigne de la
+première carte du jeu N. Les tables de co-occurrence sont calculées en une passe
+(vectorisée avec NumPy s'il est installé, sinon en Python pur sur des `array`),
+puis les règles candidates sont classées par confiance et support.
+"""
+import bisect
+import logging
+from array import array
+from collections import deque
+from typing import Deque, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from cards import CARD_COUNT, SUIT_COUNT, SUITS, card_suit, decode_card
+
+try:
+    import numpy as np
+except ImportError:  # NumPy est optionnel
+    np = None
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+DEFAULT_OFFSETS = (1, 2, 3, 4, 5)
+
+# Caractéristique = (groupe, carte) : 0..51 groupe 1, 52..103 groupe 2
+FEATURE_COUNT = 2 * CARD_COUNT
+
+# Entrée d'historique : (rang, jeu, codes groupe 1, codes groupe 2)
+GameCards = Tuple[int, int, Tuple[int, ...], Tuple[int, ...]]
+
+
+class GameCardHistory:
+    """
+    Historique borné des cartes par jeu, dans l'ordre d'arrivée. Chaque entrée porte
+    un rang croissant : une édition d'un jeu déjà connu remplace l'entrée de même rang
+    (sa position est conservée), ce qui rend le rejeu du journal idempotent.
+    """
+
+    # Nombre d'entrées récentes examinées pour retrouver un jeu édité
+    RECENT_SCAN = 16
+
+    def __init__(self, maxlen: Optional[int] = 20000):
+        self.entries: Deque[GameCards] = deque(maxlen=maxlen)
+        self.last_seq = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def find_recent(self, game_number: int) -> Optional[GameCards]:
+        for i in range(1, min(self.RECENT_SCAN, len(self.entries)) + 1):
+            entry = self.entries[-i]
+            if entry[1] == game_number:
+                return entry
+        return None
+
+    def next_record(self, game_number: int, group1: Sequence[int], group2: Sequence[int]) -> Optional[Dict]:
+        """Enregistrement de journal pour ces cartes, ou None si rien n'a changé."""
+        group1, group2 = tuple(group1), tuple(group2)
+        existing = self.find_recent(game_number)
+        if existing is not None:
+            if existing[2] == group1 and existing[3] == group2:
+                return None
+            seq = existing[0]
+        else:
+            seq = self.last_seq + 1
+        return {'op': 'cards', 'seq': seq, 'game': game_number, 'g1': list(group1), 'g2': list(group2)}
+
+    def apply(self, record: Dict) -> None:
+        entry = (record['seq'], record['game'], tuple(record['g1']), tuple(record['g2']))
+        seq = entry[0]
+        if seq > self.last_seq:
+            self.entries.append(entry)
+            self.last_seq = seq
+            return
+        # Remplacement (édition, ou rejeu sur un snapshot plus récent)
+        index = bisect.bisect_left(self.entries, seq, key=lambda e: e[0])
+        if index < len(self.entries) and self.entries[index][0] == seq:
+            self.entries[index] = entry
+
+    def trim(self, maxlen: int) -> List[GameCards]:
+        """Retire (et renvoie) les entrées les plus anciennes au-delà de maxlen (archivage)."""
+        removed = []
+        while len(self.entries) > maxlen:
+            removed.append(self.entries.popleft())
+        return removed
+
+    # --- Snapshot ---
+    def to_document(self) -> Dict:
+        return {'seq': self.last_seq, 'games': [[s, g, list(g1), list(g2)] for s, g, g1, g2 in self.entries]}
+
+    @classmethod
+    def from_document(cls, document: Optional[Dict], maxlen: Optional[int] = 20000) -> 'GameCardHistory':
+        history = cls(maxlen)
+        if document:
+            for seq, game, group1, group2 in document.get('games', []):
+                history.entries.append((seq, game, tuple(group1), tuple(group2)))
+            history.last_seq = max(document.get('seq', 0), history.entries[-1][0] if history.entries else 0)
+        return history
+
+
+class MinedRule(NamedTuple):
+    offset: int          # N - offset -> N
+    group: int           # groupe de la carte déclencheuse (1 ou 2)
+    trigger: str
+    predict: str
+    count: int           # occurrences (déclencheur, enseigne)
+    support: float       # count / paires observées à ce décalage
+    confidence: float    # count / occurrences du déclencheur à ce décalage
+
+
+class CoOccurrence(NamedTuple):
+    counts: Sequence[int]    # [caractéristique * 4 + enseigne]
+    totals: Sequence[int]    # [caractéristique]
+    pairs: int
+
+
+def _prepare(entries: Sequence[GameCards]) -> Tuple[List[int], List[Tuple[int, ...]], List[int]]:
+    games, features, results = [], [], []
+    for _, game, group1, group2 in entries:
+        games.append(game)
+        features.append(tuple(set(group1) | {CARD_COUNT + code for code in group2}))
+        results.append(card_suit(group1[0]) if group1 else -1)
+    return games, features, results
+
+
+def cooccurrence(entries: Sequence[GameCards], offsets: Iterable[int] = DEFAULT_OFFSETS,
+                 use_numpy: Optional[bool] = None) -> Dict[int, CoOccurrence]:
+    """Tables (caractéristique du jeu N-k) × (enseigne du jeu N), une par décalage k."""
+    games, features, results = _prepare(entries)
+    if use_numpy is None:
+        use_numpy = np is not None
+    if use_numpy and np is not None:
+        return _cooccurrence_numpy(games, features, results, offsets)
+    return _cooccurrence_python(games, features, results, offsets)
+
+
+def _cooccurrence_python(games, features, results, offsets) -> Dict[int, CoOccurrence]:
+    tables = {}
+    n = len(games)
+    for k in offsets:
+        counts = array('I', [0]) * (FEATURE_COUNT * SUIT_COUNT)
+        totals = array('I', [0]) * FEATURE_COUNT
+        pairs = 0
+        for i in range(k, n):
+            suit = results[i]
+            # Paire valide seulement si le jeu N-k est bien celui k positions plus tôt
+            if suit < 0 or games[i - k] != games[i] - k: continue
+            pairs += 1
+            for feature in features[i - k]:
+                counts[feature * SUIT_COUNT + suit] += 1
+                totals[feature] += 1
+        tables[k] = CoOccurrence(counts, totals, pairs)
+    return tables
+
+
+def _cooccurrence_numpy(games, features, results, offsets) -> Dict[int, CoOccurrence]:
+    n = len(games)
+    # Produits matriciels en float64 (BLAS) : comptes exacts bien au-delà de la taille de l'historique
+    incidence = np.zeros((n, FEATURE_COUNT), dtype=np.float64)
+    rows = np.repeat(np.arange(n), [len(row) for row in features])
+    cols = np.fromiter((feature for row in features for feature in row), dtype=np.int64, count=len(rows))
+    incidence[rows, cols] = 1
+
+    result = np.asarray(results, dtype=np.int64)
+    has_result = result >= 0
+    outcome = np.zeros((n, SUIT_COUNT), dtype=np.float64)
+    outcome[np.nonzero(has_result)[0], result[has_result]] = 1
+    game = np.asarray(games, dtype=np.int64)
+
+    tables = {}
+    for k in offsets:
+        if k >= n:
+            tables[k] = CoOccurrence([0] * (FEATURE_COUNT * SUIT_COUNT), [0] * FEATURE_COUNT, 0)
+            continue
+        # Les paires invalides (trou dans la numérotation, pas de résultat) ont une ligne d'issue nulle
+        valid = (game[k:] - game[:-k] == k) & has_result[k:]
+        masked_outcome = outcome[k:] * valid[:, None]
+        counts = incidence[:-k].T @ masked_outcome
+        tables[k] = CoOccurrence(
+            counts.ravel().astype(np.int64).tolist(),
+            counts.sum(axis=1).astype(np.int64).tolist(),
+            int(valid.sum())
+        )
+    return tables
+
+
+def rank_rules(tables: Dict[int, CoOccurrence], min_count: int = 5, limit: Optional[int] = 20) -> List[MinedRule]:
+    """Règles candidates triées par confiance, puis nombre d'occurrences."""
+    rules = []
+    for k, table in tables.items():
+        if not table.pairs: continue
+        for feature in range(FEATURE_COUNT):
+            total = table.totals[feature]
+            if total < min_count: continue
+            for suit in range(SUIT_COUNT):
+                count = table.counts[feature * SUIT_COUNT + suit]
+                if count < min_count: continue
+                rules.append(MinedRule(
+                    offset=k,
+                    group=1 + feature // CARD_COUNT,
+                    trigger=decode_card(feature % CARD_COUNT),
+                    predict=SUITS[suit],
+                    count=count,
+                    support=count / table.pairs,
+                    confidence=count / total,
+                ))
+    rules.sort(key=lambda r: (-r.confidence, -r.count, r.offset, r.group))
+    return rules[:limit] if limit else rules
+
+
+def mine_rules(entries: Sequence[GameCards], offsets: Iterable[int] = DEFAULT_OFFSETS, min_count: int = 5,
+               limit: Optional[int] = 20, use_numpy: Optional[bool] = None) -> List[MinedRule]:
+    return rank_rules(cooccurrence(entries, offsets, use_numpy), min_count, limit)
@@ -0,0 +1,82 @@
+# rule_scheduler.py
+
+"""
+Planificateur de l'analyse INTER périodique.
+Un thread dédié déclenche `check_and_update_rules` à l'échéance (intervalle + gigue
+aléatoire), hors du chemin de traitement des messages.
+"""
+import time
+import random
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Réveil maximal entre deux vérifications de l'échéance (une analyse manuelle la repousse)
+MAX_SLEEP = 60
+
+
+class RuleScheduler:
+    """Exécute l'analyse périodique du prédicteur dans un thread d'arrière-plan."""
+
+    def __init__(self, predictor, interval: float = 1800, jitter: float = 60):
+        self.predictor = predictor
+        self.interval = interval
+        self.jitter = jitter
+        self._jitter = random.uniform(0, jitter)
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.runs = 0
+        self.errors = 0
+        self.last_run_at: Optional[float] = None
+        self.last_run_duration: Optional[float] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='rule-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def seconds_until_due(self, now: Optional[float] = None) -> float:
+        due = (self.predictor.last_analysis_time or 0) + self.interval + self._jitter
+        return max(0.0, due - (now if now is not None else time.time()))
+
+    def run_once(self) -> None:
+        """Lance une analyse et mesure sa durée."""
+        started = time.perf_counter()
+        try:
+            self.predictor.check_and_update_rules(self.interval)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"❌ Erreur analyse INTER planifiée: {e}")
+        self.last_run_duration = time.perf_counter() - started
+        self.last_run_at = time.time()
+        self.runs += 1
+        self._jitter = random.uniform(0, self.jitter)
+        logger.info(f"🧠 Analyse INTER planifiée terminée en {self.last_run_duration * 1000:.1f} ms")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'runs': self.runs,
+            'errors': self.errors,
+            'last_run_at': self.last_run_at,
+            'last_run_ms': round(self.last_run_duration * 1000, 1) if self.last_run_duration is not None else None,
+            'next_run_in_s': round(self.seconds_until_due(), 1),
+        }
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            delay = self.seconds_until_due()
+            if delay > 0:
+                self._stopped.wait(min(delay, MAX_SLEEP))
+                continue
+            self.run_once()
+            if self.seconds_until_due() == 0:
+                # L'analyse n'a pas avancé l'échéance (erreur) : pas de boucle serrée
+                self._stopped.wait(MAX_SLEEP)
@@ -0,0 +1,315 @@
+# shadow.py
+
+"""
+Évaluation « fantôme » de moteurs de règles alternatifs sur le flux réel.
+Chaque moteur reçoit les mêmes messages source analysés que le bot, applique la même
+sémantique (écart de 3 jeux, cible N+2, gains aux décalages 0/1/2, désactivation INTER
+sur perte) et compte ses prédictions et résultats — sans rien publier sur Telegram.
+Le traitement se fait dans un thread dédié alimenté par une file bornée : le webhook
+ne paie qu'un dépôt non bloquant, et les messages sont abandonnés si la file est pleine.
+Chaque message est daté au dépôt par l'horloge du prédicteur (rejeu : horloge de l'enregistrement).
+"""
+import time
+import queue
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from backtest import MAX_WIN_OFFSET, PREDICTION_GAP, STATIC_FAILS_BEFORE_INTER, VERIFICATION_WINDOW, static_table
+from cards import SUITS, card_suit, encode_card, suit_index
+from inter_stats import InterStats, RESULT_SUITS
+from message_parser import ParsedMessage
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Premières cartes mémorisées pour former les échantillons N-2 -> N
+RECENT_GAMES = 16
+# Prédictions en attente par moteur (les plus anciennes, jamais vérifiées, sont abandonnées)
+MAX_PENDING = 16
+
+
+class ShadowEngine:
+    """Un moteur : règles STATIQUES seules, ou INTER (Top N d'un `InterStats`) + repli STATIQUE."""
+
+    def __init__(self, name: str, stats: Optional[InterStats] = None, top_n: int = 2,
+                 static: Optional[Tuple[int, ...]] = None):
+        self.name = name
+        self.stats = stats
+        self.top_n = top_n
+        self.static = static if static is not None else static_table()
+        self.table: Tuple[int, ...] = self.static
+        self.rules = 0
+        self.active = False
+        self.last_analysis_time = 0.0
+
+        self.pending: Dict[int, Tuple[int, bool]] = {}   # jeu cible -> (enseigne, INTER actif)
+        self.last_prediction_time = 0.0
+        self.last_predicted_game_number = 0
+        self.consecutive_fails = 0
+
+        self.predictions = 0
+        self.wins_by_offset = [0, 0, 0]
+        self.losses = 0
+        self.streak = 0
+        self.longest_win_streak = 0
+        self.longest_loss_streak = 0
+        self.inter_disables = 0
+
+    # --- Règles ---
+    def analyze(self, now: float, force_activate: bool = False) -> None:
+        """Équivalent de `_analyze_locked` : Top N par enseigne, table INTER prioritaire."""
+        self.last_analysis_time = now
+        if self.stats is None: return
+        table = list(self.static)
+        rules = []
+        for result_suit in RESULT_SUITS:
+            for trigger, _ in self.stats.top(result_suit, now)[:self.top_n]:
+                rules.append((encode_card(trigger), suit_index(result_suit)))
+        # Parcours inversé : la première règle l'emporte pour un même déclencheur
+        for code, suit in reversed(rules):
+            table[code] = suit
+        self.table, self.rules = tuple(table), len(rules)
+        if force_activate or rules:
+            self.active = True
+
+    def check_and_update_rules(self, interval: float, now: float) -> None:
+        if self.stats is not None and now - self.last_analysis_time > interval:
+            self.analyze(now, force_activate=len(self.stats) >= 3)
+
+    # --- Cycle de jeu ---
+    def verify(self, game_number: int, suit_mask: int, now: float) -> None:
+        for target in sorted(self.pending):
+            offset = game_number - target
+            if offset < 0 or offset > VERIFICATION_WINDOW: continue
+            suit, is_inter = self.pending[target]
+            if suit_mask >> suit & 1 and offset <= MAX_WIN_OFFSET:
+                del self.pending[target]
+                self.wins_by_offset[offset] += 1
+                self.consecutive_fails = 0
+                self.streak = self.streak + 1 if self.streak > 0 else 1
+                self.longest_win_streak = max(self.longest_win_streak, self.streak)
+                return
+            elif offset >= MAX_WIN_OFFSET:
+                del self.pending[target]
+                self.losses += 1
+                if is_inter:
+                    self.active = False
+                    self.inter_disables += 1
+                else:
+                    self.consecutive_fails += 1
+                    if self.consecutive_fails >= STATIC_FAILS_BEFORE_INTER:
+                        self.analyze(now, force_activate=True)
+                self.streak = self.streak - 1 if self.streak < 0 else -1
+                self.longest_loss_streak = max(self.longest_loss_streak, -self.streak)
+                return
+
+    def predict(self, game_number: int, code: int, cooldown: float, now: float) -> None:
+        if self.last_predicted_game_number and game_number - self.last_predicted_game_number < PREDICTION_GAP:
+            return
+        table = self.table if self.active else self.static
+        suit = table[code]
+        if suit < 0: return
+        if self.last_prediction_time and now < self.last_prediction_time + cooldown:
+            return
+        self.pending[game_number + 2] = (suit, self.active)
+        if len(self.pending) > MAX_PENDING:
+            del self.pending[min(self.pending)]
+        self.last_prediction_time = now
+        self.last_predicted_game_number = game_number
+        self.consecutive_fails = 0
+        self.predictions += 1
+
+    def stats_row(self) -> Dict[str, Any]:
+        wins = sum(self.wins_by_offset)
+        resolved = wins + self.losses
+        return {
+            'engine': self.name,
+            'predictions': self.predictions,
+            'wins': wins,
+            'losses': self.losses,
+            'wins_by_offset': list(self.wins_by_offset),
+            'win_rate': round(wins / resolved, 4) if resolved else None,
+            'longest_win_streak': self.longest_win_streak,
+            'longest_loss_streak': self.longest_loss_streak,
+            'inter_active': self.active,
+            'inter_rules': self.rules,
+            'inter_disables': self.inter_disables,
+            'pending': len(self.pending),
+        }
+
+
+class ShadowEvaluator:
+    """Fait tourner plusieurs `ShadowEngine` sur les messages source, dans un thread dédié."""
+
+    def __init__(self, engines: List[ShadowEngine], stats: List[InterStats], max_samples: int = 5000,
+                 queue_size: int = 1000, analysis_interval: float = 1800, cooldown: float = 30,
+                 clock: Callable[[], float] = time.time):
+        self.engines = engines
+        self.clock = clock
+        self.inter_stats = stats
+        self.max_samples = max_samples
+        self.analysis_interval = analysis_interval
+        self.cooldown = cooldown
+        self.started_at = time.time()
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._first_cards: 'OrderedDict[int, str]' = OrderedDict()
+        # Échantillons par rang de collecte (les numéros de jeu reviennent chaque jour) ;
+        # rang de l'échantillon des jeux récents, remplacé si leur carte est corrigée
+        self._samples: 'OrderedDict[int, None]' = OrderedDict()
+        self._recent_samples: Dict[int, int] = {}
+        self._sample_seq = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='shadow-evaluator', daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def for_predictor(cls, predictor, top_k: int = 4, half_life: float = 86400, max_samples: int = 5000,
+                      queue_size: int = 1000, analysis_interval: float = 1800) -> 'ShadowEvaluator':
+        """
+        Moteurs par défaut : statique seul, INTER Top 2, INTER Top k, INTER décroissant.
+        Les statistiques partent des échantillons déjà collectés par le prédicteur.
+        """
+        total = InterStats(top_n=max(2, top_k))
+        decayed = InterStats(top_n=2, mode='decay', half_life=half_life)
+        with predictor._lock:
+            retired = predictor._inter_stats.retired_document()
+            entries = list(predictor.inter_data[-max_samples:])
+        total.load_retired(retired)
+        for entry in entries:
+            total.add(entry['seq'], entry)
+            decayed.add(entry['seq'], entry)
+
+        static = static_table()
+        engines = [
+            ShadowEngine('statique', static=static),
+            ShadowEngine('inter-top2', total, 2, static),
+            ShadowEngine(f'inter-top{top_k}', total, top_k, static),
+            ShadowEngine('inter-decay', decayed, 2, static),
+        ]
+        # Horloge lue à chaque dépôt : suit une horloge remplacée après coup (rejeu)
+        evaluator = cls(engines, [total, decayed], max_samples, queue_size, analysis_interval,
+                        predictor.prediction_cooldown, clock=lambda: predictor.clock())
+        for entry in entries:
+            evaluator._samples[entry['seq']] = None
+        evaluator._sample_seq = entries[-1]['seq'] if entries else 0
+        return evaluator
+
+    # --- API ---
+    def submit(self, message: ParsedMessage, edited: bool = False) -> bool:
+        """Dépôt non bloquant ; False (message abandonné) si la file est pleine."""
+        try:
+            self._queue.put_nowait((message, edited, self.clock()))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def join(self, timeout: float = 5.0) -> bool:
+        """Attend que la file soit vidée (tests, outils)."""
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks:
+            if time.time() > deadline: return False
+            time.sleep(0.01)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'since': self.started_at,
+                'processed': self.processed,
+                'dropped': self.dropped,
+                'errors': self.errors,
+                'depth': self._queue.qsize(),
+                'samples': len(self._samples),
+                'engines': [engine.stats_row() for engine in self.engines],
+            }
+
+    # --- Traitement ---
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                message, edited, now = self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            try:
+                with self._lock:
+                    self._process(message, edited, now)
+                    self.processed += 1
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"❌ Erreur évaluation fantôme: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _process(self, message: ParsedMessage, edited: bool, now: float) -> None:
+        """Mêmes étapes que handle_update : collecte, vérification (finalisé), prédiction (non édité)."""
+        game_number = message.game_number
+        if not game_number: return
+
+        for engine in self.engines:
+            engine.check_and_update_rules(self.analysis_interval, now)
+
+        code = message.first_card_code
+        if code is not None:
+            self._collect(game_number, message.first_card, now)
+
+        if message.has_completion and message.is_structurally_valid:
+            suit_mask = 0
+            for card in message.first_group_cards:
+                card_code = encode_card(card)
+                if card_code is not None:
+                    suit_mask |= 1 << card_suit(card_code)
+            for engine in self.engines:
+                engine.verify(game_number, suit_mask, now)
+
+        if not edited and code is not None:
+            for engine in self.engines:
+                engine.predict(game_number, code, self.cooldown, now)
+
+    def _collect(self, game_number: int, card: str, now: float) -> None:
+        previous = self._first_cards.get(game_number)
+        if previous == card: return
+        if previous is not None:
+            # Carte corrigée : l'échantillon de ce jeu est remplacé (s'il n'a pas été retiré entre-temps)
+            sample = self._recent_samples.pop(game_number, None)
+            if sample is not None and self._samples.pop(sample, False) is None:
+                for stats in self.inter_stats:
+                    stats.remove(sample)
+        self._first_cards[game_number] = card
+        self._first_cards.move_to_end(game_number)
+        while len(self._first_cards) > RECENT_GAMES:
+            old_game, _ = self._first_cards.popitem(last=False)
+            self._recent_samples.pop(old_game, None)
+
+        trigger = self._first_cards.get(game_number - 2)
+        if trigger is None: return
+        entry = {
+            'numero_resultat': game_number,
+            'declencheur': trigger,
+            'numero_declencheur': game_number - 2,
+            'result_suit': SUITS[card_suit(encode_card(card))],
+            'date': datetime.fromtimestamp(now).isoformat(),
+        }
+        self._sample_seq += 1
+        sample = self._sample_seq
+        for stats in self.inter_stats:
+            stats.add(sample, entry)
+        self._samples[sample] = None
+        self._recent_samples[game_number] = sample
+        # Mémoire bornée : les plus anciens échantillons ne subsistent que dans les agrégats
+        while len(self._samples) > self.max_samples:
+            oldest, _ = self._samples.popitem(last=False)
+            for stats in self.inter_stats:
+                stats.retire(oldest)
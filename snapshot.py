@@ -0,0 +1,78 @@
+# snapshot.py
+
+"""
+Instantané binaire de l'état du prédicteur : un démarrage à froid en une seule lecture,
+au lieu d'une quinzaine de fichiers JSON, de la relecture du journal INTER et de la
+reconstruction des compteurs.
+
+Format : deux pickles consécutifs dans un même fichier
+1. un en-tête (version, configuration, signature des fichiers d'état), lu en premier ;
+2. l'état lui-même (attribut -> valeur).
+La signature (taille, mtime en ns) des fichiers d'état est relevée au moment de l'instantané :
+si l'un d'eux a changé depuis (écritures après l'instantané, arrêt brutal, migration…),
+l'instantané est ignoré et l'état est relu depuis JSON/SQLite, qui restent la référence.
+Le fichier n'est écrit et relu que par le bot lui-même (pickle ne doit pas lire de données externes).
+"""
+import gc
+import io
+import os
+import pickle
+import logging
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+SNAPSHOT_FILE = 'predictor_state.pkl'
+SNAPSHOT_MAGIC = 'card-predictor-state'
+# À incrémenter quand la forme de l'état ou des classes picklées change
+SNAPSHOT_VERSION = 3
+
+# Fichier -> (taille, mtime ns), None s'il n'existe pas
+Signature = Dict[str, Optional[Tuple[int, int]]]
+
+
+def file_signature(paths: Iterable[str]) -> Signature:
+    signature: Signature = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+            signature[path] = (st.st_size, st.st_mtime_ns)
+        except FileNotFoundError:
+            signature[path] = None
+    return signature
+
+
+def encode_snapshot(state: Dict[str, Any], sources: Signature, config: Tuple) -> bytes:
+    """Sérialise en-tête + état (appelé sous le verrou d'état ; l'écriture se fait hors verrou)."""
+    header = {'magic': SNAPSHOT_MAGIC, 'version': SNAPSHOT_VERSION, 'config': config, 'sources': sources}
+    return pickle.dumps(header, pickle.HIGHEST_PROTOCOL) + pickle.dumps(state, pickle.HIGHEST_PROTOCOL)
+
+
+def read_snapshot(path: str, sources: Iterable[str], config: Tuple) -> Optional[Dict[str, Any]]:
+    """État de l'instantané, ou None s'il est absent, d'une autre version/configuration ou périmé."""
+    if not os.path.exists(path): return None
+    try:
+        with open(path, 'rb') as f:
+            stream = io.BytesIO(f.read())
+        header = pickle.load(stream)
+        if not isinstance(header, dict) or header.get('magic') != SNAPSHOT_MAGIC:
+            logger.warning(f"⚠️ Instantané {path} non reconnu : ignoré")
+            return None
+        if header.get('version') != SNAPSHOT_VERSION or header.get('config') != config:
+            logger.info("⚡ Instantané d'une autre version ou configuration : chargement depuis les fichiers d'état")
+            return None
+        if header.get('sources') != file_signature(sources):
+            logger.info("⚡ Fichiers d'état modifiés depuis l'instantané : chargement depuis les fichiers d'état")
+            return None
+        # Des dizaines de milliers de petits conteneurs : le ramasse-miettes est suspendu pendant la lecture
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return pickle.load(stream)
+        finally:
+            if gc_enabled:
+                gc.enable()
+    except Exception as e:
+        logger.error(f"❌ Instantané {path} illisible: {e}")
+        return None
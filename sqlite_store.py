@@ -0,0 +1,437 @@
+# sqlite_store.py
+
+"""
+Backend de stockage SQLite optionnel (STORAGE_BACKEND=sqlite).
+Remplace la réécriture de documents JSON complets par des insertions/mises à jour
+de lignes transactionnelles. Migration des fichiers JSON existants :
+
+    python sqlite_store.py migrate [--db bot_state.db] [--dir .]
+"""
+import os
+import json
+import sqlite3
+import logging
+import argparse
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config import MINING_HISTORY_SIZE
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    game INTEGER PRIMARY KEY,
+    predicted_costume TEXT,
+    status TEXT,
+    predicted_from INTEGER,
+    message_id INTEGER,
+    is_inter INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_status_game ON predictions(status, game);
+
+CREATE TABLE IF NOT EXISTS sequential_history (
+    game INTEGER PRIMARY KEY,
+    carte TEXT NOT NULL,
+    date TEXT
+);
+
+CREATE TABLE IF NOT EXISTS inter_data (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    numero_resultat INTEGER NOT NULL,
+    declencheur TEXT NOT NULL,
+    numero_declencheur INTEGER,
+    result_suit TEXT NOT NULL,
+    date TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_inter_data_result_suit ON inter_data(result_suit);
+CREATE INDEX IF NOT EXISTS idx_inter_data_numero ON inter_data(numero_resultat);
+
+CREATE TABLE IF NOT EXISTS inter_retired (
+    declencheur TEXT NOT NULL,
+    result_suit TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (declencheur, result_suit)
+);
+
+CREATE TABLE IF NOT EXISTS smart_rules (
+    position INTEGER PRIMARY KEY,
+    trigger TEXT NOT NULL,
+    predict TEXT NOT NULL,
+    count INTEGER,
+    result_suit TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_smart_rules_result_suit ON smart_rules(result_suit);
+
+CREATE TABLE IF NOT EXISTS game_cards (
+    seq INTEGER PRIMARY KEY,
+    game INTEGER NOT NULL,
+    g1 TEXT NOT NULL,
+    g2 TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Documents stockés dans des tables dédiées (les autres vont dans la table kv)
+TABLE_DOCUMENTS = ('predictions.json', 'sequential_history.json', 'inter_data.json', 'smart_rules.json', 'game_cards.json',
+                   'inter_retired.json')
+
+# Fichiers JSON importés par la migration
+MIGRATED_FILES = (
+    'predictions.json', 'processed.json', 'last_prediction_time.json',
+    'last_predicted_game_number.json', 'consecutive_fails.json', 'inter_data.json',
+    'sequential_history.json', 'inter_mode_status.json', 'smart_rules.json',
+    'active_admin_chat_id.json', 'last_analysis_time.json', 'pending_edits.json',
+    'collected_games.json', 'channels_config.json', 'game_cards.json', 'inter_retired.json'
+)
+
+
+class SQLiteStore:
+    """Stockage transactionnel de l'état du prédicteur (une connexion partagée, protégée par verrou)."""
+
+    def __init__(self, path: str = 'bot_state.db'):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._upgrade_inter_data()
+        self._conn.executescript(SCHEMA)
+
+    def _upgrade_inter_data(self) -> None:
+        """
+        Bases créées avec numero_resultat UNIQUE : la contrainte fusionnait les échantillons d'un même
+        numéro de jeu (la numérotation recommence chaque jour). Table recréée sans elle, rangs conservés.
+        """
+        row = self._conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'inter_data'").fetchone()
+        if not row or 'UNIQUE' not in row[0]: return
+        with self._transaction() as conn:
+            conn.execute('ALTER TABLE inter_data RENAME TO inter_data_unique')
+            conn.execute('DROP INDEX IF EXISTS idx_inter_data_result_suit')
+            conn.execute(
+                'CREATE TABLE inter_data (seq INTEGER PRIMARY KEY AUTOINCREMENT, numero_resultat INTEGER NOT NULL, '
+                'declencheur TEXT NOT NULL, numero_declencheur INTEGER, result_suit TEXT NOT NULL, date TEXT)'
+            )
+            conn.execute('INSERT INTO inter_data SELECT seq, numero_resultat, declencheur, numero_declencheur, result_suit, date '
+                         'FROM inter_data_unique')
+            conn.execute('DROP TABLE inter_data_unique')
+        logger.info("🗄️ Table inter_data migrée : plusieurs échantillons par numéro de jeu")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _transaction(self):
+        return _Transaction(self._conn, self._lock)
+
+    # --- Documents (équivalents des fichiers JSON) ---
+    def load_document(self, filename: str) -> Any:
+        """Renvoie le document sous la forme que json.load renverrait, ou None s'il n'existe pas."""
+        with self._lock:
+            if filename == 'predictions.json':
+                # Seules les prédictions en attente sont chargées ; les résolues restent archivées en base
+                rows = self._conn.execute("SELECT game, data FROM predictions WHERE status = 'pending' ORDER BY game").fetchall()
+                return {str(game): json.loads(data) for game, data in rows} if rows else None
+            if filename == 'sequential_history.json':
+                rows = self._conn.execute('SELECT game, carte, date FROM sequential_history ORDER BY game').fetchall()
+                return {str(game): {'carte': carte, 'date': date} for game, carte, date in rows} if rows else None
+            if filename == 'inter_data.json':
+                rows = self._conn.execute(
+                    'SELECT seq, numero_resultat, declencheur, numero_declencheur, result_suit, date FROM inter_data ORDER BY seq'
+                ).fetchall()
+                return [_inter_row_to_entry(row) for row in rows] if rows else None
+            if filename == 'smart_rules.json':
+                rows = self._conn.execute(
+                    'SELECT trigger, predict, count, result_suit FROM smart_rules ORDER BY position'
+                ).fetchall()
+                return [{'trigger': t, 'predict': p, 'count': c, 'result_suit': r} for t, p, c, r in rows] if rows else None
+            if filename == 'inter_retired.json':
+                rows = self._conn.execute('SELECT declencheur, result_suit, count FROM inter_retired ORDER BY rowid').fetchall()
+                return [{'declencheur': d, 'result_suit': r, 'count': c} for d, r, c in rows] if rows else None
+            if filename == 'game_cards.json':
+                rows = self._conn.execute('SELECT seq, game, g1, g2 FROM game_cards ORDER BY seq').fetchall()
+                if not rows: return None
+                return {'seq': rows[-1][0], 'games': [[s, g, json.loads(g1), json.loads(g2)] for s, g, g1, g2 in rows]}
+            if filename == 'collected_games.json':
+                # Les jeux collectés sont exactement les clés de l'historique séquentiel
+                rows = self._conn.execute('SELECT game FROM sequential_history').fetchall()
+                if rows:
+                    return [game for (game,) in rows]
+            row = self._conn.execute('SELECT value FROM kv WHERE key = ?', (filename,)).fetchone()
+            return json.loads(row[0]) if row else None
+
+    def save_document(self, filename: str, data: Any) -> None:
+        """Remplace un document complet en une transaction."""
+        with self._transaction() as conn:
+            if filename == 'predictions.json':
+                # Le document ne contient que les prédictions en attente : l'archive est conservée
+                conn.execute("DELETE FROM predictions WHERE status = 'pending'")
+                for game, prediction in (data or {}).items():
+                    _upsert_prediction(conn, int(game), prediction)
+            elif filename == 'sequential_history.json':
+                conn.execute('DELETE FROM sequential_history')
+                conn.executemany(
+                    'INSERT INTO sequential_history (game, carte, date) VALUES (?, ?, ?)',
+                    [(int(game), v.get('carte'), v.get('date')) for game, v in (data or {}).items()]
+                )
+            elif filename == 'inter_data.json':
+                conn.execute('DELETE FROM inter_data')
+                # Fichier antérieur aux rangs : numérotés dans l'ordre, comme au chargement par CardPredictor
+                for index, entry in enumerate(data or [], 1):
+                    _upsert_inter_entry(conn, entry if 'seq' in entry else {**entry, 'seq': index})
+            elif filename == 'inter_retired.json':
+                conn.execute('DELETE FROM inter_retired')
+                conn.executemany(
+                    'INSERT INTO inter_retired (declencheur, result_suit, count) VALUES (?, ?, ?)',
+                    [(r['declencheur'], r['result_suit'], r['count']) for r in data or []]
+                )
+            elif filename == 'game_cards.json':
+                conn.execute('DELETE FROM game_cards')
+                conn.executemany(
+                    'INSERT INTO game_cards (seq, game, g1, g2) VALUES (?, ?, ?, ?)',
+                    [(s, g, json.dumps(g1), json.dumps(g2)) for s, g, g1, g2 in (data or {}).get('games', [])]
+                )
+            elif filename == 'smart_rules.json':
+                conn.execute('DELETE FROM smart_rules')
+                conn.executemany(
+                    'INSERT INTO smart_rules (position, trigger, predict, count, result_suit) VALUES (?, ?, ?, ?, ?)',
+                    [(i, r.get('trigger'), r.get('predict'), r.get('count'), r.get('result_suit')) for i, r in enumerate(data or [])]
+                )
+            else:
+                conn.execute('INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)', (filename, json.dumps(data)))
+
+    # --- Opérations ligne à ligne ---
+    def compare_and_set_last_prediction(self, allowed: Callable[[int, float], bool],
+                                        game: int, timestamp: float) -> Tuple[bool, int, float]:
+        """
+        Compare-and-set entre processus de last_predicted_game_number / last_prediction_time :
+        dans une transaction IMMEDIATE (un seul écrivain), écrit (game, timestamp) seulement si
+        `allowed(valeurs en base)` est vrai. Renvoie (écrit, jeu en base, heure en base).
+        """
+        with self._transaction() as conn:
+            rows = dict(conn.execute(
+                "SELECT key, value FROM kv WHERE key IN ('last_predicted_game_number.json', 'last_prediction_time.json')"
+            ).fetchall())
+            current_game = json.loads(rows.get('last_predicted_game_number.json') or 'null') or 0
+            current_time = json.loads(rows.get('last_prediction_time.json') or 'null') or 0
+            if not allowed(current_game, current_time):
+                return False, current_game, current_time
+            conn.executemany('INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)', (
+                ('last_predicted_game_number.json', json.dumps(game)),
+                ('last_prediction_time.json', json.dumps(timestamp)),
+            ))
+        return True, game, timestamp
+
+    def upsert_prediction(self, game: int, prediction: Dict) -> None:
+        with self._transaction() as conn:
+            _upsert_prediction(conn, game, prediction)
+
+    def apply_journal_record(self, record: Dict) -> None:
+        """Applique un enregistrement du journal INTER (voir CardPredictor._apply_journal_record)."""
+        op = record.get('op')
+        with self._transaction() as conn:
+            if op == 'hist':
+                game = record['game']
+                conn.execute('INSERT OR REPLACE INTO sequential_history (game, carte, date) VALUES (?, ?, ?)',
+                             (game, record['carte'], record['date']))
+                conn.execute('DELETE FROM sequential_history WHERE game < ?', (game - record.get('window', 50),))
+            elif op == 'inter':
+                _upsert_inter_entry(conn, record['entry'])
+            elif op == 'inter_del':
+                # Carte corrigée dans la fenêtre de collecte : échantillons de ce jeu encore en mémoire
+                through = record.get('seq')
+                conn.execute('DELETE FROM inter_data WHERE numero_resultat = ? AND (? IS NULL OR seq <= ?)',
+                             (record['game'], through, through))
+            elif op == 'inter_retire':
+                # Les plus anciens échantillons quittent la table ; leurs comptes sont agrégés.
+                # Bornés par rang quand l'enregistrement le donne : un rejeu ne retire rien deux fois
+                through = record.get('seq')
+                rows = conn.execute(
+                    'SELECT seq, declencheur, result_suit FROM inter_data WHERE ? IS NULL OR seq <= ? ORDER BY seq LIMIT ?',
+                    (through, through, record['count'])
+                ).fetchall()
+                for seq, declencheur, result_suit in rows:
+                    conn.execute(
+                        'INSERT INTO inter_retired (declencheur, result_suit, count) VALUES (?, ?, 1) '
+                        'ON CONFLICT (declencheur, result_suit) DO UPDATE SET count = count + 1',
+                        (declencheur, result_suit)
+                    )
+                if rows:
+                    conn.execute('DELETE FROM inter_data WHERE seq <= ?', (rows[-1][0],))
+            elif op == 'cards':
+                conn.execute('INSERT OR REPLACE INTO game_cards (seq, game, g1, g2) VALUES (?, ?, ?, ?)',
+                             (record['seq'], record['game'], json.dumps(record['g1']), json.dumps(record['g2'])))
+                conn.execute('DELETE FROM game_cards WHERE seq <= ?', (record['seq'] - MINING_HISTORY_SIZE,))
+
+    def iter_resolved_predictions(self) -> Iterator[Dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT game, data FROM predictions WHERE status != 'pending' ORDER BY game").fetchall()
+        for game, data in rows:
+            yield {'game': game, **json.loads(data)}
+
+    def delete_predictions(self, games: Iterable[int]) -> None:
+        with self._transaction() as conn:
+            conn.executemany('DELETE FROM predictions WHERE game = ?', ((game,) for game in games))
+
+    def journal(self) -> 'SQLiteJournal':
+        return SQLiteJournal(self)
+
+    def prediction_archive(self) -> 'SQLitePredictionArchive':
+        return SQLitePredictionArchive(self)
+
+    # --- Migration ---
+    def migrate_from_json(self, directory: str = '.') -> Dict[str, int]:
+        """Importe les fichiers JSON (et le journal INTER) d'un répertoire. Renvoie le nombre d'éléments par fichier."""
+        from journal import AppendOnlyJournal
+
+        imported = {}
+        for filename in MIGRATED_FILES:
+            path = os.path.join(directory, filename)
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r') as f:
+                content = f.read().strip()
+            if not content:
+                continue
+            data = json.loads(content)
+            self.save_document(filename, data)
+            imported[filename] = len(data) if isinstance(data, (list, dict)) else 1
+
+        replayed = 0
+        for record in AppendOnlyJournal(os.path.join(directory, 'inter_journal.jsonl')).replay():
+            self.apply_journal_record(record)
+            replayed += 1
+        if replayed:
+            imported['inter_journal.jsonl'] = replayed
+        return imported
+
+
+class SQLiteJournal:
+    """Adaptateur exposant l'interface d'AppendOnlyJournal : chaque ajout est une transaction SQLite."""
+
+    records_since_compaction = 0
+
+    def __init__(self, store: SQLiteStore):
+        self.store = store
+
+    def append(self, record: Dict[str, Any]) -> None:
+        self.store.apply_journal_record(record)
+
+    def replay(self) -> Iterator[Dict[str, Any]]:
+        # Les tables sont déjà à jour : rien à rejouer
+        return iter(())
+
+    def needs_compaction(self, now: Optional[float] = None) -> bool:
+        return False
+
+    def rotate(self) -> None:
+        pass
+
+    def discard_rotated(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class SQLitePredictionArchive:
+    """Adaptateur exposant l'interface de PredictionArchive : les résolues restent dans la table predictions."""
+
+    def __init__(self, store: SQLiteStore):
+        self.store = store
+
+    def append(self, game_number: int, prediction: Dict[str, Any]) -> None:
+        self.store.upsert_prediction(game_number, prediction)
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        return self.store.iter_resolved_predictions()
+
+    def roll(self, cutoff: float, monthly) -> Tuple[int, float]:
+        """Déplace les résolues avant `cutoff` de la table vers les archives mensuelles (voir archive.py)."""
+        from archive import ARCHIVE_PREDICTIONS, prediction_status, split_by_age
+
+        old, _, oldest_kept = split_by_age(self.store.iter_resolved_predictions(), cutoff)
+        if not old: return 0, oldest_kept
+        moved = monthly.append(ARCHIVE_PREDICTIONS, old, summarize=prediction_status)
+        self.store.delete_predictions(record['game'] for records in old.values() for record in records)
+        return moved, oldest_kept
+
+    def close(self) -> None:
+        pass
+
+
+class _Transaction:
+    def __init__(self, conn: sqlite3.Connection, lock):
+        self.conn = conn
+        self.lock = lock
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.lock.acquire()
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        finally:
+            self.lock.release()
+        return False
+
+
+def _upsert_prediction(conn: sqlite3.Connection, game: int, prediction: Dict) -> None:
+    conn.execute(
+        'INSERT OR REPLACE INTO predictions (game, predicted_costume, status, predicted_from, message_id, is_inter, data) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+        (game, prediction.get('predicted_costume'), prediction.get('status'), prediction.get('predicted_from'),
+         prediction.get('message_id'), int(bool(prediction.get('is_inter'))), json.dumps(prediction))
+    )
+
+
+def _upsert_inter_entry(conn: sqlite3.Connection, entry: Dict) -> None:
+    """Échantillon identifié par son rang 'seq' (réécrit à l'identique si le journal est rejoué)."""
+    conn.execute(
+        'INSERT OR REPLACE INTO inter_data (seq, numero_resultat, declencheur, numero_declencheur, result_suit, date) '
+        'VALUES (?, ?, ?, ?, ?, ?)',
+        (entry.get('seq'), entry['numero_resultat'], entry['declencheur'], entry.get('numero_declencheur'),
+         entry['result_suit'], entry.get('date'))
+    )
+
+
+def _inter_row_to_entry(row) -> Dict:
+    seq, numero_resultat, declencheur, numero_declencheur, result_suit, date = row
+    return {
+        'numero_resultat': numero_resultat,
+        'declencheur': declencheur,
+        'numero_declencheur': numero_declencheur,
+        'result_suit': result_suit,
+        'date': date,
+        'seq': seq
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Outils du backend SQLite")
+    sub = parser.add_subparsers(dest='command', required=True)
+    migrate = sub.add_parser('migrate', help="Importer les fichiers JSON existants")
+    migrate.add_argument('--db', default=os.getenv('SQLITE_PATH') or 'bot_state.db')
+    migrate.add_argument('--dir', default='.')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.command == 'migrate':
+        store = SQLiteStore(args.db)
+        imported = store.migrate_from_json(args.dir)
+        store.close()
+        for filename, count in imported.items():
+            logger.info(f"✅ {filename}: {count} élément(s) importé(s)")
+        logger.info(f"✅ Migration terminée vers {args.db}")
+
+
+if __name__ == '__main__':
+    main()
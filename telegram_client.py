@@ -0,0 +1,182 @@
+# telegram_client.py
+
+"""
+Client HTTP partagé pour l'API Bot Telegram : connexions keep-alive (requests.Session),
+délais par appel, reprises avec backoff exponentiel, respect de `retry_after` (429)
+et compteurs de latence par méthode. Les envois (non idempotents) ne sont repris que
+si Telegram n'a pas pu recevoir la requête.
+"""
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import TELEGRAM_API_BASE
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Attente maximale acceptée pour un retry_after (au-delà, on abandonne l'appel)
+MAX_RETRY_AFTER = 60
+
+# Méthodes qui publient un message : après un délai de lecture dépassé ou une erreur 5xx,
+# Telegram l'a souvent déjà publié, une reprise le doublerait
+NON_IDEMPOTENT_METHODS = frozenset({'sendMessage', 'sendDocument'})
+
+# Échecs survenus avant l'envoi de la requête : toujours repris
+CONNECT_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.ConnectTimeout)
+
+
+class LatencyStats:
+    """Fenêtre glissante des derniers temps de réponse (en secondes) pour une clé."""
+
+    def __init__(self, maxlen: int = 1000):
+        self.samples: Deque[float] = deque(maxlen=maxlen)
+        self.count = 0
+        self.errors = 0
+
+    def add(self, seconds: float, ok: bool = True) -> None:
+        self.samples.append(seconds)
+        self.count += 1
+        if not ok:
+            self.errors += 1
+
+    def percentile(self, p: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'p50_ms': round(self.percentile(50) * 1000, 1),
+            'p99_ms': round(self.percentile(99) * 1000, 1),
+            'max_ms': round(max(self.samples) * 1000, 1) if self.samples else 0.0,
+        }
+
+
+class TelegramClient:
+    """Client partagé (thread-safe) pour les appels à l'API Bot."""
+
+    def __init__(self, token: str, api_base: str = TELEGRAM_API_BASE, pool_size: int = 10,
+                 max_retries: int = 3, backoff: float = 0.5):
+        self.token = token
+        self.base_url = f"{api_base.rstrip('/')}/bot{token}"
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._stats: Dict[str, LatencyStats] = {}
+        self._stats_lock = threading.Lock()
+
+    # --- Appels API ---
+    def call(self, method: str, payload: Optional[Dict] = None, data: Optional[Dict] = None,
+             files: Optional[Dict] = None, timeout: float = 10, tag: Optional[str] = None,
+             http_method: str = 'POST', idempotent: Optional[bool] = None) -> Optional[Dict[str, Any]]:
+        """
+        Appelle une méthode de l'API et renvoie la réponse JSON décodée
+        (avec 'ok'), ou None si l'appel a échoué après toutes les tentatives.
+        `tag` ajoute une clé de latence supplémentaire (ex: 'prediction').
+        `idempotent=False` (défaut pour NON_IDEMPOTENT_METHODS) : seuls les échecs de connexion
+        et les 429 sont repris ; délai de lecture dépassé et 5xx renvoient l'échec.
+        """
+        url = f"{self.base_url}/{method}"
+        if idempotent is None:
+            idempotent = method not in NON_IDEMPOTENT_METHODS
+        for attempt in range(self.max_retries + 1):
+            self._rewind(files)
+            started = time.perf_counter()
+            try:
+                if http_method == 'GET':
+                    response = self.session.get(url, params=payload, timeout=timeout)
+                else:
+                    response = self.session.post(url, json=payload, data=data, files=files, timeout=timeout)
+            except requests.exceptions.RequestException as e:
+                self._record(method, tag, time.perf_counter() - started, ok=False)
+                if attempt >= self.max_retries or not (idempotent or isinstance(e, CONNECT_ERRORS)):
+                    logger.error(f"Exception appel Telegram {method}: {e}")
+                    return None
+                self._sleep_backoff(attempt)
+                continue
+
+            elapsed = time.perf_counter() - started
+            result = self._decode(response)
+
+            if response.status_code == 429:
+                self._record(method, tag, elapsed, ok=False)
+                retry_after = (result.get('parameters') or {}).get('retry_after', 1) if result else 1
+                if attempt >= self.max_retries or retry_after > MAX_RETRY_AFTER:
+                    logger.error(f"Limite Telegram atteinte pour {method} (retry_after={retry_after}s), abandon")
+                    return result
+                logger.warning(f"⏳ Limite Telegram (429) sur {method}, nouvel essai dans {retry_after}s")
+                time.sleep(retry_after)
+                continue
+
+            if response.status_code >= 500:
+                self._record(method, tag, elapsed, ok=False)
+                if attempt >= self.max_retries or not idempotent:
+                    logger.error(f"Erreur Telegram {response.status_code}: {response.text}")
+                    return result
+                self._sleep_backoff(attempt)
+                continue
+
+            self._record(method, tag, elapsed, ok=response.status_code == 200)
+            if response.status_code != 200:
+                logger.error(f"Erreur Telegram {response.status_code}: {response.text}")
+            return result
+        return None
+
+    def _decode(self, response: requests.Response) -> Optional[Dict[str, Any]]:
+        try:
+            return response.json()
+        except ValueError:
+            return None
+
+    def _rewind(self, files: Optional[Dict]) -> None:
+        """Remet les fichiers envoyés au début avant une nouvelle tentative."""
+        for value in (files or {}).values():
+            fileobj = value[1] if isinstance(value, tuple) else value
+            if hasattr(fileobj, 'seek'):
+                fileobj.seek(0)
+
+    def _sleep_backoff(self, attempt: int) -> None:
+        time.sleep(self.backoff * (2 ** attempt))
+
+    # --- Latences ---
+    def _record(self, method: str, tag: Optional[str], seconds: float, ok: bool) -> None:
+        keys = (method, f"{method}[{tag}]") if tag else (method,)
+        with self._stats_lock:
+            for key in keys:
+                stats = self._stats.get(key)
+                if stats is None:
+                    stats = self._stats[key] = LatencyStats()
+                stats.add(seconds, ok)
+
+    def latency_summary(self) -> Dict[str, Dict[str, Any]]:
+        """Latences p50/p99 par méthode (et par tag)."""
+        with self._stats_lock:
+            return {key: stats.summary() for key, stats in sorted(self._stats.items())}
+
+
+_clients: Dict[str, TelegramClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(token: str) -> TelegramClient:
+    """Renvoie le client partagé associé à un token (créé au premier appel)."""
+    with _clients_lock:
+        client = _clients.get(token)
+        if client is None:
+            client = _clients[token] = TelegramClient(token)
+        return client
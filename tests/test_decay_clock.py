@@ -0,0 +1,65 @@
+# tests/test_decay_clock.py
+
+"""
+Mode 'decay' sous horloge injectée : rejeux et backtests notent les échantillons à la date
+de l'enregistrement, pas à l'horloge murale (sinon tous les scores tombent vers 0).
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+import unittest
+from datetime import datetime
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_ROOT)
+os.environ.setdefault('BOT_TOKEN', '123456:TEST')
+
+from benchmarks.game_stream import GameStream
+from inter_stats import InterStats
+from message_parser import ParseCache
+from shadow import ShadowEvaluator, ShadowEngine
+
+HOUR = 3600
+START = datetime(2020, 1, 1).timestamp()
+
+
+def sample(hours: float) -> dict:
+    return {'declencheur': '10♦️', 'result_suit': '♠️', 'date': datetime.fromtimestamp(START + hours * HOUR).isoformat()}
+
+
+class DecayClockTest(unittest.TestCase):
+
+    def stats(self):
+        stats = InterStats(mode='decay', half_life=HOUR)
+        stats.add(1, sample(0))
+        stats.add(2, sample(1))
+        return stats
+
+    def test_top_uses_given_clock(self):
+        self.assertEqual(self.stats().top('♠️', START + 2 * HOUR), [('10♦️', 0.75)])
+
+    def test_top_defaults_to_latest_sample(self):
+        self.assertEqual(self.stats().top('♠️'), [('10♦️', 1.5)])
+
+    def test_shadow_runs_on_injected_clock(self):
+        clock = [START]
+        stats = InterStats(mode='decay', half_life=HOUR)
+        engine = ShadowEngine('inter-decay', stats, 2)
+        evaluator = ShadowEvaluator([engine], [stats], analysis_interval=HOUR, cooldown=0, clock=lambda: clock[0])
+        parse_cache = ParseCache(64)
+        try:
+            for event in GameStream(3, start_ts=START).events(200):
+                clock[0] = event.ts
+                post = event.update.get('edited_channel_post') or event.update['channel_post']
+                evaluator.submit(parse_cache.lookup(post['text'])[0], 'edited_channel_post' in event.update)
+            self.assertTrue(evaluator.join())
+        finally:
+            evaluator.stop()
+        self.assertTrue(START < engine.last_analysis_time <= clock[0])
+        self.assertTrue(clock[0] - HOUR < stats.decayed.latest <= clock[0])
+        self.assertTrue(engine.rules)
+
+
+if __name__ == '__main__':
+    unittest.main()
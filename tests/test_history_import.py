@@ -0,0 +1,127 @@
+# tests/test_history_import.py
+
+"""
+Import d'historique pendant le traitement en direct : la collecte en direct continue entre les
+messages importés. L'import ne doit toucher ni à la fenêtre séquentielle en direct (déclencheurs
+N-2), ni à l'ordre chronologique de inter_data (rétention par date), ni à l'ordre des cartes par jeu.
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_ROOT)
+os.environ.setdefault('BOT_TOKEN', '123456:TEST')
+os.environ['PREDICTOR_SNAPSHOT'] = 'false'
+os.environ['STORAGE_BACKEND'] = 'json'
+
+from benchmarks.game_stream import GameStream
+from card_predictor import CardPredictor
+from message_parser import ParseCache
+
+GAMES = 600
+WRAP_AT = 300
+DAY = 86400
+
+
+def strip_seq(entries):
+    return [{k: v for k, v in entry.items() if k != 'seq'} for entry in entries]
+
+
+def stream(seed, start_ts, games=GAMES):
+    """(message analysé, horodatage) des posts et éditions du canal source."""
+    parse_cache = ParseCache(512)
+    for event in GameStream(seed, wrap_at=WRAP_AT, start_ts=start_ts).events(games):
+        post = event.update.get('edited_channel_post') or event.update['channel_post']
+        yield parse_cache.lookup(post['text'])[0], event.ts
+
+
+class HistoryImportDuringLiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.root = tempfile.mkdtemp(prefix='history-import-')
+        now = time.time()
+        self.live = list(stream(11, now - GAMES * 60))
+        # Historique exporté de la veille, plus long que le direct : mêmes numéros de jeu, cartes différentes
+        self.history = [(message, datetime.fromtimestamp(ts).isoformat())
+                        for message, ts in stream(7, now - DAY - 2 * GAMES * 60, 2 * GAMES)]
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def predictor(self, name):
+        path = os.path.join(self.root, name)
+        os.makedirs(path)
+        os.chdir(path)
+        predictor = CardPredictor(telegram_message_sender=lambda *args, **kwargs: None)
+        self.clock = [0.0]
+        predictor.clock = lambda: self.clock[0]
+        return predictor
+
+    def collect_live(self, predictor, events):
+        for message, ts in events:
+            self.clock[0] = ts
+            if message.game_number:
+                predictor.collect_inter_data(message.game_number, message)
+
+    def test_import_interleaved_with_live_collection(self):
+        live_only = self.predictor('live')
+        self.collect_live(live_only, self.live)
+        expected_live = (strip_seq(live_only.inter_data), dict(live_only.sequential_history), set(live_only.collected_games))
+        live_games = [entry[1] for entry in live_only.game_cards.entries]
+        live_only.shutdown()
+
+        import_only = self.predictor('import')
+        import_only.import_history(self.history)
+        imported = strip_seq(import_only.inter_data)
+        imported_games = [entry[1] for entry in import_only.game_cards.entries]
+        import_only.shutdown()
+
+        predictor = self.predictor('both')
+        live = iter(self.live)
+
+        def interleaved():
+            # Tout le direct est traité pendant l'import, une update entre deux messages importés
+            for item in self.history:
+                yield item
+                self.collect_live(predictor, [event for event in [next(live, None)] if event])
+
+        predictor.import_history(interleaved())
+        self.assertIsNone(next(live, None))
+
+        # Fenêtre en direct intacte : les déclencheurs N-2 restent ceux du direct
+        self.assertEqual(predictor.sequential_history, expected_live[1])
+        self.assertEqual(predictor.collected_games, expected_live[2])
+        # Historique importé (plus ancien) d'abord, puis le direct ; dates et rangs croissants
+        self.assertEqual(strip_seq(predictor.inter_data), imported + expected_live[0])
+        dates = [entry['date'] for entry in predictor.inter_data]
+        self.assertEqual(dates, sorted(dates))
+        seqs = [entry['seq'] for entry in predictor.inter_data]
+        self.assertEqual(seqs, sorted(set(seqs)))
+        self.assertEqual([entry[1] for entry in predictor.game_cards.entries], imported_games + live_games)
+        self.assertEqual(len(predictor._inter_stats), len(predictor.inter_data))
+        predictor.shutdown()
+
+    def test_reload_after_import_restores_merged_state(self):
+        predictor = self.predictor('reload')
+        self.collect_live(predictor, self.live[:GAMES // 2])
+        predictor.import_history(self.history)
+        self.collect_live(predictor, self.live[GAMES // 2:])
+        state = strip_seq(predictor.inter_data), list(predictor.game_cards.entries)
+        predictor.shutdown()
+
+        reloaded = CardPredictor(telegram_message_sender=lambda *args, **kwargs: None)
+        self.assertEqual((strip_seq(reloaded.inter_data), list(reloaded.game_cards.entries)), state)
+        reloaded.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,240 @@
+# tests/test_inter_replay_equivalence.py
+
+"""
+Équivalence d'état INTER : le prédicteur (journal, index par rang, InterStats) doit collecter
+les mêmes échantillons, produire les mêmes règles et envoyer les mêmes prédictions que la
+version d'origine, qui balayait la liste inter_data à chaque collecte et à chaque analyse.
+Le flux renumérote les jeux (wrap_at) : les numéros de jeu reviennent comme chaque jour sur le canal.
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from collections import defaultdict
+from datetime import datetime
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_ROOT)
+os.environ.setdefault('BOT_TOKEN', '123456:TEST')
+os.environ['PREDICTOR_SNAPSHOT'] = 'false'
+os.environ['STORAGE_BACKEND'] = 'json'
+
+import card_predictor
+from benchmarks.game_stream import GameStream
+from card_predictor import CardPredictor
+from message_parser import ParseCache
+
+GAMES = 1500
+WRAP_AT = 300
+SEED = 7
+ANALYSIS_INTERVAL = 1800
+
+
+class ListScanPredictor(CardPredictor):
+    """Collecte et analyse INTER d'origine : liste inter_data filtrée et recomptée en entier."""
+
+    def collect_inter_data(self, game_number, message):
+        info = self.get_first_card_info(message)
+        if not info: return
+        full_card, suit = info
+        result_suit_normalized = suit.replace("❤️", "♥️")
+        date = datetime.fromtimestamp(self.clock()).isoformat()
+
+        if game_number in self.collected_games:
+            existing_data = self.sequential_history.get(game_number)
+            if existing_data and existing_data.get('carte') == full_card:
+                return
+            self.inter_data = [e for e in self.inter_data if e.get('numero_resultat') != game_number]
+
+        self.sequential_history[game_number] = {'carte': full_card, 'date': date}
+        self.collected_games.add(game_number)
+
+        trigger_entry = self.sequential_history.get(game_number - 2)
+        if trigger_entry:
+            self.inter_data.append({
+                'numero_resultat': game_number,
+                'declencheur': trigger_entry['carte'],
+                'numero_declencheur': game_number - 2,
+                'result_suit': result_suit_normalized,
+                'date': date
+            })
+
+        limit = game_number - 50
+        self.sequential_history = {k: v for k, v in self.sequential_history.items() if k >= limit}
+        self.collected_games = {g for g in self.collected_games if g >= limit}
+
+    def _analyze_locked(self, chat_id, initial_load, force_activate):
+        result_suit_groups = defaultdict(lambda: defaultdict(int))
+        for entry in self.inter_data:
+            result_suit_groups[entry['result_suit']][entry['declencheur']] += 1
+
+        smart_rules = []
+        for result_suit in ['♠️', '♥️', '♦️', '♣️']:
+            result_normalized = "❤️" if result_suit == "♥️" else result_suit
+            triggers_for_this_suit = result_suit_groups.get(result_suit, {})
+            top_triggers = sorted(triggers_for_this_suit.items(), key=lambda x: x[1], reverse=True)[:2]
+            for trigger_card, count in top_triggers:
+                smart_rules.append({'trigger': trigger_card, 'predict': result_normalized,
+                                    'count': count, 'result_suit': result_normalized})
+        self.smart_rules = smart_rules
+
+        if force_activate:
+            self.is_inter_mode_active = True
+            if chat_id: self.active_admin_chat_id = chat_id
+        elif self.smart_rules:
+            self.is_inter_mode_active = True
+        elif not initial_load:
+            self.is_inter_mode_active = False
+        self.last_analysis_time = self.clock()
+
+
+def strip_seq(entries):
+    return [{k: v for k, v in entry.items() if k != 'seq'} for entry in entries]
+
+
+def run_stream(predictor_cls, workdir, start_ts):
+    """Rejoue le flux (étapes de handle_update pour le canal source) ; renvoie l'état observé."""
+    os.chdir(workdir)
+    predictor = predictor_cls(telegram_message_sender=lambda *args, **kwargs: None)
+    clock = [start_ts]
+    predictor.clock = lambda: clock[0]
+    parse_cache = ParseCache(512)
+    sent, rules = [], []
+    message_id = 1
+    for event in GameStream(SEED, wrap_at=WRAP_AT, start_ts=start_ts).events(GAMES):
+        clock[0] = event.ts
+        edited = 'edited_channel_post' in event.update
+        text = (event.update.get('edited_channel_post') or event.update['channel_post'])['text']
+        parsed, is_valid, seen = parse_cache.lookup(text)
+        if edited and seen: continue
+        analysed_at = predictor.last_analysis_time
+        predictor.check_and_update_rules(ANALYSIS_INTERVAL)
+        if predictor.last_analysis_time != analysed_at:
+            rules.append(list(predictor.smart_rules))
+        if parsed.game_number:
+            predictor.collect_inter_data(parsed.game_number, parsed)
+        if parsed.has_completion and (is_valid or not edited):
+            if edited:
+                predictor.verify_prediction_from_edit(parsed)
+            else:
+                predictor._verify_prediction_common(parsed)
+        if not edited:
+            ok, num, val = predictor.should_predict(parsed)
+            if ok:
+                predictor.make_prediction(num, val, message_id)
+                sent.append((num, val))
+                message_id += 1
+    predictor.analyze_and_set_smart_rules()
+    state = {
+        'inter_data': strip_seq(predictor.inter_data),
+        'smart_rules': list(predictor.smart_rules),
+        'rules_history': rules,
+        'sent': sent,
+    }
+    predictor.shutdown()
+    return state
+
+
+class InterReplayEquivalenceTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cwd = os.getcwd()
+        cls.root = tempfile.mkdtemp(prefix='inter-equivalence-')
+        # Flux terminé « maintenant » : aucune donnée hors de la fenêtre de rétention
+        cls.start_ts = time.time() - GAMES * 60
+        cls.reference = run_stream(ListScanPredictor, cls.mkdir('reference'), cls.start_ts)
+        cls.current = run_stream(CardPredictor, cls.mkdir('current'), cls.start_ts)
+        with mock.patch.object(card_predictor, 'STORAGE_BACKEND', 'sqlite'):
+            cls.sqlite = run_stream(CardPredictor, cls.mkdir('sqlite'), cls.start_ts)
+        os.chdir(cls.cwd)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.cwd)
+        shutil.rmtree(cls.root, ignore_errors=True)
+
+    @classmethod
+    def mkdir(cls, name):
+        path = os.path.join(cls.root, name)
+        os.makedirs(path)
+        return path
+
+    def test_stream_wraps_game_numbers(self):
+        games = [entry['numero_resultat'] for entry in self.reference['inter_data']]
+        self.assertGreater(len(games), len(set(games)))
+
+    def test_same_inter_samples(self):
+        self.assertEqual(len(self.current['inter_data']), len(self.reference['inter_data']))
+        self.assertEqual(self.current['inter_data'], self.reference['inter_data'])
+
+    def test_same_rules(self):
+        self.assertEqual(self.current['rules_history'], self.reference['rules_history'])
+        self.assertEqual(self.current['smart_rules'], self.reference['smart_rules'])
+
+    def test_same_predictions_sent(self):
+        self.assertTrue(self.reference['sent'])
+        self.assertEqual(self.current['sent'], self.reference['sent'])
+
+    def test_sqlite_backend_same_state(self):
+        for key in ('inter_data', 'rules_history', 'sent'):
+            self.assertEqual(self.sqlite[key], self.reference[key], key)
+
+    def test_history_import_same_state(self):
+        os.chdir(self.mkdir('import'))
+        try:
+            predictor = CardPredictor(telegram_message_sender=lambda *args, **kwargs: None)
+            parse_cache = ParseCache(512)
+            messages = []
+            for event in GameStream(SEED, wrap_at=WRAP_AT, start_ts=self.start_ts).events(GAMES):
+                post = event.update.get('edited_channel_post') or event.update['channel_post']
+                messages.append((parse_cache.lookup(post['text'])[0], datetime.fromtimestamp(event.ts).isoformat()))
+            predictor.import_history(messages)
+            inter_data = strip_seq(predictor.inter_data)
+            predictor.shutdown()
+        finally:
+            os.chdir(self.cwd)
+        self.assertEqual(inter_data, self.reference['inter_data'])
+
+    def reload(self, name):
+        os.chdir(os.path.join(self.root, name))
+        try:
+            predictor = CardPredictor(telegram_message_sender=lambda *args, **kwargs: None)
+            predictor.analyze_and_set_smart_rules()
+            state = {'inter_data': strip_seq(predictor.inter_data), 'smart_rules': list(predictor.smart_rules)}
+            predictor.shutdown()
+            return state
+        finally:
+            os.chdir(self.cwd)
+
+    def test_reload_restores_same_state(self):
+        state = self.reload('current')
+        self.assertEqual(state['inter_data'], self.current['inter_data'])
+        self.assertEqual(state['smart_rules'], self.current['smart_rules'])
+
+    def test_sqlite_reload_restores_same_state(self):
+        with mock.patch.object(card_predictor, 'STORAGE_BACKEND', 'sqlite'):
+            state = self.reload('sqlite')
+        self.assertEqual(state['inter_data'], self.reference['inter_data'])
+        self.assertEqual(state['smart_rules'], self.reference['smart_rules'])
+
+    def test_sqlite_migration_keeps_repeated_games(self):
+        from sqlite_store import SQLiteStore
+        os.chdir(os.path.join(self.root, 'current'))
+        try:
+            store = SQLiteStore(os.path.join(self.root, 'migrated.db'))
+            store.migrate_from_json('.')
+            migrated = store.load_document('inter_data.json')
+            store.close()
+        finally:
+            os.chdir(self.cwd)
+        self.assertEqual(strip_seq(migrated), self.current['inter_data'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# tests/test_outbound.py
+
+"""
+Envois abandonnés : un message de prédiction dont l'attente a expiré ne doit jamais être publié
+plus tard sans être suivi. Annulé s'il est encore en file ; déjà parti, sa réponse est attendue.
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_ROOT)
+os.environ.setdefault('BOT_TOKEN', '123456:TEST')
+
+import handlers
+from outbound import OutboundScheduler
+
+CHAT = -100
+
+
+class BlockingClient:
+    """Client factice : chaque appel attend `release` (ou `delay` secondes), puis répond ok."""
+
+    def __init__(self, delay=None):
+        self.delay = delay
+        self.release = threading.Event()
+        self.calls = []
+
+    def call(self, method, payload, **kwargs):
+        self.calls.append(payload.get('text'))
+        if self.delay is not None:
+            time.sleep(self.delay)
+        else:
+            self.release.wait(5)
+        return {'ok': True, 'result': {'message_id': len(self.calls)}}
+
+
+def scheduler(client):
+    return OutboundScheduler(client, chat_rate=100, chat_burst=100, global_rate=100)
+
+
+class OutboundCancelTest(unittest.TestCase):
+
+    def test_cancel_before_start_never_sends(self):
+        client = BlockingClient()
+        outbound = scheduler(client)
+        first = outbound.submit('sendMessage', {'chat_id': CHAT, 'text': 'premier'})
+        queued = outbound.submit('sendMessage', {'chat_id': CHAT, 'text': 'second'})
+        time.sleep(0.05)
+        self.assertTrue(first.started)
+        self.assertTrue(queued.cancel())
+        client.release.set()
+        self.assertTrue(outbound.join(timeout=5))
+        self.assertEqual(client.calls, ['premier'])
+        self.assertEqual(outbound.stats()['cancelled'], 1)
+
+    def test_cancel_after_start_refused(self):
+        client = BlockingClient()
+        outbound = scheduler(client)
+        job = outbound.submit('sendMessage', {'chat_id': CHAT, 'text': 'parti'})
+        time.sleep(0.05)
+        self.assertFalse(job.cancel())
+        client.release.set()
+        self.assertEqual(job.wait(5)['result']['message_id'], 1)
+
+
+class SendMessageTimeoutTest(unittest.TestCase):
+
+    def test_queued_send_cancelled_on_timeout(self):
+        client = BlockingClient()
+        stub = SimpleNamespace(outbound=scheduler(client), card_predictor=None)
+        stub.outbound.submit('sendMessage', {'chat_id': CHAT, 'text': 'bloquant'})
+        with mock.patch.object(handlers, 'SEND_QUEUE_TIMEOUT', 0.1):
+            self.assertIsNone(handlers.TelegramHandlers.send_message(stub, CHAT, '⏳ prédiction'))
+        client.release.set()
+        self.assertTrue(stub.outbound.join(timeout=5))
+        self.assertEqual(client.calls, ['bloquant'])
+
+    def test_started_send_waits_for_message_id(self):
+        stub = SimpleNamespace(outbound=scheduler(BlockingClient(delay=0.3)), card_predictor=None)
+        with mock.patch.object(handlers, 'SEND_QUEUE_TIMEOUT', 0.1):
+            self.assertEqual(handlers.TelegramHandlers.send_message(stub, CHAT, '⏳ prédiction'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
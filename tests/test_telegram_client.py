@@ -0,0 +1,90 @@
+# tests/test_telegram_client.py
+
+"""
+Reprises du client Telegram : un envoi (sendMessage) n'est jamais répété quand Telegram a pu
+le recevoir (délai de lecture dépassé, 5xx), sous peine de publier deux fois la prédiction.
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+import unittest
+
+import requests
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_ROOT)
+os.environ.setdefault('BOT_TOKEN', '123456:TEST')
+
+from telegram_client import TelegramClient
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+        self.text = str(body)
+
+    def json(self):
+        return self.body
+
+
+class FakeSession:
+    """Rejoue une suite de résultats (exception levée ou réponse) et compte les POST."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.posts = 0
+
+    def post(self, url, **kwargs):
+        self.posts += 1
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+OK = FakeResponse(200, {'ok': True, 'result': {'message_id': 1}})
+
+
+class TelegramClientRetryTest(unittest.TestCase):
+
+    def client(self, *outcomes):
+        client = TelegramClient('123456:TEST', api_base='http://telegram.invalid', backoff=0)
+        client.session = FakeSession(*outcomes)
+        return client
+
+    def test_send_message_read_timeout_posts_once(self):
+        client = self.client(requests.exceptions.ReadTimeout('read timed out'), OK)
+        self.assertIsNone(client.call('sendMessage', {'chat_id': 1, 'text': '⏳'}))
+        self.assertEqual(client.session.posts, 1)
+
+    def test_send_message_server_error_posts_once(self):
+        client = self.client(FakeResponse(502, {'ok': False}), OK)
+        self.assertEqual(client.call('sendMessage', {'chat_id': 1, 'text': '⏳'}), {'ok': False})
+        self.assertEqual(client.session.posts, 1)
+
+    def test_send_message_connection_error_retried(self):
+        client = self.client(requests.exceptions.ConnectionError('refused'), OK)
+        self.assertEqual(client.call('sendMessage', {'chat_id': 1, 'text': '⏳'}), OK.body)
+        self.assertEqual(client.session.posts, 2)
+
+    def test_send_message_rate_limit_retried(self):
+        client = self.client(FakeResponse(429, {'ok': False, 'parameters': {'retry_after': 0}}), OK)
+        self.assertEqual(client.call('sendMessage', {'chat_id': 1, 'text': '⏳'}), OK.body)
+        self.assertEqual(client.session.posts, 2)
+
+    def test_idempotent_method_retried_after_read_timeout(self):
+        client = self.client(requests.exceptions.ReadTimeout('read timed out'), OK)
+        self.assertEqual(client.call('editMessageText', {'chat_id': 1, 'message_id': 1, 'text': '✅'}), OK.body)
+        self.assertEqual(client.session.posts, 2)
+
+    def test_explicit_non_idempotent_flag(self):
+        client = self.client(FakeResponse(503, {'ok': False}), OK)
+        client.call('editMessageText', {'chat_id': 1}, idempotent=False)
+        self.assertEqual(client.session.posts, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+# tests/test_worker_coordination.py
+
+"""
+File partagée entre workers (MULTI_WORKER) : une update lue par le leader n'est supprimée qu'après
+son traitement. Si le leader meurt avant, le worker élu ensuite la retraite, dans l'ordre.
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_ROOT)
+
+from worker_coordination import UpdateSpool, WorkerCoordinator
+
+
+class Processing:
+    """Traitement factice : garde les updates reçues et leurs acquittements, sans les appeler."""
+
+    def __init__(self, capacity=None):
+        self.capacity = capacity
+        self.received = []
+        self.pending = []
+
+    def ingest(self, update, on_done):
+        if self.capacity is not None and len(self.pending) >= self.capacity:
+            return False
+        self.received.append(update['update_id'])
+        self.pending.append(on_done)
+        return True
+
+    def finish(self):
+        for on_done in self.pending:
+            on_done()
+        self.pending = []
+
+
+class UpdateSpoolClaimTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='spool-')
+        self.spool_path = os.path.join(self.root, 'update_spool.db')
+        self.lock_path = os.path.join(self.root, 'worker_leader.lock')
+        self.spools = []
+
+    def tearDown(self):
+        for spool in self.spools:
+            spool.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def worker(self, processing):
+        """Un worker = sa propre connexion à la file et son coordinateur (non démarré)."""
+        spool = UpdateSpool(self.spool_path)
+        self.spools.append(spool)
+        return WorkerCoordinator(spool, self.lock_path, lambda: processing.ingest)
+
+    def put(self, spool, count, start=1):
+        for update_id in range(start, start + count):
+            spool.put({'update_id': update_id})
+
+    def test_rows_deleted_only_after_processing(self):
+        processing = Processing()
+        leader = self.worker(processing)
+        self.assertTrue(leader._elect())
+        self.put(leader.spool, 3)
+        self.assertEqual(leader._consume(), 3)
+        self.assertEqual((leader.spool.depth(), leader.spool.claimed()), (3, 3))
+        self.assertEqual(leader._consume(), 0)
+        processing.finish()
+        self.assertEqual(leader.spool.depth(), 0)
+
+    def test_crashed_leader_updates_reprocessed_by_next_leader(self):
+        first = Processing()
+        leader = self.worker(first)
+        self.assertTrue(leader._elect())
+        self.put(leader.spool, 5)
+        leader._consume()
+        first.pending[0]()      # seule la première update a fini son traitement
+
+        # Crash : le noyau libère le verrou, les réservations restent dans la file
+        leader._leader_lock.release()
+        second = Processing()
+        follower = self.worker(second)
+        self.put(follower.spool, 1, start=6)
+        self.assertTrue(follower._elect())
+        self.assertEqual(follower._consume(), 5)
+        self.assertEqual(second.received, [2, 3, 4, 5, 6])
+        second.finish()
+        self.assertEqual(follower.spool.depth(), 0)
+
+    def test_full_queue_leaves_rest_for_next_pass(self):
+        processing = Processing(capacity=2)
+        leader = self.worker(processing)
+        self.assertTrue(leader._elect())
+        self.put(leader.spool, 4)
+        self.assertEqual(leader._consume(), 2)
+        self.assertEqual(leader.spool.claimed(), 2)
+        processing.finish()
+        self.assertEqual(leader._consume(), 2)
+        processing.finish()
+        self.assertEqual(processing.received, [1, 2, 3, 4])
+        self.assertEqual(leader.spool.depth(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
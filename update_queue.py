@@ -0,0 +1,150 @@
+# update_queue.py
+
+"""
+File d'attente des updates Telegram : le webhook acquitte immédiatement,
+un pool de workers traite les updates en arrière-plan.
+Toutes les updates d'un même chat passent par le même worker (ordre préservé).
+"""
+import time
+import queue
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Clés d'update contenant un objet message avec 'chat'
+MESSAGE_KEYS = ('message', 'channel_post', 'edited_message', 'edited_channel_post')
+
+
+def update_chat_id(update: Dict[str, Any]) -> int:
+    """Renvoie l'ID du chat concerné par une update (0 si inconnu)."""
+    for key in MESSAGE_KEYS:
+        if key in update:
+            return update[key].get('chat', {}).get('id', 0)
+    if 'callback_query' in update:
+        return update['callback_query'].get('message', {}).get('chat', {}).get('id', 0)
+    if 'my_chat_member' in update:
+        return update['my_chat_member'].get('chat', {}).get('id', 0)
+    return 0
+
+
+class UpdateDispatcher:
+    """Pool de workers avec une file par worker, routage par chat."""
+
+    def __init__(self, handler: Callable[[Dict[str, Any]], None], workers: int = 4, max_queue_size: int = 1000):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queues: List[queue.Queue] = [queue.Queue(maxsize=max_queue_size) for _ in range(self.workers)]
+
+        self._stats_lock = threading.Lock()
+        self.submitted = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.last_processing_time = 0.0
+
+        self._stopped = threading.Event()
+        self._threads = []
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, args=(index,), name=f'update-worker-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    # --- API ---
+    def submit(self, update: Dict[str, Any], on_done: Optional[Callable[[], None]] = None) -> bool:
+        """
+        Met une update en file. Renvoie False si la file du worker est pleine.
+        `on_done()` est appelé par le worker une fois le traitement terminé (même en erreur).
+        """
+        index = hash(update_chat_id(update)) % self.workers
+        try:
+            self.queues[index].put_nowait((time.time(), update, on_done))
+        except queue.Full:
+            with self._stats_lock:
+                self.rejected += 1
+            logger.warning(f"⚠️ File du worker {index} pleine, update rejetée")
+            return False
+        with self._stats_lock:
+            self.submitted += 1
+        return True
+
+    def depth(self) -> int:
+        return sum(q.qsize() for q in self.queues)
+
+    def stats(self) -> Dict[str, Any]:
+        """Statistiques de supervision (profondeur de file et retard de traitement)."""
+        with self._stats_lock:
+            processed = self.processed
+            return {
+                'workers': self.workers,
+                'depth': self.depth(),
+                'depth_per_worker': [q.qsize() for q in self.queues],
+                'submitted': self.submitted,
+                'processed': processed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'last_lag_ms': round(self.last_lag * 1000, 2),
+                'max_lag_ms': round(self.max_lag * 1000, 2),
+                'avg_lag_ms': round(self.total_lag / processed * 1000, 2) if processed else 0.0,
+                'last_processing_ms': round(self.last_processing_time * 1000, 2),
+            }
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Attend que toutes les files soient vides. Renvoie False en cas de délai dépassé."""
+        deadline = time.time() + timeout if timeout is not None else None
+        while any(q.unfinished_tasks for q in self.queues):
+            if deadline is not None and time.time() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Traite les updates restantes puis arrête les workers."""
+        if self._stopped.is_set():
+            return
+        self.join(timeout)
+        self._stopped.set()
+        for q in self.queues:
+            try:
+                q.put_nowait(None)
+            except queue.Full:
+                pass
+
+    # --- Workers ---
+    def _run(self, index: int) -> None:
+        q = self.queues[index]
+        while not self._stopped.is_set():
+            item = q.get()
+            if item is None:
+                q.task_done()
+                break
+            enqueued_at, update, on_done = item
+            started = time.time()
+            lag = started - enqueued_at
+            ok = True
+            try:
+                self.handler(update)
+            except Exception as e:
+                ok = False
+                logger.error(f"❌ Erreur worker {index}: {e}")
+            finally:
+                elapsed = time.time() - started
+                with self._stats_lock:
+                    self.processed += 1
+                    if not ok:
+                        self.failed += 1
+                    self.last_lag = lag
+                    self.max_lag = max(self.max_lag, lag)
+                    self.total_lag += lag
+                    self.last_processing_time = elapsed
+                if on_done:
+                    try:
+                        on_done()
+                    except Exception as e:
+                        logger.error(f"❌ Erreur acquittement worker {index}: {e}")
+                q.task_done()
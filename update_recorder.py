@@ -0,0 +1,86 @@
+# update_recorder.py
+
+"""
+Enregistreur optionnel des updates brutes reçues par le webhook.
+Chaque update est ajoutée à un fichier JSONL (`{"ts": ..., "update": {...}}`) qui tourne
+au-delà d'une taille maximale (updates.jsonl -> updates.jsonl.1 -> ...), comme un
+RotatingFileHandler. Les enregistrements se rejouent avec replay.py.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class UpdateRecorder:
+    """Ajout thread-safe d'une ligne par update, avec rotation par taille."""
+
+    def __init__(self, path: str, max_bytes: int = 50 * 1024 * 1024, backups: int = 5):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def record(self, update: Dict[str, Any], ts: Optional[float] = None) -> None:
+        line = json.dumps({'ts': ts if ts is not None else time.time(), 'update': update}, ensure_ascii=False)
+        with self._lock:
+            try:
+                self._file.write(line + '\n')
+                self._file.flush()
+                self.recorded += 1
+                if self.max_bytes and self._file.tell() >= self.max_bytes:
+                    self._rotate()
+            except Exception as e:
+                logger.error(f"❌ Erreur enregistrement update: {e}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def _rotate(self) -> None:
+        self._file.close()
+        if self.backups > 0:
+            for index in range(self.backups - 1, 0, -1):
+                source = f"{self.path}.{index}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        logger.info(f"🔄 Enregistrement des updates : rotation de {self.path}")
+
+
+def recording_files(path: str) -> Iterator[str]:
+    """Fichiers d'un enregistrement, du plus ancien (.N) au plus récent."""
+    backups = []
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        backups.append(f"{path}.{index}")
+        index += 1
+    yield from reversed(backups)
+    if os.path.exists(path):
+        yield path
+
+
+def iter_recording(path: str, include_rotated: bool = True) -> Iterator[Tuple[float, Dict[str, Any]]]:
+    """(horodatage, update) dans l'ordre d'enregistrement."""
+    files = recording_files(path) if include_rotated else iter([path])
+    for filename in files:
+        with open(filename, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line: continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning(f"⚠️ Ligne d'enregistrement invalide ignorée ({filename})")
+                    continue
+                yield record.get('ts', 0.0), record.get('update', {})
@@ -0,0 +1,254 @@
+# worker_coordination.py
+
+"""
+Coordination de plusieurs workers gunicorn autour d'un état unique (MULTI_WORKER=true) :
+- chaque worker acquitte le webhook en ajoutant l'update à une file partagée SQLite (WAL) ;
+  l'identifiant auto-incrémenté donne l'ordre d'arrivée global, tous workers confondus ;
+- un seul processus, le leader (verrou fcntl exclusif sur un fichier), construit le bot et le
+  prédicteur et consomme la file dans cet ordre. S'il s'arrête, le noyau libère le verrou et
+  un autre worker prend le relais (état relu depuis les fichiers ou l'instantané) ;
+- une update lue par le leader est seulement marquée réservée (claimed_at) ; la ligne n'est
+  supprimée qu'une fois handle_update terminé. Le nouveau leader remet en file les réservations
+  de son prédécesseur : une update en cours au moment d'un crash est retraitée, jamais perdue ;
+- FileLock sert aussi au compare-and-set de la dernière prédiction en mode JSON.
+Sans fcntl (Windows), le verrou n'est qu'un verrou de threads : un seul worker dans ce cas.
+"""
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+SPOOL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS updates (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    received_at REAL NOT NULL,
+    payload TEXT NOT NULL,
+    claimed_at REAL
+);
+"""
+
+# Updates lues par le leader à chaque passage
+SPOOL_BATCH = 100
+
+
+class FileLock:
+    """Verrou exclusif entre processus (flock) et entre threads d'un même processus."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._file = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        if not self._thread_lock.acquire(blocking):
+            return False
+        try:
+            f = open(self.path, 'a+')
+        except OSError:
+            self._thread_lock.release()
+            raise
+        if fcntl:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                self._thread_lock.release()
+                return False
+        self._file = f
+        return True
+
+    def release(self) -> None:
+        f, self._file = self._file, None
+        if f is not None:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            f.close()
+        self._thread_lock.release()
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+class UpdateSpool:
+    """File d'updates partagée entre processus (une connexion SQLite par processus)."""
+
+    def __init__(self, path: str = 'update_spool.db'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SPOOL_SCHEMA)
+        columns = [row[1] for row in self._conn.execute('PRAGMA table_info(updates)')]
+        if 'claimed_at' not in columns:
+            # File créée par une version antérieure (lignes supprimées dès la lecture)
+            self._conn.execute('ALTER TABLE updates ADD COLUMN claimed_at REAL')
+        # Réveil immédiat du leader pour les updates reçues par son propre processus
+        self.wake = threading.Event()
+        self.put_count = 0
+
+    def put(self, update: Dict[str, Any]) -> int:
+        payload = json.dumps(update, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            cursor = self._conn.execute('INSERT INTO updates (received_at, payload) VALUES (?, ?)', (time.time(), payload))
+            self.put_count += 1
+        self.wake.set()
+        return cursor.lastrowid
+
+    def claim(self, limit: int = SPOOL_BATCH) -> List[Tuple[int, float, Dict[str, Any]]]:
+        """Réserve les updates non réservées les plus anciennes, dans l'ordre d'arrivée."""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self._conn.execute(
+                    'SELECT id, received_at, payload FROM updates WHERE claimed_at IS NULL ORDER BY id LIMIT ?', (limit,)
+                ).fetchall()
+                if rows:
+                    self._conn.execute('UPDATE updates SET claimed_at = ? WHERE claimed_at IS NULL AND id <= ?',
+                                       (time.time(), rows[-1][0]))
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return [(row_id, received_at, json.loads(payload)) for row_id, received_at, payload in rows]
+
+    def ack(self, row_id: int) -> None:
+        """Update traitée : la ligne peut disparaître."""
+        with self._lock:
+            self._conn.execute('DELETE FROM updates WHERE id = ?', (row_id,))
+
+    def unclaim(self, from_id: int = 0) -> int:
+        """Remet en file les réservations d'identifiant >= from_id ; renvoie leur nombre."""
+        with self._lock:
+            cursor = self._conn.execute('UPDATE updates SET claimed_at = NULL WHERE claimed_at IS NOT NULL AND id >= ?', (from_id,))
+        return cursor.rowcount
+
+    def depth(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM updates').fetchone()[0]
+
+    def claimed(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM updates WHERE claimed_at IS NOT NULL').fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class WorkerCoordinator:
+    """
+    Élection du leader et consommation de la file partagée.
+    `on_elected()` est appelé une fois, dans le processus élu ; il construit le traitement et
+    renvoie la fonction d'entrée des updates `ingest(update, on_done)` (False : file pleine,
+    l'update sera relue plus tard ; sinon `on_done()` est appelé une fois l'update traitée).
+    """
+
+    def __init__(self, spool: UpdateSpool, lock_path: str,
+                 on_elected: Callable[[], Callable[[Dict[str, Any], Callable[[], None]], bool]],
+                 poll_interval: float = 0.05, retry_interval: float = 1.0):
+        self.spool = spool
+        self.on_elected = on_elected
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+        self._leader_lock = FileLock(lock_path)
+        self._ingest: Optional[Callable[[Dict[str, Any], Callable[[], None]], bool]] = None
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.consumed = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.elected_at: Optional[float] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._ingest is not None
+
+    def start(self) -> 'WorkerCoordinator':
+        self._thread = threading.Thread(target=self._run, name='worker-coordinator', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopped.set()
+        self.spool.wake.set()
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'role': 'leader' if self.is_leader else 'follower',
+            'spool_depth': self.spool.depth(),
+            'spool_claimed': self.spool.claimed(),
+            'spooled': self.spool.put_count,
+            'consumed': self.consumed,
+            'last_lag_ms': round(self.last_lag * 1000, 1),
+            'max_lag_ms': round(self.max_lag * 1000, 1),
+            'elected_at': self.elected_at,
+        }
+
+    # --- Thread de coordination ---
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            if not self.is_leader:
+                if not self._elect():
+                    self._stopped.wait(self.retry_interval)
+                continue
+            try:
+                consumed = self._consume()
+            except Exception as e:
+                logger.error(f"❌ Erreur lecture de la file partagée: {e}")
+                consumed = 0
+            if not consumed:
+                self.spool.wake.wait(self.poll_interval)
+                self.spool.wake.clear()
+
+    def _elect(self) -> bool:
+        if not self._leader_lock.acquire(blocking=False):
+            return False
+        # Réservations de l'ancien leader (mort en cours de traitement) : remises en file
+        reclaimed = self.spool.unclaim()
+        if reclaimed:
+            logger.warning(f"⚠️ {reclaimed} update(s) réservée(s) par l'ancien leader remise(s) en file")
+        try:
+            self._ingest = self.on_elected()
+        except Exception as e:
+            logger.error(f"❌ Échec de la prise de rôle leader: {e}")
+            self._leader_lock.release()
+            return False
+        self.elected_at = time.time()
+        logger.info(f"👑 Processus leader : traitement des updates de la file partagée ({self.spool.depth()} en attente)")
+        return True
+
+    def _consume(self) -> int:
+        """
+        Transmet les updates en attente au traitement ; renvoie le nombre transmis.
+        Chaque ligne reste en file (réservée) jusqu'à la fin de son traitement.
+        """
+        consumed = 0
+        for row_id, received_at, update in self.spool.claim():
+            if not self._ingest(update, lambda row_id=row_id: self.spool.ack(row_id)):
+                # File de traitement pleine : cette update et les suivantes reprises au prochain passage
+                self.spool.unclaim(row_id)
+                break
+            consumed += 1
+            self.last_lag = max(0.0, time.time() - received_at)
+            self.max_lag = max(self.max_lag, self.last_lag)
+        self.consumed += consumed
+        return consumed